@@ -0,0 +1,11 @@
+"""
+DOM360 Agent API Module
+"""
+from .client import AgentHTTPClient, get_agent_client
+from .context import ContextWindow
+
+__all__ = [
+    'AgentHTTPClient',
+    'get_agent_client',
+    'ContextWindow',
+]
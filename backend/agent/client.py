@@ -0,0 +1,163 @@
+"""
+DOM360 Agent HTTP Client
+Process-wide keep-alive client for the SDR/COPILOT Agent API
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (needed by httpx for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _HostStats:
+    """Request/connection counters for one agent host"""
+    __slots__ = ('requests', 'connections_opened')
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+
+
+class AgentHTTPClient:
+    """
+    Shared httpx client, one connection pool per agent host
+
+    Each origin (scheme://host:port) gets its own httpx.AsyncClient so the
+    connection limit applies per agent host. Connections are kept alive
+    between chat turns; HTTP/2 is negotiated over TLS when `h2` is installed.
+
+    Usage:
+        client = AgentHTTPClient(max_connections_per_host=20)
+        response = await client.request("POST", url, timeout_ms=30000, json=payload)
+        await client.aclose()
+    """
+
+    def __init__(
+        self,
+        http2: bool = True,
+        max_connections_per_host: int = 20,
+        max_keepalive_per_host: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        pool_timeout: float = 5.0
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested for Agent API but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _HostStats] = {}
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _client_for(self, url: str):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None:
+            client = httpx.AsyncClient(http2=self.http2, limits=self.limits)
+            self._clients[origin] = client
+            self._stats.setdefault(origin, _HostStats())
+        return client, self._stats[origin]
+
+    def timeout(self, timeout_ms: int) -> httpx.Timeout:
+        """Build connect/read/write/pool timeouts from an overall budget in ms"""
+        total = timeout_ms / 1000.0
+        return httpx.Timeout(
+            total,
+            connect=min(self.connect_timeout, total),
+            pool=min(self.pool_timeout, total)
+        )
+
+    def _prepare(self, url: str, timeout_ms: int, kwargs: dict):
+        if self._closed:
+            raise RuntimeError("Agent HTTP client is closed")
+
+        client, stats = self._client_for(url)
+
+        async def trace(event_name: str, info: dict):
+            # httpcore only emits connect_tcp when it has to open a new socket
+            if event_name == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+
+        stats.requests += 1
+        kwargs['extensions'] = dict(kwargs.get('extensions') or {}, trace=trace)
+        kwargs['timeout'] = self.timeout(timeout_ms)
+        return client
+
+    async def request(self, method: str, url: str, timeout_ms: int, **kwargs) -> httpx.Response:
+        """Send a request on a pooled connection to the URL's host"""
+        client = self._prepare(url, timeout_ms, kwargs)
+        return await client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, timeout_ms: int, **kwargs):
+        """Like request(), but yields the response before the body is read"""
+        client = self._prepare(url, timeout_ms, kwargs)
+        async with client.stream(method, url, **kwargs) as response:
+            yield response
+
+    async def get(self, url: str, timeout_ms: int, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, timeout_ms, **kwargs)
+
+    async def post(self, url: str, timeout_ms: int, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, timeout_ms, **kwargs)
+
+    async def aclose(self):
+        """Close every per-host client and its idle connections"""
+        self._closed = True
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def stats(self) -> dict:
+        """Per-host request counts and how often a kept-alive connection was reused"""
+        hosts = {}
+        for origin, s in self._stats.items():
+            reused = max(s.requests - s.connections_opened, 0)
+            hosts[origin] = {
+                'requests': s.requests,
+                'connections_opened': s.connections_opened,
+                'connections_reused': reused,
+                'reuse_ratio': round(reused / s.requests, 4) if s.requests else 0.0,
+            }
+        return {
+            'http2': self.http2,
+            'max_connections_per_host': self.limits.max_connections,
+            'max_keepalive_per_host': self.limits.max_keepalive_connections,
+            'keepalive_expiry': self.limits.keepalive_expiry,
+            'hosts': hosts,
+        }
+
+
+def get_agent_client(request) -> AgentHTTPClient:
+    """Return the shared Agent HTTP client created in the app lifespan"""
+    client = getattr(request.app.state, 'agent_client', None)
+    if client is None or client.closed:
+        # Imported lazily so the client module stays framework-agnostic
+        from fastapi import HTTPException, status
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Agent HTTP client not available"
+        )
+    return client
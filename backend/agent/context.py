@@ -0,0 +1,164 @@
+"""
+DOM360 Agent Context Window
+Bounds the conversation history sent to the Agent API by turns and tokens
+"""
+import json
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing (role, separators) counted on top of the content
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _parse_limit(value: Any) -> int:
+    """Non-negative whole number (0 disables the limit)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"expected a number, got {value!r}")
+    number = float(value)
+    if not math.isfinite(number) or number < 0 or number != int(number):
+        raise ValueError(f"expected a whole number >= 0, got {value!r}")
+    return int(number)
+
+
+def _parse_ratio(value: Any) -> float:
+    """Finite number > 0"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"expected a number, got {value!r}")
+    number = float(value)
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"expected a number > 0, got {value!r}")
+    return number
+
+
+def _parse_bool(value: Any) -> bool:
+    """JSON boolean, or the strings 'true'/'false'"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+# Option -> (parser, built-in default used when the defaults lack it)
+_OPTIONS = {
+    'max_turns': (_parse_limit, 20),
+    'max_tokens': (_parse_limit, 4000),
+    'pin_first_turn': (_parse_bool, False),
+    'chars_per_token': (_parse_ratio, 4.0),
+}
+
+
+class ContextWindow:
+    """
+    History window for one Agent API call
+
+    Keeps the most recent turns (a user message plus the replies that
+    follow it) that fit both `max_turns` and `max_tokens`; 0 disables a
+    limit. With `pin_first_turn` the opening turn is always kept when it
+    fits, since it usually carries the lead's original request; with
+    `max_turns=1` the single turn goes to the latest exchange and nothing
+    is pinned. Tokens are estimated locally as characters /
+    `chars_per_token`.
+
+    Usage:
+        window = ContextWindow.from_config(defaults, inbox_agent_config)
+        messages, report = window.apply(history)
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        max_tokens: int = 4000,
+        pin_first_turn: bool = False,
+        chars_per_token: float = 4.0
+    ):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.pin_first_turn = pin_first_turn
+        self.chars_per_token = chars_per_token
+
+    @classmethod
+    def from_config(cls, defaults: Dict, agent_config: Optional[Dict] = None) -> 'ContextWindow':
+        """
+        Apply inbox_agents.config['history'] overrides on top of the defaults
+
+        Overrides are edited per inbox, so an invalid one (wrong type,
+        negative limit, chars_per_token <= 0) is logged and replaced by the
+        default instead of failing every chat turn of that inbox.
+        """
+        overrides = (agent_config or {}).get('history') if isinstance(agent_config, dict) else None
+        if overrides is None:
+            overrides = {}
+        elif not isinstance(overrides, dict):
+            logger.warning(f"Ignoring agent history config: expected an object, got {overrides!r}")
+            overrides = {}
+
+        options = {}
+        for key, (parse, fallback) in _OPTIONS.items():
+            default = parse(defaults.get(key, fallback))
+            value = overrides.get(key)
+            if value is None:
+                options[key] = default
+                continue
+            try:
+                options[key] = parse(value)
+            except ValueError as e:
+                logger.warning(f"Invalid agent history option {key} ({e}); using default {default!r}")
+                options[key] = default
+        return cls(**options)
+
+    def estimate_tokens(self, messages: List[Dict]) -> int:
+        return sum(
+            math.ceil(len(m.get('content') or '') / self.chars_per_token) + _MESSAGE_OVERHEAD_TOKENS
+            for m in messages
+        )
+
+    @staticmethod
+    def _split_turns(history: List[Dict]) -> List[List[Dict]]:
+        turns: List[List[Dict]] = []
+        for message in history:
+            if message.get('role') == 'user' or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def apply(self, history: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """Return (messages to send, report of what was sent)"""
+        turns = self._split_turns(history)
+
+        pinned: List[Dict] = []
+        # Pinning needs room for at least one recent turn besides it
+        if self.pin_first_turn and turns and self.max_turns != 1:
+            first = turns[0]
+            if not self.max_tokens or self.estimate_tokens(first) <= self.max_tokens:
+                pinned = first
+                turns = turns[1:]
+
+        budget = self.max_tokens - self.estimate_tokens(pinned) if self.max_tokens else None
+        turn_limit = self.max_turns - (1 if pinned else 0) if self.max_turns else None
+
+        selected: List[List[Dict]] = []
+        for turn in reversed(turns):
+            if turn_limit is not None and len(selected) >= turn_limit:
+                break
+            tokens = self.estimate_tokens(turn)
+            if budget is not None:
+                if tokens > budget:
+                    break
+                budget -= tokens
+            selected.append(turn)
+        selected.reverse()
+
+        messages = pinned + [m for turn in selected for m in turn]
+        report = {
+            'messages_total': len(history),
+            'messages_sent': len(messages),
+            'turns_sent': len(selected) + (1 if pinned else 0),
+            'first_turn_pinned': bool(pinned),
+            'estimated_tokens': self.estimate_tokens(messages),
+            'bytes': len(json.dumps(messages, ensure_ascii=False).encode('utf-8')),
+        }
+        return messages, report
@@ -3,5 +3,18 @@ DOM360 API Module
 """
 from .auth_routes import router as auth_router
 from .admin import router as admin_router
+from .pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from .request_logging import ApiLogMiddleware
+from .server_timing import ServerTimingMiddleware
+from .metrics import (
+    router as metrics_router,
+    MetricsSampler,
+    PrometheusMiddleware,
+    get_metrics_sampler,
+    observe_agent_call,
+    record_agent_tokens
+)
 
-__all__ = ['auth_router', 'admin_router']
+__all__ = ['auth_router', 'admin_router', 'NEXT_CURSOR_HEADER', 'encode_cursor', 'decode_cursor',
+           'ApiLogMiddleware', 'ServerTimingMiddleware', 'metrics_router', 'MetricsSampler',
+           'PrometheusMiddleware', 'get_metrics_sampler', 'observe_agent_call', 'record_agent_tokens']
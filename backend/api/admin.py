@@ -5,13 +5,14 @@ import json
 import logging
 import sys
 import os
+from datetime import date, datetime, timezone
 from typing import Optional, List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-import psycopg2
+import psycopg
 from pydantic import BaseModel, Field
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 
 try:
     from ..auth import (
@@ -20,8 +21,24 @@ try:
         get_current_user,
         require_master,
         set_rls_context,
-        log_audit
+        log_audit,
+        password_hasher,
+        token_cache
     )
+    from ..db import (
+        get_api_log_writer,
+        get_audit_writer,
+        get_dashboard_cache,
+        get_history_cache,
+        get_metrics_snapshot_refresher,
+        get_partition_manager,
+        get_settings_cache,
+        get_usage_aggregator,
+        statements,
+        unit_of_work
+    )
+    from ..agent import get_agent_client
+    from .metrics import get_metrics_sampler
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
     from auth import (
@@ -30,8 +47,24 @@ except ImportError:
         get_current_user,
         require_master,
         set_rls_context,
-        log_audit
+        log_audit,
+        password_hasher,
+        token_cache
+    )
+    from db import (
+        get_api_log_writer,
+        get_audit_writer,
+        get_dashboard_cache,
+        get_history_cache,
+        get_metrics_snapshot_refresher,
+        get_partition_manager,
+        get_settings_cache,
+        get_usage_aggregator,
+        statements,
+        unit_of_work
     )
+    from agent import get_agent_client
+    from api.metrics import get_metrics_sampler
 
 logger = logging.getLogger(__name__)
 
@@ -139,28 +172,23 @@ class MasterSettingsUpdate(BaseModel):
 class GlobalMetricsResponse(BaseModel):
     """Global metrics response"""
     total_tenants: int
-    active_tenants: int
+    active_tenants: Optional[int] = None
     total_inboxes: int
+    active_inboxes: Optional[int] = None
     total_conversations: int
+    open_conversations: Optional[int] = None
     total_messages: int
-    total_tokens: int
-    avg_latency_ms: int
+    total_users: Optional[int] = None
+    active_users: Optional[int] = None
+    total_input_tokens: Optional[int] = None
+    total_output_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    avg_latency_ms: Optional[int] = None
     period_start: Optional[str] = None
     period_end: Optional[str] = None
-
-
-# ============================================================================
-# Helper Functions
-# ============================================================================
-
-def get_db_from_request(request: Request):
-    """Get database connection from request state"""
-    if not hasattr(request.state, 'db'):
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection not available"
-        )
-    return request.state.db
+    source: str
+    as_of: Optional[str] = None
+    data_age_seconds: Optional[float] = None
 
 
 # ============================================================================
@@ -178,121 +206,118 @@ async def create_tenant(
     
     Creates a new tenant organization in the system.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Check for existing tenant by id/chatwoot_account_id or name to provide clearer errors
-        cursor.execute("SELECT id, name, chatwoot_account_id FROM tenants WHERE id = %s OR chatwoot_account_id = %s OR LOWER(name) = LOWER(%s)", (data.chatwoot_account_id, data.chatwoot_account_id, data.name))
-        existing = cursor.fetchone()
-        if existing:
-            # ID / chatwoot_account_id conflict
-            if existing.get('id') == data.chatwoot_account_id or existing.get('chatwoot_account_id') == data.chatwoot_account_id:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists (id={existing.get('id')})"
-                )
-            # Name conflict
-            if existing.get('name') and existing.get('name').lower() == data.name.lower():
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Tenant with name '{data.name}' already exists"
-                )
-
-        # The tenants table in the migrated DB uses integer id (chatwoot_account_id) and does
-        # not provide an automatic sequence. We must explicitly insert id = chatwoot_account_id.
-        query = """
-            INSERT INTO tenants (id, name, chatwoot_account_id, is_active)
-            VALUES (%s, %s, %s, TRUE)
-            RETURNING id, name, is_active, chatwoot_account_id, created_at, updated_at
-        """
-
-        cursor.execute(query, (
-            data.chatwoot_account_id,
-            data.name,
-            data.chatwoot_account_id
-        ))
-        
-        tenant = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="CREATE_TENANT",
-            resource_type="tenant",
-            resource_id=str(tenant['id']),
-            new_values=dict(tenant),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+        try:
+            # Check for existing tenant by id/chatwoot_account_id or name to provide clearer errors
+            await cursor.execute("SELECT id, name, chatwoot_account_id FROM tenants WHERE id = %s OR chatwoot_account_id = %s OR LOWER(name) = LOWER(%s)", (data.chatwoot_account_id, data.chatwoot_account_id, data.name))
+            existing = await cursor.fetchone()
+            if existing:
+                # ID / chatwoot_account_id conflict
+                if existing.get('id') == data.chatwoot_account_id or existing.get('chatwoot_account_id') == data.chatwoot_account_id:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists (id={existing.get('id')})"
+                    )
+                # Name conflict
+                if existing.get('name') and existing.get('name').lower() == data.name.lower():
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Tenant with name '{data.name}' already exists"
+                    )
+
+            # The tenants table in the migrated DB uses integer id (chatwoot_account_id) and does
+            # not provide an automatic sequence. We must explicitly insert id = chatwoot_account_id.
+            query = """
+                INSERT INTO tenants (id, name, chatwoot_account_id, is_active)
+                VALUES (%s, %s, %s, TRUE)
+                RETURNING id, name, is_active, chatwoot_account_id, created_at, updated_at
+            """
+
+            await cursor.execute(query, (
+                data.chatwoot_account_id,
+                data.name,
+                data.chatwoot_account_id
+            ))
+        
+            tenant = await cursor.fetchone()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="CREATE_TENANT",
+                resource_type="tenant",
+                resource_id=str(tenant['id']),
+                new_values=dict(tenant),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        logger.info(f"Tenant created: {tenant['name']} (ID: {tenant['id']}) by {user.username}")
+            logger.info(f"Tenant created: {tenant['name']} (ID: {tenant['id']}) by {user.username}")
         
-        result = dict(tenant)
-        # Convert datetime to ISO strings
-        if result.get('created_at'):
-            result['created_at'] = result['created_at'].isoformat()
-        if result.get('updated_at'):
-            result['updated_at'] = result['updated_at'].isoformat()
-        result['inbox_count'] = 0
-        result['user_count'] = 0
-        result['conversation_count'] = 0
+            result = dict(tenant)
+            # Convert datetime to ISO strings
+            if result.get('created_at'):
+                result['created_at'] = result['created_at'].isoformat()
+            if result.get('updated_at'):
+                result['updated_at'] = result['updated_at'].isoformat()
+            result['inbox_count'] = 0
+            result['user_count'] = 0
+            result['conversation_count'] = 0
         
-        return result
+            return result
         
-    except psycopg2.IntegrityError as e:
-        # Handle DB integrity errors (duplicate keys) with more specific messages
-        conn.rollback()
-        logger.error(f"Error creating tenant: {e}")
+        except psycopg.IntegrityError as e:
+            # Handle DB integrity errors (duplicate keys) with more specific messages
+            logger.error(f"Error creating tenant: {e}")
 
-        msg = str(e).lower()
-        constraint = None
-        try:
-            constraint = e.diag.constraint_name if hasattr(e, 'diag') else None
-        except Exception:
+            msg = str(e).lower()
             constraint = None
+            try:
+                constraint = e.diag.constraint_name if hasattr(e, 'diag') else None
+            except Exception:
+                constraint = None
 
-        # Primary key / id conflict
-        if constraint and 'tenants_pkey' in constraint.lower():
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
-            )
+            # Primary key / id conflict
+            if constraint and 'tenants_pkey' in constraint.lower():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
+                )
 
-        # Generic textual checks
-        if 'key (id)' in msg or 'tenants_pkey' in msg:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
-            )
+            # Generic textual checks
+            if 'key (id)' in msg or 'tenants_pkey' in msg:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
+                )
+
+            if 'chatwoot_account_id' in msg or 'chatwoot_account' in msg:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
+                )
 
-        if 'chatwoot_account_id' in msg or 'chatwoot_account' in msg:
+            if 'name' in msg or ('tenant' in msg and 'name' in msg):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Tenant with name '{data.name}' already exists"
+                )
+
+            # Fallback for other integrity errors
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Tenant with chatwoot_account_id '{data.chatwoot_account_id}' already exists"
+                detail=f"Tenant creation conflict: {str(e)}"
             )
-
-        if 'name' in msg or ('tenant' in msg and 'name' in msg):
+        except Exception as e:
+            logger.error(f"Error creating tenant: {e}")
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Tenant with name '{data.name}' already exists"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create tenant: {str(e)}"
             )
-
-        # Fallback for other integrity errors
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Tenant creation conflict: {str(e)}"
-        )
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error creating tenant: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create tenant: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.get("/tenants", response_model=List[TenantResponse])
@@ -306,55 +331,55 @@ async def list_tenants(
     """
     **[MASTER ONLY]** List all tenants with metrics
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        query = """
-            SELECT 
-                t.id, t.name, t.is_active,
-                t.chatwoot_account_id,
-                t.created_at, t.updated_at,
-                COUNT(DISTINCT ti.inbox_id) as inbox_count,
-                COUNT(DISTINCT u.id) as user_count,
-                COUNT(DISTINCT c.id) as conversation_count
-            FROM tenants t
-            LEFT JOIN tenant_inboxes ti ON ti.tenant_id = t.id AND ti.is_active = TRUE
-            LEFT JOIN users u ON u.tenant_id = t.id AND u.is_active = TRUE
-            LEFT JOIN conversations c ON c.tenant_id = t.id
-            WHERE 1=1
-        """
-        params = []
-        
-        if is_active is not None:
-            query += " AND t.is_active = %s"
-            params.append(is_active)
-        
-        query += """
-            GROUP BY t.id, t.name, t.is_active, t.chatwoot_account_id, 
-                     t.created_at, t.updated_at
-            ORDER BY t.created_at DESC
-            LIMIT %s OFFSET %s
-        """
-        params.extend([limit, offset])
-        
-        cursor.execute(query, tuple(params))
-        tenants = cursor.fetchall()
-        
-        # Convert datetime objects to ISO strings
-        result = []
-        for t in tenants:
-            tenant_dict = dict(t)
-            if tenant_dict.get('created_at'):
-                tenant_dict['created_at'] = tenant_dict['created_at'].isoformat()
-            if tenant_dict.get('updated_at'):
-                tenant_dict['updated_at'] = tenant_dict['updated_at'].isoformat()
-            result.append(tenant_dict)
+        try:
+            query = """
+                SELECT 
+                    t.id, t.name, t.is_active,
+                    t.chatwoot_account_id,
+                    t.created_at, t.updated_at,
+                    COUNT(DISTINCT ti.inbox_id) as inbox_count,
+                    COUNT(DISTINCT u.id) as user_count,
+                    COUNT(DISTINCT c.id) as conversation_count
+                FROM tenants t
+                LEFT JOIN tenant_inboxes ti ON ti.tenant_id = t.id AND ti.is_active = TRUE
+                LEFT JOIN users u ON u.tenant_id = t.id AND u.is_active = TRUE
+                LEFT JOIN conversations c ON c.tenant_id = t.id
+                WHERE 1=1
+            """
+            params = []
+        
+            if is_active is not None:
+                query += " AND t.is_active = %s"
+                params.append(is_active)
+        
+            query += """
+                GROUP BY t.id, t.name, t.is_active, t.chatwoot_account_id, 
+                         t.created_at, t.updated_at
+                ORDER BY t.created_at DESC
+                LIMIT %s OFFSET %s
+            """
+            params.extend([limit, offset])
+        
+            await cursor.execute(query, tuple(params))
+            tenants = await cursor.fetchall()
+        
+            # Convert datetime objects to ISO strings
+            result = []
+            for t in tenants:
+                tenant_dict = dict(t)
+                if tenant_dict.get('created_at'):
+                    tenant_dict['created_at'] = tenant_dict['created_at'].isoformat()
+                if tenant_dict.get('updated_at'):
+                    tenant_dict['updated_at'] = tenant_dict['updated_at'].isoformat()
+                result.append(tenant_dict)
         
-        return result
+            return result
         
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.get("/tenants/{tenant_id}", response_model=TenantResponse)
@@ -366,44 +391,44 @@ async def get_tenant(
     """
     **[MASTER ONLY]** Get tenant details
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        query = """
-            SELECT 
-                t.*,
-                COUNT(DISTINCT ti.inbox_id) as inbox_count,
-                COUNT(DISTINCT u.id) as user_count,
-                COUNT(DISTINCT c.id) as conversation_count
-            FROM tenants t
-            LEFT JOIN tenant_inboxes ti ON ti.tenant_id = t.id AND ti.is_active = TRUE
-            LEFT JOIN users u ON u.tenant_id = t.id AND u.is_active = TRUE
-            LEFT JOIN conversations c ON c.tenant_id = t.id
-            WHERE t.id = %s
-            GROUP BY t.id
-        """
-        
-        cursor.execute(query, (tenant_id,))
-        tenant = cursor.fetchone()
-        
-        if not tenant:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {tenant_id} not found"
-            )
+        try:
+            query = """
+                SELECT 
+                    t.*,
+                    COUNT(DISTINCT ti.inbox_id) as inbox_count,
+                    COUNT(DISTINCT u.id) as user_count,
+                    COUNT(DISTINCT c.id) as conversation_count
+                FROM tenants t
+                LEFT JOIN tenant_inboxes ti ON ti.tenant_id = t.id AND ti.is_active = TRUE
+                LEFT JOIN users u ON u.tenant_id = t.id AND u.is_active = TRUE
+                LEFT JOIN conversations c ON c.tenant_id = t.id
+                WHERE t.id = %s
+                GROUP BY t.id
+            """
+        
+            await cursor.execute(query, (tenant_id,))
+            tenant = await cursor.fetchone()
+        
+            if not tenant:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Tenant {tenant_id} not found"
+                )
         
-        # Convert datetime objects to ISO strings
-        tenant_dict = dict(tenant)
-        if tenant_dict.get('created_at'):
-            tenant_dict['created_at'] = tenant_dict['created_at'].isoformat()
-        if tenant_dict.get('updated_at'):
-            tenant_dict['updated_at'] = tenant_dict['updated_at'].isoformat()
+            # Convert datetime objects to ISO strings
+            tenant_dict = dict(tenant)
+            if tenant_dict.get('created_at'):
+                tenant_dict['created_at'] = tenant_dict['created_at'].isoformat()
+            if tenant_dict.get('updated_at'):
+                tenant_dict['updated_at'] = tenant_dict['updated_at'].isoformat()
         
-        return tenant_dict
+            return tenant_dict
         
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.put("/tenants/{tenant_id}", response_model=TenantResponse)
@@ -416,39 +441,75 @@ async def update_tenant(
     """
     **[MASTER ONLY]** Update tenant
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get existing tenant
-        cursor.execute("SELECT * FROM tenants WHERE id = %s", (tenant_id,))
-        existing = cursor.fetchone()
-        
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {tenant_id} not found"
-            )
-        
-        # Build update
-        updates = []
-        params = []
-        
-        if data.name is not None:
-            updates.append("name = %s")
-            params.append(data.name)
+        try:
+            # Get existing tenant
+            await cursor.execute("SELECT * FROM tenants WHERE id = %s", (tenant_id,))
+            existing = await cursor.fetchone()
         
-        if data.is_active is not None:
-            updates.append("is_active = %s")
-            params.append(data.is_active)
+            if not existing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Tenant {tenant_id} not found"
+                )
         
-        if data.chatwoot_account_id is not None:
-            updates.append("chatwoot_account_id = %s")
-            params.append(data.chatwoot_account_id)
+            # Build update
+            updates = []
+            params = []
+        
+            if data.name is not None:
+                updates.append("name = %s")
+                params.append(data.name)
+        
+            if data.is_active is not None:
+                updates.append("is_active = %s")
+                params.append(data.is_active)
+        
+            if data.chatwoot_account_id is not None:
+                updates.append("chatwoot_account_id = %s")
+                params.append(data.chatwoot_account_id)
+        
+            if not updates:
+                # No updates, return existing
+                result = dict(existing)
+                # Convert datetime to ISO strings
+                if result.get('created_at'):
+                    result['created_at'] = result['created_at'].isoformat()
+                if result.get('updated_at'):
+                    result['updated_at'] = result['updated_at'].isoformat()
+                result['inbox_count'] = 0
+                result['user_count'] = 0
+                result['conversation_count'] = 0
+                return result
+        
+            updates.append("updated_at = NOW()")
+            params.append(tenant_id)
+        
+            query = f"""
+                UPDATE tenants 
+                SET {', '.join(updates)}
+                WHERE id = %s
+                RETURNING *
+            """
+        
+            await cursor.execute(query, tuple(params))
+            updated = await cursor.fetchone()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="UPDATE_TENANT",
+                resource_type="tenant",
+                resource_id=str(tenant_id),  # Convert to string for audit log
+                old_values=dict(existing),
+                new_values=dict(updated),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        if not updates:
-            # No updates, return existing
-            result = dict(existing)
+            result = dict(updated)
             # Convert datetime to ISO strings
             if result.get('created_at'):
                 result['created_at'] = result['created_at'].isoformat()
@@ -457,57 +518,19 @@ async def update_tenant(
             result['inbox_count'] = 0
             result['user_count'] = 0
             result['conversation_count'] = 0
-            return result
-        
-        updates.append("updated_at = NOW()")
-        params.append(tenant_id)
-        
-        query = f"""
-            UPDATE tenants 
-            SET {', '.join(updates)}
-            WHERE id = %s
-            RETURNING *
-        """
-        
-        cursor.execute(query, tuple(params))
-        updated = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="UPDATE_TENANT",
-            resource_type="tenant",
-            resource_id=str(tenant_id),  # Convert to string for audit log
-            old_values=dict(existing),
-            new_values=dict(updated),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
         
-        result = dict(updated)
-        # Convert datetime to ISO strings
-        if result.get('created_at'):
-            result['created_at'] = result['created_at'].isoformat()
-        if result.get('updated_at'):
-            result['updated_at'] = result['updated_at'].isoformat()
-        result['inbox_count'] = 0
-        result['user_count'] = 0
-        result['conversation_count'] = 0
-        
-        return result
+            return result
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error updating tenant: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update tenant: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating tenant: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update tenant: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 @router.delete("/tenants/{tenant_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -521,48 +544,46 @@ async def delete_tenant(
     
     WARNING: This will cascade delete all related data (users, conversations, etc.)
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get existing tenant
-        cursor.execute("SELECT * FROM tenants WHERE id = %s", (tenant_id,))
-        existing = cursor.fetchone()
+        try:
+            # Get existing tenant
+            await cursor.execute("SELECT * FROM tenants WHERE id = %s", (tenant_id,))
+            existing = await cursor.fetchone()
         
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {tenant_id} not found"
-            )
+            if not existing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Tenant {tenant_id} not found"
+                )
         
-        # Delete tenant (CASCADE will handle related records)
-        cursor.execute("DELETE FROM tenants WHERE id = %s", (tenant_id,))
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="DELETE_TENANT",
-            resource_type="tenant",
-            resource_id=str(tenant_id),  # Convert to string for audit log
-            old_values=dict(existing),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+            # Delete tenant (CASCADE will handle related records)
+            await cursor.execute("DELETE FROM tenants WHERE id = %s", (tenant_id,))
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="DELETE_TENANT",
+                resource_type="tenant",
+                resource_id=str(tenant_id),  # Convert to string for audit log
+                old_values=dict(existing),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        return None
+            return None
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error deleting tenant: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete tenant: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting tenant: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete tenant: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 # ============================================================================
@@ -582,55 +603,55 @@ async def list_all_inboxes(
     
     Used for associating inboxes to tenants.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        query = """
-            SELECT 
-                i.id, i.tenant_id, i.name, i.inbox_type, i.chatwoot_inbox_id as external_id,
-                i.is_active, i.created_at, i.updated_at,
-                i.config->>'agent_type' as agent_type,
-                t.name as tenant_name,
-                COUNT(DISTINCT c.id) as conversation_count
-            FROM inboxes i
-            LEFT JOIN tenants t ON t.id = i.tenant_id
-            LEFT JOIN conversations c ON c.inbox_id = i.id
-            WHERE 1=1
-        """
-        params = []
-        
-        if is_active is not None:
-            query += " AND i.is_active = %s"
-            params.append(is_active)
-        
-        query += """
-            GROUP BY i.id, i.tenant_id, i.name, i.inbox_type, i.chatwoot_inbox_id,
-                     i.is_active, i.created_at, i.updated_at, i.config, t.name
-            ORDER BY i.created_at DESC
-            LIMIT %s OFFSET %s
-        """
-        params.extend([limit, offset])
-        
-        cursor.execute(query, tuple(params))
-        inboxes = cursor.fetchall()
-        
-        # Convert datetime to ISO string and set default agent_type
-        result = []
-        for inbox in inboxes:
-            inbox_dict = dict(inbox)
-            if inbox_dict.get('created_at'):
-                inbox_dict['created_at'] = inbox_dict['created_at'].isoformat()
-            if inbox_dict.get('updated_at'):
-                inbox_dict['updated_at'] = inbox_dict['updated_at'].isoformat()
-            if not inbox_dict.get('agent_type'):
-                inbox_dict['agent_type'] = 'SDR'
-            result.append(inbox_dict)
-        
-        return result
-        
-    finally:
-        cursor.close()
+        try:
+            query = """
+                SELECT 
+                    i.id, i.tenant_id, i.name, i.inbox_type, i.chatwoot_inbox_id as external_id,
+                    i.is_active, i.created_at, i.updated_at,
+                    i.config->>'agent_type' as agent_type,
+                    t.name as tenant_name,
+                    COUNT(DISTINCT c.id) as conversation_count
+                FROM inboxes i
+                LEFT JOIN tenants t ON t.id = i.tenant_id
+                LEFT JOIN conversations c ON c.inbox_id = i.id
+                WHERE 1=1
+            """
+            params = []
+        
+            if is_active is not None:
+                query += " AND i.is_active = %s"
+                params.append(is_active)
+        
+            query += """
+                GROUP BY i.id, i.tenant_id, i.name, i.inbox_type, i.chatwoot_inbox_id,
+                         i.is_active, i.created_at, i.updated_at, i.config, t.name
+                ORDER BY i.created_at DESC
+                LIMIT %s OFFSET %s
+            """
+            params.extend([limit, offset])
+        
+            await cursor.execute(query, tuple(params))
+            inboxes = await cursor.fetchall()
+        
+            # Convert datetime to ISO string and set default agent_type
+            result = []
+            for inbox in inboxes:
+                inbox_dict = dict(inbox)
+                if inbox_dict.get('created_at'):
+                    inbox_dict['created_at'] = inbox_dict['created_at'].isoformat()
+                if inbox_dict.get('updated_at'):
+                    inbox_dict['updated_at'] = inbox_dict['updated_at'].isoformat()
+                if not inbox_dict.get('agent_type'):
+                    inbox_dict['agent_type'] = 'SDR'
+                result.append(inbox_dict)
+        
+            return result
+        
+        finally:
+            await cursor.close()
 
 
 @router.post("/inboxes", response_model=InboxResponse, status_code=status.HTTP_201_CREATED)
@@ -642,113 +663,110 @@ async def create_inbox(
     """
     **[MASTER ONLY]** Create new inbox for a tenant
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Verify tenant exists
-        cursor.execute("SELECT id, name FROM tenants WHERE id = %s", (data.tenant_id,))
-        tenant = cursor.fetchone()
-        if not tenant:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {data.tenant_id} not found"
-            )
+        try:
+            # Verify tenant exists
+            await cursor.execute("SELECT id, name FROM tenants WHERE id = %s", (data.tenant_id,))
+            tenant = await cursor.fetchone()
+            if not tenant:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Tenant {data.tenant_id} not found"
+                )
         
-        # Build config with agent_type
-        config = {"agent_type": data.agent_type or "SDR"}
-        
-        # Insert inbox (note: id and chatwoot_inbox_id must be provided)
-        # The database schema requires `id` (integer) to be provided (no default sequence),
-        # so we must set id = external_id (chatwoot inbox id).
-        query = """
-            INSERT INTO inboxes (id, tenant_id, name, chatwoot_inbox_id, config, is_active)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id, tenant_id, name, chatwoot_inbox_id, inbox_type, is_active, created_at, updated_at, config
-        """
-
-        # Use external_id as both id and chatwoot_inbox_id if provided
-        inbox_id = int(data.external_id) if data.external_id else None
-        if not inbox_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="external_id (inbox ID) is required"
-            )
+            # Build config with agent_type
+            config = {"agent_type": data.agent_type or "SDR"}
+        
+            # Insert inbox (note: id and chatwoot_inbox_id must be provided)
+            # The database schema requires `id` (integer) to be provided (no default sequence),
+            # so we must set id = external_id (chatwoot inbox id).
+            query = """
+                INSERT INTO inboxes (id, tenant_id, name, chatwoot_inbox_id, config, is_active)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id, tenant_id, name, chatwoot_inbox_id, inbox_type, is_active, created_at, updated_at, config
+            """
+
+            # Use external_id as both id and chatwoot_inbox_id if provided
+            inbox_id = int(data.external_id) if data.external_id else None
+            if not inbox_id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="external_id (inbox ID) is required"
+                )
 
-        cursor.execute(query, (
-            inbox_id,
-            data.tenant_id,
-            data.name,
-            inbox_id,
-            json.dumps(config),
-            data.is_active
-        ))
-        
-        new_inbox = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="CREATE_INBOX",
-            resource_type="inbox",
-            resource_id=new_inbox['id'],
-            new_values=dict(new_inbox),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+            await cursor.execute(query, (
+                inbox_id,
+                data.tenant_id,
+                data.name,
+                inbox_id,
+                json.dumps(config),
+                data.is_active
+            ))
+        
+            new_inbox = await cursor.fetchone()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="CREATE_INBOX",
+                resource_type="inbox",
+                resource_id=new_inbox['id'],
+                new_values=dict(new_inbox),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        # Format response
-        result = dict(new_inbox)
-        result['created_at'] = result['created_at'].isoformat()
-        result['updated_at'] = result['updated_at'].isoformat()
-        result['agent_type'] = result['config'].get('agent_type', 'SDR')
-        result['external_id'] = str(result['chatwoot_inbox_id'])  # Map chatwoot_inbox_id to external_id
-        result['tenant_name'] = tenant['name']
-        result['conversation_count'] = 0
-        
-        return result
-        
-    except HTTPException:
-        raise
-    except psycopg2.IntegrityError as e:
-        # Handle DB integrity errors like duplicate primary key (id)
-        conn.rollback()
-        logger.error(f"Integrity error creating inbox: {e}")
-
-        msg = str(e).lower()
-        constraint = None
-        try:
-            constraint = e.diag.constraint_name if hasattr(e, 'diag') else None
-        except Exception:
+            # Format response
+            result = dict(new_inbox)
+            result['created_at'] = result['created_at'].isoformat()
+            result['updated_at'] = result['updated_at'].isoformat()
+            result['agent_type'] = result['config'].get('agent_type', 'SDR')
+            result['external_id'] = str(result['chatwoot_inbox_id'])  # Map chatwoot_inbox_id to external_id
+            result['tenant_name'] = tenant['name']
+            result['conversation_count'] = 0
+        
+            return result
+        
+        except HTTPException:
+            raise
+        except psycopg.IntegrityError as e:
+            # Handle DB integrity errors like duplicate primary key (id)
+            logger.error(f"Integrity error creating inbox: {e}")
+
+            msg = str(e).lower()
             constraint = None
+            try:
+                constraint = e.diag.constraint_name if hasattr(e, 'diag') else None
+            except Exception:
+                constraint = None
+
+            if constraint and 'inboxes_pkey' in constraint.lower():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Inbox with id '{inbox_id}' already exists"
+                )
 
-        if constraint and 'inboxes_pkey' in constraint.lower():
+            if 'key (id)' in msg or 'inboxes_pkey' in msg:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Inbox with id '{inbox_id}' already exists"
+                )
+
+            # Fallback for other integrity errors
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Inbox with id '{inbox_id}' already exists"
+                detail=f"Inbox creation conflict: {str(e)}"
             )
-
-        if 'key (id)' in msg or 'inboxes_pkey' in msg:
+        except Exception as e:
+            logger.error(f"Error creating inbox: {e}")
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Inbox with id '{inbox_id}' already exists"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create inbox: {str(e)}"
             )
-
-        # Fallback for other integrity errors
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Inbox creation conflict: {str(e)}"
-        )
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error creating inbox: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create inbox: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.put("/inboxes/{inbox_id}", response_model=InboxResponse)
@@ -761,104 +779,102 @@ async def update_inbox(
     """
     **[MASTER ONLY]** Update inbox
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get existing inbox
-        cursor.execute("SELECT * FROM inboxes WHERE id = %s", (inbox_id,))
-        existing = cursor.fetchone()
+        try:
+            # Get existing inbox
+            await cursor.execute("SELECT * FROM inboxes WHERE id = %s", (inbox_id,))
+            existing = await cursor.fetchone()
         
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Inbox {inbox_id} not found"
-            )
+            if not existing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Inbox {inbox_id} not found"
+                )
+        
+            # Build update
+            updates = []
+            params = []
+        
+            if data.name is not None:
+                updates.append("name = %s")
+                params.append(data.name)
         
-        # Build update
-        updates = []
-        params = []
+            if data.external_id is not None:
+                updates.append("chatwoot_inbox_id = %s")
+                params.append(int(data.external_id))
         
-        if data.name is not None:
-            updates.append("name = %s")
-            params.append(data.name)
+            if data.is_active is not None:
+                updates.append("is_active = %s")
+                params.append(data.is_active)
         
-        if data.external_id is not None:
-            updates.append("chatwoot_inbox_id = %s")
-            params.append(int(data.external_id))
+            # Handle agent_type in config
+            if data.agent_type is not None:
+                current_config = existing['config'] or {}
+                current_config['agent_type'] = data.agent_type
+                updates.append("config = %s")
+                params.append(json.dumps(current_config))
         
-        if data.is_active is not None:
-            updates.append("is_active = %s")
-            params.append(data.is_active)
+            if not updates:
+                # No updates, return existing
+                result = dict(existing)
+                result['created_at'] = result['created_at'].isoformat()
+                result['updated_at'] = result['updated_at'].isoformat()
+                result['agent_type'] = result['config'].get('agent_type', 'SDR') if result['config'] else 'SDR'
+                result['external_id'] = str(result['chatwoot_inbox_id'])  # Map chatwoot_inbox_id to external_id
+                result['conversation_count'] = 0
+                return result
+        
+            updates.append("updated_at = NOW()")
+            params.append(inbox_id)
+        
+            query = f"""
+                UPDATE inboxes 
+                SET {', '.join(updates)}
+                WHERE id = %s
+                RETURNING *
+            """
+        
+            await cursor.execute(query, tuple(params))
+            updated = await cursor.fetchone()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="UPDATE_INBOX",
+                resource_type="inbox",
+                resource_id=inbox_id,
+                old_values=dict(existing),
+                new_values=dict(updated),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        # Handle agent_type in config
-        if data.agent_type is not None:
-            current_config = existing['config'] or {}
-            current_config['agent_type'] = data.agent_type
-            updates.append("config = %s")
-            params.append(json.dumps(current_config))
+            # Get tenant name
+            await cursor.execute("SELECT name FROM tenants WHERE id = %s", (updated['tenant_id'],))
+            tenant = await cursor.fetchone()
         
-        if not updates:
-            # No updates, return existing
-            result = dict(existing)
+            result = dict(updated)
             result['created_at'] = result['created_at'].isoformat()
             result['updated_at'] = result['updated_at'].isoformat()
             result['agent_type'] = result['config'].get('agent_type', 'SDR') if result['config'] else 'SDR'
             result['external_id'] = str(result['chatwoot_inbox_id'])  # Map chatwoot_inbox_id to external_id
+            result['tenant_name'] = tenant['name'] if tenant else None
             result['conversation_count'] = 0
-            return result
-        
-        updates.append("updated_at = NOW()")
-        params.append(inbox_id)
-        
-        query = f"""
-            UPDATE inboxes 
-            SET {', '.join(updates)}
-            WHERE id = %s
-            RETURNING *
-        """
-        
-        cursor.execute(query, tuple(params))
-        updated = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="UPDATE_INBOX",
-            resource_type="inbox",
-            resource_id=inbox_id,
-            old_values=dict(existing),
-            new_values=dict(updated),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
         
-        # Get tenant name
-        cursor.execute("SELECT name FROM tenants WHERE id = %s", (updated['tenant_id'],))
-        tenant = cursor.fetchone()
-        
-        result = dict(updated)
-        result['created_at'] = result['created_at'].isoformat()
-        result['updated_at'] = result['updated_at'].isoformat()
-        result['agent_type'] = result['config'].get('agent_type', 'SDR') if result['config'] else 'SDR'
-        result['external_id'] = str(result['chatwoot_inbox_id'])  # Map chatwoot_inbox_id to external_id
-        result['tenant_name'] = tenant['name'] if tenant else None
-        result['conversation_count'] = 0
-        
-        return result
+            return result
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error updating inbox: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update inbox: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating inbox: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update inbox: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 @router.delete("/inboxes/{inbox_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -872,48 +888,46 @@ async def delete_inbox(
     
     WARNING: This will cascade delete all related conversations and messages
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get existing inbox
-        cursor.execute("SELECT * FROM inboxes WHERE id = %s", (inbox_id,))
-        existing = cursor.fetchone()
+        try:
+            # Get existing inbox
+            await cursor.execute("SELECT * FROM inboxes WHERE id = %s", (inbox_id,))
+            existing = await cursor.fetchone()
         
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Inbox {inbox_id} not found"
-            )
+            if not existing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Inbox {inbox_id} not found"
+                )
         
-        # Delete inbox (CASCADE will handle related records)
-        cursor.execute("DELETE FROM inboxes WHERE id = %s", (inbox_id,))
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="DELETE_INBOX",
-            resource_type="inbox",
-            resource_id=inbox_id,
-            old_values=dict(existing),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+            # Delete inbox (CASCADE will handle related records)
+            await cursor.execute("DELETE FROM inboxes WHERE id = %s", (inbox_id,))
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="DELETE_INBOX",
+                resource_type="inbox",
+                resource_id=inbox_id,
+                old_values=dict(existing),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        return None
+            return None
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error deleting inbox: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete inbox: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting inbox: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete inbox: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 @router.get("/tenants/{tenant_id}/inboxes", response_model=List[dict])
@@ -925,30 +939,30 @@ async def get_tenant_inboxes(
     """
     **[MASTER ONLY]** Get inboxes associated with a tenant
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        query = """
-            SELECT 
-                i.id, i.name, i.inbox_type, i.is_active,
-                ti.created_at as associated_at,
-                COUNT(DISTINCT c.id) as conversation_count
-            FROM tenant_inboxes ti
-            INNER JOIN inboxes i ON i.id = ti.inbox_id
-            LEFT JOIN conversations c ON c.inbox_id = i.id AND c.tenant_id = ti.tenant_id
-            WHERE ti.tenant_id = %s AND ti.is_active = TRUE
-            GROUP BY i.id, i.name, i.inbox_type, i.is_active, ti.created_at
-            ORDER BY ti.created_at DESC
-        """
+        try:
+            query = """
+                SELECT 
+                    i.id, i.name, i.inbox_type, i.is_active,
+                    ti.created_at as associated_at,
+                    COUNT(DISTINCT c.id) as conversation_count
+                FROM tenant_inboxes ti
+                INNER JOIN inboxes i ON i.id = ti.inbox_id
+                LEFT JOIN conversations c ON c.inbox_id = i.id AND c.tenant_id = ti.tenant_id
+                WHERE ti.tenant_id = %s AND ti.is_active = TRUE
+                GROUP BY i.id, i.name, i.inbox_type, i.is_active, ti.created_at
+                ORDER BY ti.created_at DESC
+            """
         
-        cursor.execute(query, (tenant_id,))
-        inboxes = cursor.fetchall()
+            await cursor.execute(query, (tenant_id,))
+            inboxes = await cursor.fetchall()
         
-        return [dict(inbox) for inbox in inboxes]
+            return [dict(inbox) for inbox in inboxes]
         
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 # ============================================================================
@@ -967,70 +981,68 @@ async def associate_inbox_to_tenant(
     
     Allows a tenant to access an inbox.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Verify tenant exists
-        cursor.execute("SELECT id FROM tenants WHERE id = %s", (tenant_id,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {tenant_id} not found"
-            )
+        try:
+            # Verify tenant exists
+            await cursor.execute("SELECT id FROM tenants WHERE id = %s", (tenant_id,))
+            if not await cursor.fetchone():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Tenant {tenant_id} not found"
+                )
         
-        # Verify inbox exists
-        cursor.execute("SELECT id FROM inboxes WHERE id = %s", (data.inbox_id,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Inbox {data.inbox_id} not found"
+            # Verify inbox exists
+            await cursor.execute("SELECT id FROM inboxes WHERE id = %s", (data.inbox_id,))
+            if not await cursor.fetchone():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Inbox {data.inbox_id} not found"
+                )
+        
+            # Associate
+            query = """
+                INSERT INTO tenant_inboxes (tenant_id, inbox_id, is_active)
+                VALUES (%s, %s, TRUE)
+                ON CONFLICT (tenant_id, inbox_id) DO UPDATE
+                SET is_active = TRUE, updated_at = NOW()
+                RETURNING *
+            """
+        
+            await cursor.execute(query, (tenant_id, data.inbox_id))
+            association = await cursor.fetchone()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="ASSOCIATE_INBOX",
+                resource_type="tenant_inbox",
+                resource_id=f"{tenant_id}:{data.inbox_id}",
+                new_values=dict(association),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
             )
         
-        # Associate
-        query = """
-            INSERT INTO tenant_inboxes (tenant_id, inbox_id, is_active)
-            VALUES (%s, %s, TRUE)
-            ON CONFLICT (tenant_id, inbox_id) DO UPDATE
-            SET is_active = TRUE, updated_at = NOW()
-            RETURNING *
-        """
-        
-        cursor.execute(query, (tenant_id, data.inbox_id))
-        association = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="ASSOCIATE_INBOX",
-            resource_type="tenant_inbox",
-            resource_id=f"{tenant_id}:{data.inbox_id}",
-            new_values=dict(association),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+            return {"message": "Inbox associated successfully", "association": dict(association)}
         
-        return {"message": "Inbox associated successfully", "association": dict(association)}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error associating inbox: {e}")
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error associating inbox: {e}")
+            if "duplicate key" in str(e).lower():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Inbox already associated with tenant"
+                )
         
-        if "duplicate key" in str(e).lower():
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Inbox already associated with tenant"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to associate inbox: {str(e)}"
             )
-        
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to associate inbox: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.post("/tenants/{tenant_id}/inboxes/bulk", status_code=status.HTTP_201_CREATED)
@@ -1045,77 +1057,74 @@ async def associate_multiple_inboxes_to_tenant(
     
     Replaces all current associations with the provided inbox list.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Verify tenant exists
-        cursor.execute("SELECT id FROM tenants WHERE id = %s", (tenant_id,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tenant {tenant_id} not found"
-            )
-        
-        # Deactivate all current associations
-        cursor.execute("""
-            UPDATE tenant_inboxes
-            SET is_active = FALSE, updated_at = NOW()
-            WHERE tenant_id = %s
-        """, (tenant_id,))
-        
-        # Associate new inboxes
-        associated = []
-        for inbox_id in data.inbox_ids:
-            # Verify inbox exists
-            cursor.execute("SELECT id FROM inboxes WHERE id = %s", (inbox_id,))
-            if not cursor.fetchone():
-                conn.rollback()
+        try:
+            # Verify tenant exists
+            await cursor.execute("SELECT id FROM tenants WHERE id = %s", (tenant_id,))
+            if not await cursor.fetchone():
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Inbox {inbox_id} not found"
+                    detail=f"Tenant {tenant_id} not found"
                 )
+        
+            # Deactivate all current associations
+            await cursor.execute("""
+                UPDATE tenant_inboxes
+                SET is_active = FALSE, updated_at = NOW()
+                WHERE tenant_id = %s
+            """, (tenant_id,))
+        
+            # Associate new inboxes
+            associated = []
+            for inbox_id in data.inbox_ids:
+                # Verify inbox exists
+                await cursor.execute("SELECT id FROM inboxes WHERE id = %s", (inbox_id,))
+                if not await cursor.fetchone():
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail=f"Inbox {inbox_id} not found"
+                    )
             
-            # Associate
-            cursor.execute("""
-                INSERT INTO tenant_inboxes (tenant_id, inbox_id, is_active)
-                VALUES (%s, %s, TRUE)
-                ON CONFLICT (tenant_id, inbox_id) DO UPDATE
-                SET is_active = TRUE, updated_at = NOW()
-                RETURNING *
-            """, (tenant_id, inbox_id))
+                # Associate
+                await cursor.execute("""
+                    INSERT INTO tenant_inboxes (tenant_id, inbox_id, is_active)
+                    VALUES (%s, %s, TRUE)
+                    ON CONFLICT (tenant_id, inbox_id) DO UPDATE
+                    SET is_active = TRUE, updated_at = NOW()
+                    RETURNING *
+                """, (tenant_id, inbox_id))
             
-            associated.append(dict(cursor.fetchone()))
-        
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="BULK_ASSOCIATE_INBOXES",
-            resource_type="tenant_inbox",
-            resource_id=str(tenant_id),  # Convert to string for audit log
-            new_values={"inbox_ids": data.inbox_ids},
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+                associated.append(dict(await cursor.fetchone()))
+        
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="BULK_ASSOCIATE_INBOXES",
+                resource_type="tenant_inbox",
+                resource_id=str(tenant_id),  # Convert to string for audit log
+                new_values={"inbox_ids": data.inbox_ids},
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        return {
-            "message": f"Successfully associated {len(associated)} inboxes",
-            "associations": associated
-        }
+            return {
+                "message": f"Successfully associated {len(associated)} inboxes",
+                "associations": associated
+            }
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error bulk associating inboxes: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to associate inboxes: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error bulk associating inboxes: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to associate inboxes: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 @router.delete("/tenants/{tenant_id}/inboxes/{inbox_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1128,40 +1137,38 @@ async def dissociate_inbox_from_tenant(
     """
     **[MASTER ONLY]** Remove inbox association from tenant
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor()
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor()
     
-    try:
-        query = """
-            UPDATE tenant_inboxes
-            SET is_active = FALSE, updated_at = NOW()
-            WHERE tenant_id = %s AND inbox_id = %s
-        """
-        
-        cursor.execute(query, (tenant_id, inbox_id))
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="DISSOCIATE_INBOX",
-            resource_type="tenant_inbox",
-            resource_id=f"{tenant_id}:{inbox_id}",
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
+        try:
+            query = """
+                UPDATE tenant_inboxes
+                SET is_active = FALSE, updated_at = NOW()
+                WHERE tenant_id = %s AND inbox_id = %s
+            """
+        
+            await cursor.execute(query, (tenant_id, inbox_id))
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="DISSOCIATE_INBOX",
+                resource_type="tenant_inbox",
+                resource_id=f"{tenant_id}:{inbox_id}",
+                ip_address=request.client.host if request.client else None,
+                conn=conn
+            )
         
-        return None
+            return None
         
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error dissociating inbox: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to dissociate inbox: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        except Exception as e:
+            logger.error(f"Error dissociating inbox: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to dissociate inbox: {str(e)}"
+            )
+        finally:
+            await cursor.close()
 
 
 # ============================================================================
@@ -1173,7 +1180,8 @@ async def get_global_metrics(
     request: Request,
     user: AuthContext = Depends(require_master),
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    approximate: bool = False
 ):
     """
     **[MASTER ONLY]** Get global system metrics
@@ -1181,19 +1189,170 @@ async def get_global_metrics(
     Query parameters:
     - from_date: YYYY-MM-DD
     - to_date: YYYY-MM-DD
+    - approximate: unfiltered row counts from planner statistics
+
+    Served from the metrics_daily snapshot (migrations 011 and 014), which
+    a background task refreshes once older than METRICS_SNAPSHOT_MAX_AGE
+    seconds; this request only reads it and never scans messages.
+    `source` and `data_age_seconds` tell which one answered and how old
+    it is.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
     try:
-        query = "SELECT * FROM get_global_metrics(%s, %s)"
-        cursor.execute(query, (from_date, to_date))
-        metrics = cursor.fetchone()
-        
-        return dict(metrics)
-        
-    finally:
-        cursor.close()
+        start = date.fromisoformat(from_date[:10]) if from_date else None
+        end = date.fromisoformat(to_date[:10]) if to_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date: expected YYYY-MM-DD"
+        )
+
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
+    
+        try:
+            if approximate and not (start or end):
+                await cursor.execute("SELECT * FROM get_approximate_metrics()")
+                metrics = dict(await cursor.fetchone())
+                as_of = metrics.pop('analyzed_at')
+                source = 'planner_statistics'
+            else:
+                await cursor.execute("SELECT * FROM get_metrics_snapshot(%s, %s)", (start, end))
+                metrics = dict(await cursor.fetchone())
+                as_of = metrics.pop('refreshed_at')
+                source = 'snapshot'
+        finally:
+            await cursor.close()
+
+    return {
+        **metrics,
+        'period_start': start.isoformat() if start else None,
+        'period_end': end.isoformat() if end else None,
+        'source': source,
+        'as_of': as_of.isoformat() if as_of else None,
+        'data_age_seconds': round((datetime.now(timezone.utc) - as_of).total_seconds(), 3) if as_of else None,
+    }
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(
+    request: Request,
+    user: AuthContext = Depends(require_master)
+):
+    """
+    **[MASTER ONLY]** Connection pool usage for this worker process
+
+    Returns in-use, idle and waiting counts plus acquire latency, to size
+    DB_POOL_MAX per replica.
+    """
+    pool = getattr(request.app.state, 'db_pool', None)
+    if pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database connection not available"
+        )
+
+    settings_cache = get_settings_cache(request)
+    history_cache = get_history_cache(request)
+    dashboard_cache = get_dashboard_cache(request)
+    usage_aggregator = get_usage_aggregator(request)
+    audit_writer = get_audit_writer(request)
+    api_log_writer = get_api_log_writer(request)
+    metrics_sampler = get_metrics_sampler(request)
+    metrics_snapshot_refresher = get_metrics_snapshot_refresher(request)
+
+    return {
+        'pid': os.getpid(),
+        **pool.stats(),
+        'settings_cache': settings_cache.stats() if settings_cache else None,
+        'history_cache': history_cache.stats() if history_cache else None,
+        'dashboard_cache': dashboard_cache.stats() if dashboard_cache else None,
+        'usage_aggregator': usage_aggregator.stats() if usage_aggregator else None,
+        'audit_writer': audit_writer.stats() if audit_writer else None,
+        'api_log_writer': api_log_writer.stats() if api_log_writer else None,
+        'metrics_sampler': metrics_sampler.stats() if metrics_sampler else None,
+        'metrics_snapshot': metrics_snapshot_refresher.stats() if metrics_snapshot_refresher else None,
+        'token_cache': token_cache.stats(),
+        'password_hasher': password_hasher.stats()
+    }
+
+
+@router.get("/db-statements")
+async def get_db_statement_stats(
+    user: AuthContext = Depends(require_master)
+):
+    """
+    **[MASTER ONLY]** Prepared hot-path statements for this worker process
+
+    Per-statement call counts, errors and mean/max execution time, and
+    whether statements are prepared (DB_PREPARE_STATEMENTS).
+    """
+    return {
+        'pid': os.getpid(),
+        **statements.stats()
+    }
+
+
+@router.get("/partitions")
+async def get_partition_plan(
+    request: Request,
+    user: AuthContext = Depends(require_master)
+):
+    """
+    **[MASTER ONLY]** Dry-run report of partition maintenance
+
+    Lists, per partitioned table, the monthly partitions that would be
+    created, detached and dropped, plus the result of the last run.
+    """
+    partition_manager = get_partition_manager(request)
+    if partition_manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Partition manager is disabled"
+        )
+
+    return {
+        **await partition_manager.plan(),
+        'last_run': partition_manager.last_run
+    }
+
+
+@router.post("/partitions/maintain")
+async def run_partition_maintenance(
+    request: Request,
+    user: AuthContext = Depends(require_master)
+):
+    """
+    **[MASTER ONLY]** Run partition maintenance now instead of waiting for
+    the next scheduled pass
+    """
+    partition_manager = get_partition_manager(request)
+    if partition_manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Partition manager is disabled"
+        )
+
+    result = await partition_manager.maintain()
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Partition maintenance already running in another worker"
+        )
+    return result
+
+
+@router.get("/agent-http")
+async def get_agent_http_stats(
+    request: Request,
+    user: AuthContext = Depends(require_master)
+):
+    """
+    **[MASTER ONLY]** Agent API client usage for this worker process
+
+    Returns per-host request counts and how often kept-alive connections
+    were reused.
+    """
+    return {'pid': os.getpid(), **get_agent_client(request).stats()}
 
 
 # ============================================================================
@@ -1208,42 +1367,42 @@ async def get_master_settings(
     """
     **[MASTER ONLY]** Get master settings (SDR endpoint, server config)
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        query = "SELECT * FROM master_settings LIMIT 1"
-        cursor.execute(query)
-        settings = cursor.fetchone()
+        try:
+            query = "SELECT * FROM master_settings LIMIT 1"
+            await cursor.execute(query)
+            settings = await cursor.fetchone()
         
-        if not settings:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Master settings not initialized"
-            )
+            if not settings:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Master settings not initialized"
+                )
         
-        result = dict(settings)
+            result = dict(settings)
         
-        # Convert datetime fields to ISO format strings
-        if result.get('created_at'):
-            result['created_at'] = result['created_at'].isoformat()
-        if result.get('updated_at'):
-            result['updated_at'] = result['updated_at'].isoformat()
-        if result.get('last_health_check_at'):
-            result['last_health_check_at'] = result['last_health_check_at'].isoformat()
+            # Convert datetime fields to ISO format strings
+            if result.get('created_at'):
+                result['created_at'] = result['created_at'].isoformat()
+            if result.get('updated_at'):
+                result['updated_at'] = result['updated_at'].isoformat()
+            if result.get('last_health_check_at'):
+                result['last_health_check_at'] = result['last_health_check_at'].isoformat()
         
-        # Set defaults for fields that might not exist
-        if 'health_check_enabled' not in result:
-            result['health_check_enabled'] = True
-        if 'health_check_interval_seconds' not in result:
-            result['health_check_interval_seconds'] = 300
-        if 'health_status' not in result:
-            result['health_status'] = 'unknown'
+            # Set defaults for fields that might not exist
+            if 'health_check_enabled' not in result:
+                result['health_check_enabled'] = True
+            if 'health_check_interval_seconds' not in result:
+                result['health_check_interval_seconds'] = 300
+            if 'health_status' not in result:
+                result['health_status'] = 'unknown'
         
-        return result
+            return result
         
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.put("/master-settings", response_model=MasterSettingsResponse)
@@ -1257,136 +1416,168 @@ async def update_master_settings(
     
     Updates SDR agent endpoint, timeout, and server configuration.
     """
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get existing settings
-        cursor.execute("SELECT * FROM master_settings LIMIT 1")
-        existing = cursor.fetchone()
+        try:
+            # Get existing settings
+            await cursor.execute("SELECT * FROM master_settings LIMIT 1")
+            existing = await cursor.fetchone()
         
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Master settings not initialized"
+            if not existing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Master settings not initialized"
+                )
+        
+            # Build update
+            updates = []
+            params = []
+        
+            # Check which columns exist
+            await cursor.execute("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name = 'master_settings'
+            """)
+            existing_columns = {row['column_name'] for row in await cursor.fetchall()}
+        
+            if data.sdr_agent_endpoint is not None and 'sdr_agent_endpoint' in existing_columns:
+                updates.append("sdr_agent_endpoint = %s")
+                params.append(data.sdr_agent_endpoint)
+        
+            if data.sdr_agent_api_key is not None and 'sdr_agent_api_key' in existing_columns:
+                # TODO: Encrypt API key
+                updates.append("sdr_agent_api_key = %s")
+                params.append(data.sdr_agent_api_key)
+        
+            if data.sdr_agent_timeout_ms is not None and 'sdr_agent_timeout_ms' in existing_columns:
+                updates.append("sdr_agent_timeout_ms = %s")
+                params.append(data.sdr_agent_timeout_ms)
+        
+            if data.server_config is not None and 'server_config' in existing_columns:
+                import json
+                updates.append("server_config = %s::jsonb")
+                params.append(json.dumps(data.server_config))
+        
+            # Only update health check fields if they exist in the table
+            if data.health_check_enabled is not None and 'health_check_enabled' in existing_columns:
+                updates.append("health_check_enabled = %s")
+                params.append(data.health_check_enabled)
+        
+            if data.health_check_interval_seconds is not None and 'health_check_interval_seconds' in existing_columns:
+                updates.append("health_check_interval_seconds = %s")
+                params.append(data.health_check_interval_seconds)
+        
+            if not updates:
+                result = dict(existing)
+                # Convert datetime fields
+                if result.get('created_at'):
+                    result['created_at'] = result['created_at'].isoformat()
+                if result.get('updated_at'):
+                    result['updated_at'] = result['updated_at'].isoformat()
+                if result.get('last_health_check_at'):
+                    result['last_health_check_at'] = result['last_health_check_at'].isoformat()
+                # Set defaults
+                if 'health_check_enabled' not in result:
+                    result['health_check_enabled'] = True
+                if 'health_check_interval_seconds' not in result:
+                    result['health_check_interval_seconds'] = 300
+                if 'health_status' not in result:
+                    result['health_status'] = 'unknown'
+                return result
+        
+            updates.append("updated_at = NOW()")
+            params.append(existing['id'])
+        
+            query = f"""
+                UPDATE master_settings
+                SET {', '.join(updates)}
+                WHERE id = %s
+                RETURNING *
+            """
+        
+            await cursor.execute(query, tuple(params))
+            updated = await cursor.fetchone()
+
+            # Every worker (this one included) is notified again by the
+            # master_settings trigger once the transaction commits
+            settings_cache = get_settings_cache(request)
+            if settings_cache:
+                settings_cache.invalidate()
+        
+            # Audit log
+            await log_audit(
+                user=user,
+                action="UPDATE_MASTER_SETTINGS",
+                resource_type="master_settings",
+                resource_id=str(existing['id']),
+                old_values=dict(existing),
+                new_values=dict(updated),
+                ip_address=request.client.host if request.client else None,
+                conn=conn
             )
         
-        # Build update
-        updates = []
-        params = []
-        
-        # Check which columns exist
-        cursor.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'master_settings'
-        """)
-        existing_columns = {row['column_name'] for row in cursor.fetchall()}
-        
-        if data.sdr_agent_endpoint is not None and 'sdr_agent_endpoint' in existing_columns:
-            updates.append("sdr_agent_endpoint = %s")
-            params.append(data.sdr_agent_endpoint)
-        
-        if data.sdr_agent_api_key is not None and 'sdr_agent_api_key' in existing_columns:
-            # TODO: Encrypt API key
-            updates.append("sdr_agent_api_key = %s")
-            params.append(data.sdr_agent_api_key)
-        
-        if data.sdr_agent_timeout_ms is not None and 'sdr_agent_timeout_ms' in existing_columns:
-            updates.append("sdr_agent_timeout_ms = %s")
-            params.append(data.sdr_agent_timeout_ms)
-        
-        if data.server_config is not None and 'server_config' in existing_columns:
-            import json
-            updates.append("server_config = %s::jsonb")
-            params.append(json.dumps(data.server_config))
-        
-        # Only update health check fields if they exist in the table
-        if data.health_check_enabled is not None and 'health_check_enabled' in existing_columns:
-            updates.append("health_check_enabled = %s")
-            params.append(data.health_check_enabled)
-        
-        if data.health_check_interval_seconds is not None and 'health_check_interval_seconds' in existing_columns:
-            updates.append("health_check_interval_seconds = %s")
-            params.append(data.health_check_interval_seconds)
-        
-        if not updates:
-            result = dict(existing)
-            # Convert datetime fields
+            logger.info(f"Master settings updated by {user.username}")
+        
+            result = dict(updated)
+        
+            # Convert datetime fields to ISO format strings
             if result.get('created_at'):
                 result['created_at'] = result['created_at'].isoformat()
             if result.get('updated_at'):
                 result['updated_at'] = result['updated_at'].isoformat()
             if result.get('last_health_check_at'):
                 result['last_health_check_at'] = result['last_health_check_at'].isoformat()
-            # Set defaults
+        
+            # Set defaults for fields that might not exist
             if 'health_check_enabled' not in result:
                 result['health_check_enabled'] = True
             if 'health_check_interval_seconds' not in result:
                 result['health_check_interval_seconds'] = 300
             if 'health_status' not in result:
                 result['health_status'] = 'unknown'
-            return result
-        
-        updates.append("updated_at = NOW()")
-        params.append(existing['id'])
-        
-        query = f"""
-            UPDATE master_settings
-            SET {', '.join(updates)}
-            WHERE id = %s
-            RETURNING *
-        """
-        
-        cursor.execute(query, tuple(params))
-        updated = cursor.fetchone()
-        conn.commit()
-        
-        # Audit log
-        await log_audit(
-            user=user,
-            action="UPDATE_MASTER_SETTINGS",
-            resource_type="master_settings",
-            resource_id=str(existing['id']),
-            old_values=dict(existing),
-            new_values=dict(updated),
-            ip_address=request.client.host if request.client else None,
-            conn=conn
-        )
-        
-        logger.info(f"Master settings updated by {user.username}")
         
-        result = dict(updated)
-        
-        # Convert datetime fields to ISO format strings
-        if result.get('created_at'):
-            result['created_at'] = result['created_at'].isoformat()
-        if result.get('updated_at'):
-            result['updated_at'] = result['updated_at'].isoformat()
-        if result.get('last_health_check_at'):
-            result['last_health_check_at'] = result['last_health_check_at'].isoformat()
-        
-        # Set defaults for fields that might not exist
-        if 'health_check_enabled' not in result:
-            result['health_check_enabled'] = True
-        if 'health_check_interval_seconds' not in result:
-            result['health_check_interval_seconds'] = 300
-        if 'health_status' not in result:
-            result['health_status'] = 'unknown'
+            return result
         
-        return result
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating master settings: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update master settings: {str(e)}"
+            )
+        finally:
+            await cursor.close()
+
+
+async def _record_health_status(request: Request, settings_id: int, health_status: str):
+    """Persist the outcome of an SDR health check on its own short lease"""
+    async with unit_of_work(request) as conn:
+        cursor = conn.cursor()
+    
+        try:
+            # Update health status (only if columns exist)
+            try:
+                async with conn.transaction():
+                    await cursor.execute("""
+                        UPDATE master_settings
+                        SET health_status = %s,
+                            last_health_check_at = NOW(),
+                            updated_at = NOW()
+                        WHERE id = %s
+                    """, (health_status, settings_id))
+            except psycopg.Error:
+                # Savepoint rolled back: columns may not exist, just update timestamp
+                await cursor.execute("""
+                    UPDATE master_settings
+                    SET updated_at = NOW()
+                    WHERE id = %s
+                """, (settings_id,))
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error updating master settings: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update master settings: {str(e)}"
-        )
-    finally:
-        cursor.close()
+        finally:
+            await cursor.close()
 
 
 @router.post("/master-settings/health-check")
@@ -1396,95 +1587,61 @@ async def run_sdr_health_check(
 ):
     """
     **[MASTER ONLY]** Run health check on SDR agent endpoint
+    
+    The settings read and the status write use separate leases so no pooled
+    connection is held while the agent endpoint is being probed. The probe
+    goes through the shared Agent HTTP client.
     """
-    import httpx
     from datetime import datetime
+
+    agent_client = get_agent_client(request)
     
-    conn = get_db_from_request(request)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    async with unit_of_work(request, read_only=True) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
     
-    try:
-        # Get settings
-        cursor.execute("SELECT * FROM master_settings LIMIT 1")
-        settings = cursor.fetchone()
-        
-        if not settings:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Master settings not initialized"
-            )
+        try:
+            # Get settings
+            await cursor.execute("SELECT * FROM master_settings LIMIT 1")
+            settings = await cursor.fetchone()
         
-        endpoint = settings['sdr_agent_endpoint']
-        timeout_ms = settings['sdr_agent_timeout_ms']
+        finally:
+            await cursor.close()
+    
+    if not settings:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Master settings not initialized"
+        )
+    
+    endpoint = settings['sdr_agent_endpoint']
+    timeout_ms = settings['sdr_agent_timeout_ms']
+    
+    # Call health endpoint
+    health_url = f"{endpoint.rstrip('/')}/health"
+    
+    start_time = datetime.utcnow()
+    
+    try:
+        response = await agent_client.get(health_url, timeout_ms)
+        response.raise_for_status()
         
-        # Call health endpoint
-        health_url = f"{endpoint.rstrip('/')}/health"
+        latency_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
         
-        start_time = datetime.utcnow()
+    except Exception as e:
+        await _record_health_status(request, settings['id'], 'unhealthy')
         
-        try:
-            async with httpx.AsyncClient(timeout=timeout_ms / 1000.0) as client:
-                response = await client.get(health_url)
-                response.raise_for_status()
-                
-                latency_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-                
-                # Update health status (only if columns exist)
-                try:
-                    cursor.execute("""
-                        UPDATE master_settings
-                        SET health_status = 'healthy',
-                            last_health_check_at = NOW(),
-                            updated_at = NOW()
-                        WHERE id = %s
-                    """, (settings['id'],))
-                    conn.commit()
-                except Exception:
-                    # Rollback the failed transaction
-                    conn.rollback()
-                    # Columns may not exist, just update timestamp
-                    cursor.execute("""
-                        UPDATE master_settings
-                        SET updated_at = NOW()
-                        WHERE id = %s
-                    """, (settings['id'],))
-                    conn.commit()
-                
-                return {
-                    "status": "healthy",
-                    "endpoint": health_url,
-                    "latency_ms": latency_ms,
-                    "checked_at": datetime.utcnow().isoformat()
-                }
-                
-        except Exception as e:
-            # Update unhealthy status (only if columns exist)
-            try:
-                cursor.execute("""
-                    UPDATE master_settings
-                    SET health_status = 'unhealthy',
-                        last_health_check_at = NOW(),
-                        updated_at = NOW()
-                    WHERE id = %s
-                """, (settings['id'],))
-                conn.commit()
-            except Exception:
-                # Rollback the failed transaction
-                conn.rollback()
-                # Columns may not exist, just update timestamp
-                cursor.execute("""
-                    UPDATE master_settings
-                    SET updated_at = NOW()
-                    WHERE id = %s
-                """, (settings['id'],))
-                conn.commit()
-            
-            return {
-                "status": "unhealthy",
-                "endpoint": health_url,
-                "error": str(e),
-                "checked_at": datetime.utcnow().isoformat()
-            }
-            
-    finally:
-        cursor.close()
+        return {
+            "status": "unhealthy",
+            "endpoint": health_url,
+            "error": str(e),
+            "checked_at": datetime.utcnow().isoformat()
+        }
+    
+    await _record_health_status(request, settings['id'], 'healthy')
+    
+    return {
+        "status": "healthy",
+        "endpoint": health_url,
+        "latency_ms": latency_ms,
+        "checked_at": datetime.utcnow().isoformat()
+    }
@@ -23,9 +23,12 @@ try:
         require_master,
         require_tenant_admin,
         RBACManager,
+        verify_login,
+        password_hasher,
         create_access_token,
         JWT_EXPIRATION_HOURS
     )
+    from ..db import lease_connection, unit_of_work
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
     from auth import (
@@ -41,29 +44,18 @@ except ImportError:
         require_master,
         require_tenant_admin,
         RBACManager,
+        verify_login,
+        password_hasher,
         create_access_token,
         JWT_EXPIRATION_HOURS
     )
+    from db import lease_connection, unit_of_work
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
-# ============================================================================
-# Helper Functions
-# ============================================================================
-
-def get_db_from_request(request: Request):
-    """Get database connection from request state"""
-    if not hasattr(request.state, 'db'):
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection not available"
-        )
-    return request.state.db
-
-
 # ============================================================================
 # Authentication Endpoints
 # ============================================================================
@@ -75,21 +67,32 @@ async def login(data: LoginRequest, request: Request):
     
     Returns JWT token and user information.
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
-    
     try:
         # Authenticate user (support either email or username)
         identifier = data.email or data.username
-        user = rbac.authenticate_user(identifier, data.password)
+        async with lease_connection(request) as conn:
+            user = await RBACManager(conn).get_login_user(identifier)
+
+        # bcrypt runs with no connection leased: a burst of logins must not
+        # hold pool slots while queued on the hasher
+        verified, new_hash = await verify_login(user, data.password) if user else (False, None)
 
-        if not user:
+        if verified:
+            async with lease_connection(request) as conn:
+                verified = await RBACManager(conn).record_login(user['id'], new_hash)
+
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        
+
+        # Remove password_hash from response
+        user = dict(user)
+        del user['password_hash']
+        logger.info(f"User authenticated: {identifier} (role: {user['role']})")
+    
         # Create access token
         access_token = create_access_token(
             user_id=str(user['id']),
@@ -98,7 +101,7 @@ async def login(data: LoginRequest, request: Request):
             username=user['username'],
             email=user['email']
         )
-        
+    
         # Convert user to response
         user_response = UserResponse(
             id=str(user['id']),
@@ -112,16 +115,16 @@ async def login(data: LoginRequest, request: Request):
             updated_at=user['updated_at'],
             last_login_at=user.get('last_login_at')
         )
-        
+    
         logger.info(f"User logged in: {user['email']} (role: {user['role']})")
-        
+    
         return LoginResponse(
             access_token=access_token,
             token_type="bearer",
             user=user_response,
             expires_in=JWT_EXPIRATION_HOURS * 3600
         )
-        
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -137,29 +140,29 @@ async def get_current_user_info(user: AuthContext = Depends(get_current_user), r
     """
     Get current user information from token
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
+    async with unit_of_work(request, read_only=True) as conn:
+        rbac = RBACManager(conn)
     
-    user_data = rbac.get_user_by_id(user.user_id, user)
+        user_data = await rbac.get_user_by_id(user.user_id, user)
     
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+        if not user_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
     
-    return UserResponse(
-        id=str(user_data['id']),
-        tenant_id=str(user_data['tenant_id']),
-        role=UserRole(user_data['role']),
-        name=user_data['name'],
-        username=user_data['username'],
-        email=user_data['email'],
-        is_active=user_data['is_active'],
-        created_at=user_data['created_at'],
-        updated_at=user_data['updated_at'],
-        last_login_at=user_data.get('last_login_at')
-    )
+        return UserResponse(
+            id=str(user_data['id']),
+            tenant_id=str(user_data['tenant_id']),
+            role=UserRole(user_data['role']),
+            name=user_data['name'],
+            username=user_data['username'],
+            email=user_data['email'],
+            is_active=user_data['is_active'],
+            created_at=user_data['created_at'],
+            updated_at=user_data['updated_at'],
+            last_login_at=user_data.get('last_login_at')
+        )
 
 
 # ============================================================================
@@ -179,43 +182,54 @@ async def create_user(
     - MASTER: Can create any user (MASTER, TENANT_ADMIN, TENANT_USER)
     - TENANT_ADMIN: Can create TENANT_USER in their own tenant
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
-    
     try:
-        new_user = rbac.create_user(data, user)
-        
-        return UserResponse(
-            id=str(new_user['id']),
-            tenant_id=str(new_user['tenant_id']),
-            role=UserRole(new_user['role']),
-            name=new_user.get('full_name', new_user.get('name', '')),
-            username=new_user['username'],
-            email=new_user['email'],
-            is_active=new_user['is_active'],
-            created_at=new_user['created_at'],
-            updated_at=new_user['updated_at'],
-            last_login_at=new_user.get('last_login_at')
-        )
-        
+        RBACManager.check_create_permission(data, user)
     except PermissionError as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=str(e)
         )
-    except Exception as e:
-        logger.error(f"Error creating user: {e}")
+
+    # Hashed before leasing: bcrypt must not hold a pool slot
+    password_hash = await password_hasher.hash(data.password)
+
+    async with lease_connection(request) as conn:
+        rbac = RBACManager(conn)
+    
+        try:
+            new_user = await rbac.create_user(data, user, password_hash)
+        
+            return UserResponse(
+                id=str(new_user['id']),
+                tenant_id=str(new_user['tenant_id']),
+                role=UserRole(new_user['role']),
+                name=new_user.get('full_name', new_user.get('name', '')),
+                username=new_user['username'],
+                email=new_user['email'],
+                is_active=new_user['is_active'],
+                created_at=new_user['created_at'],
+                updated_at=new_user['updated_at'],
+                last_login_at=new_user.get('last_login_at')
+            )
         
-        if "duplicate key" in str(e).lower():
+        except PermissionError as e:
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="User with this email or username already exists"
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
             )
+        except Exception as e:
+            logger.error(f"Error creating user: {e}")
         
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create user: {str(e)}"
-        )
+            if "duplicate key" in str(e).lower():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="User with this email or username already exists"
+                )
+        
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create user: {str(e)}"
+            )
 
 
 @router.get("/users", response_model=list[UserResponse])
@@ -236,33 +250,33 @@ async def list_users(
     - TENANT_ADMIN: Can list users in their tenant
     - TENANT_USER: Can only see themselves
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
+    async with unit_of_work(request, read_only=True) as conn:
+        rbac = RBACManager(conn)
     
-    users = rbac.list_users(
-        requester=user,
-        tenant_id=tenant_id,
-        role=role,
-        is_active=is_active,
-        limit=limit,
-        offset=offset
-    )
-    
-    return [
-        UserResponse(
-            id=str(u['id']),
-            tenant_id=str(u['tenant_id']),
-            role=UserRole(u['role']),
-            name=u.get('full_name', u.get('name', '')),
-            username=u['username'],
-            email=u['email'],
-            is_active=u['is_active'],
-            created_at=u['created_at'],
-            updated_at=u['updated_at'],
-            last_login_at=u.get('last_login_at')
+        users = await rbac.list_users(
+            requester=user,
+            tenant_id=tenant_id,
+            role=role,
+            is_active=is_active,
+            limit=limit,
+            offset=offset
         )
-        for u in users
-    ]
+    
+        return [
+            UserResponse(
+                id=str(u['id']),
+                tenant_id=str(u['tenant_id']),
+                role=UserRole(u['role']),
+                name=u.get('full_name', u.get('name', '')),
+                username=u['username'],
+                email=u['email'],
+                is_active=u['is_active'],
+                created_at=u['created_at'],
+                updated_at=u['updated_at'],
+                last_login_at=u.get('last_login_at')
+            )
+            for u in users
+        ]
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
@@ -272,29 +286,29 @@ async def get_user(
     user: AuthContext = Depends(get_current_user)
 ):
     """Get user by ID"""
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
+    async with unit_of_work(request, read_only=True) as conn:
+        rbac = RBACManager(conn)
     
-    user_data = rbac.get_user_by_id(user_id, user)
+        user_data = await rbac.get_user_by_id(user_id, user)
     
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+        if not user_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
     
-    return UserResponse(
-        id=str(user_data['id']),
-        tenant_id=str(user_data['tenant_id']),
-        role=UserRole(user_data['role']),
-        name=user_data['name'],
-        username=user_data['username'],
-        email=user_data['email'],
-        is_active=user_data['is_active'],
-        created_at=user_data['created_at'],
-        updated_at=user_data['updated_at'],
-        last_login_at=user_data.get('last_login_at')
-    )
+        return UserResponse(
+            id=str(user_data['id']),
+            tenant_id=str(user_data['tenant_id']),
+            role=UserRole(user_data['role']),
+            name=user_data['name'],
+            username=user_data['username'],
+            email=user_data['email'],
+            is_active=user_data['is_active'],
+            created_at=user_data['created_at'],
+            updated_at=user_data['updated_at'],
+            last_login_at=user_data.get('last_login_at')
+        )
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
@@ -312,41 +326,41 @@ async def update_user(
     - TENANT_ADMIN can update users in their tenant (except MASTER users)
     - MASTER can update any user
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
+    async with lease_connection(request) as conn:
+        rbac = RBACManager(conn)
     
-    try:
-        updated_user = rbac.update_user(user_id, data, user)
+        try:
+            updated_user = await rbac.update_user(user_id, data, user)
         
-        return UserResponse(
-            id=str(updated_user['id']),
-            tenant_id=str(updated_user['tenant_id']),
-            role=UserRole(updated_user['role']),
-            name=updated_user.get('full_name', updated_user.get('name', '')),
-            username=updated_user['username'],
-            email=updated_user['email'],
-            is_active=updated_user['is_active'],
-            created_at=updated_user['created_at'],
-            updated_at=updated_user['updated_at'],
-            last_login_at=updated_user.get('last_login_at')
-        )
+            return UserResponse(
+                id=str(updated_user['id']),
+                tenant_id=str(updated_user['tenant_id']),
+                role=UserRole(updated_user['role']),
+                name=updated_user.get('full_name', updated_user.get('name', '')),
+                username=updated_user['username'],
+                email=updated_user['email'],
+                is_active=updated_user['is_active'],
+                created_at=updated_user['created_at'],
+                updated_at=updated_user['updated_at'],
+                last_login_at=updated_user.get('last_login_at')
+            )
         
-    except PermissionError as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=str(e)
-        )
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error updating user: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update user: {str(e)}"
-        )
+        except PermissionError as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error updating user: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update user: {str(e)}"
+            )
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -362,26 +376,26 @@ async def delete_user(
     - MASTER: Can delete any user
     - TENANT_ADMIN: Can delete TENANT_USER in their tenant
     """
-    conn = get_db_from_request(request)
-    rbac = RBACManager(conn)
+    async with lease_connection(request) as conn:
+        rbac = RBACManager(conn)
     
-    try:
-        rbac.delete_user(user_id, user)
-        return None
+        try:
+            await rbac.delete_user(user_id, user)
+            return None
         
-    except PermissionError as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=str(e)
-        )
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error deleting user: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete user: {str(e)}"
-        )
+        except PermissionError as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error deleting user: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete user: {str(e)}"
+            )
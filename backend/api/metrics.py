@@ -0,0 +1,272 @@
+"""
+DOM360 Prometheus Metrics
+Request, Agent API, pool and process metrics served at GET /metrics
+"""
+import asyncio
+import hmac
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+logger = logging.getLogger(__name__)
+
+# Directory shared by the worker processes of one replica. When set (before
+# the workers start, emptied on each deploy) every worker writes its samples
+# there and /metrics aggregates all of them, whichever worker is scraped.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Optional bearer token required by /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Label used for requests that matched no route (keeps cardinality bounded)
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+HTTP_REQUEST_DURATION = Histogram(
+    'dom360_http_request_duration_seconds',
+    'HTTP request latency by route template and status',
+    ['method', 'route', 'status']
+)
+
+AGENT_REQUEST_DURATION = Histogram(
+    'dom360_agent_request_duration_seconds',
+    'Agent API call latency by agent type and outcome',
+    ['agent_type', 'outcome'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+
+AGENT_TOKENS = Counter(
+    'dom360_agent_tokens',
+    'Tokens reported by the Agent API, per tenant',
+    ['tenant_id', 'agent_type', 'direction']
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    'dom360_db_pool_connections',
+    'Database pool connections by state (summed over live workers)',
+    ['state'],
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_WAITING = Gauge(
+    'dom360_db_pool_waiting',
+    'Requests waiting for a database connection (summed over live workers)',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_MAX = Gauge(
+    'dom360_db_pool_max_connections',
+    'Configured pool size (summed over live workers)',
+    multiprocess_mode='livesum'
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'dom360_event_loop_lag_seconds',
+    'Delay of the sampler wake-up past its schedule',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+EVENT_LOOP_LAG_MAX = Gauge(
+    'dom360_event_loop_lag_max_seconds',
+    'Last event loop lag sample of the slowest live worker',
+    multiprocess_mode='livemax'
+)
+
+PROCESS_RSS = Gauge(
+    'dom360_process_resident_memory_bytes',
+    'Resident memory per worker process',
+    multiprocess_mode='liveall'
+)
+
+
+def observe_agent_call(agent_type: str, seconds: float, outcome: str):
+    AGENT_REQUEST_DURATION.labels(agent_type, outcome).observe(seconds)
+
+
+def record_agent_tokens(tenant_id: int, agent_type: str, tokens: dict):
+    """Count the `tokens` ({'input': n, 'output': m}) of one agent answer"""
+    tenant = str(tenant_id)
+    if tokens.get('input'):
+        AGENT_TOKENS.labels(tenant, agent_type, 'input').inc(tokens['input'])
+    if tokens.get('output'):
+        AGENT_TOKENS.labels(tenant, agent_type, 'output').inc(tokens['output'])
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ============================================================================
+# Request middleware
+# ============================================================================
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware observing dom360_http_request_duration_seconds
+
+    Requests are labelled by route template (/api/conversations/{conversation_id}/messages),
+    never by raw path. Unhandled exceptions are counted as status 500.
+
+    Usage:
+        app.add_middleware(PrometheusMiddleware, exclude_paths=['/metrics'])
+    """
+
+    def __init__(self, app, exclude_paths: Iterable[str] = ('/metrics',)):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.labels(
+                scope['method'],
+                getattr(route, 'path', UNMATCHED_ROUTE),
+                str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+# ============================================================================
+# Sampler
+# ============================================================================
+
+class MetricsSampler:
+    """
+    Background task refreshing the gauges of this worker every `interval` s
+
+    Measures event loop lag as how late asyncio.sleep(interval) wakes up,
+    and copies pool usage and process RSS into their gauges. In
+    multiprocess mode the gauges are written to this worker's files, so
+    any worker answering /metrics reports every live worker.
+    """
+
+    def __init__(self, pool=None, interval: float = 1.0):
+        self.pool = pool
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters reported by stats()
+        self.samples = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self.sample(0.0)
+            self._task = asyncio.create_task(self._run(), name='metrics-sampler')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if MULTIPROC_DIR:
+            # Drop this worker's live gauges from the aggregation
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample(max(loop.time() - scheduled, 0.0))
+            except Exception as e:
+                logger.warning(f"Metrics sample failed: {e}")
+
+    def sample(self, lag: float):
+        self.samples += 1
+        self.last_lag_ms = lag * 1000
+        self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_MAX.set(lag)
+
+        rss = _rss_bytes()
+        if rss is not None:
+            PROCESS_RSS.set(rss)
+
+        if self.pool is not None:
+            stats = self.pool.stats()
+            DB_POOL_CONNECTIONS.labels('in_use').set(stats['in_use'])
+            DB_POOL_CONNECTIONS.labels('idle').set(stats['idle'])
+            DB_POOL_WAITING.set(stats['waiting'])
+            DB_POOL_MAX.set(stats['maxconn'])
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'multiprocess': bool(MULTIPROC_DIR),
+            'samples': self.samples,
+            'last_lag_ms': round(self.last_lag_ms, 3),
+            'max_lag_ms': round(self.max_lag_ms, 3),
+        }
+
+
+def get_metrics_sampler(request) -> Optional[MetricsSampler]:
+    return getattr(request.app.state, 'metrics_sampler', None)
+
+
+# ============================================================================
+# Endpoint
+# ============================================================================
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _registry():
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """
+    Prometheus text exposition for this replica
+
+    Plain `def`: FastAPI runs it on the thread pool, so reading the
+    multiprocess files never blocks the event loop.
+    """
+    if METRICS_TOKEN:
+        expected = f"Bearer {METRICS_TOKEN}".encode()
+        if not hmac.compare_digest(request.headers.get('authorization', '').encode(), expected):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
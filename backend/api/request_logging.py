@@ -0,0 +1,157 @@
+"""
+DOM360 Request Logging Middleware
+Records each authenticated request into api_logs through ApiLogWriter
+"""
+import ipaddress
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+# Body keys never written to api_logs, even with body capture enabled
+_REDACTED_KEYS = ('password', 'token', 'secret', 'authorization')
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {
+            k: '***' if any(r in k.lower() for r in _REDACTED_KEYS) else _redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
+
+def _body_json(chunks: list, truncated: bool) -> Optional[str]:
+    """Captured body as a jsonb literal, redacted; None when empty"""
+    raw = b''.join(chunks)
+    if not raw:
+        return None
+    if not truncated:
+        try:
+            return json.dumps(_redact(json.loads(raw)), default=str)
+        except ValueError:
+            pass
+    return json.dumps({'_raw': raw.decode('utf-8', 'replace'), '_truncated': truncated})
+
+
+class ApiLogMiddleware:
+    """
+    Pure ASGI middleware feeding app.state.api_log_writer
+
+    Only requests that authenticated (get_current_user stores the
+    AuthContext in request.state.auth) are logged, since api_logs.tenant_id
+    is required. Responses below 400 are kept with probability
+    `sample_rate`; errors are always kept. Request and response bodies are
+    captured only with `capture_bodies`, up to `body_max_bytes` each, for
+    JSON payloads, with credential-like keys redacted.
+
+    Usage:
+        app.add_middleware(ApiLogMiddleware, sample_rate=1.0)
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = 1.0,
+        capture_bodies: bool = False,
+        body_max_bytes: int = 4096,
+        exclude_paths: Iterable[str] = ()
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.capture_bodies = capture_bodies
+        self.body_max_bytes = body_max_bytes
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        writer = getattr(scope['app'].state, 'api_log_writer', None) if 'app' in scope else None
+        if writer is None:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+        capture = self.capture_bodies
+        limit = self.body_max_bytes
+        request_chunks, response_chunks = [], []
+        truncated = [False, False]
+
+        async def receive_wrapper():
+            message = await receive()
+            if capture and message['type'] == 'http.request':
+                _append(request_chunks, message.get('body', b''), 0)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code, capture
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if capture:
+                    content_type = dict(message.get('headers', ())).get(b'content-type', b'')
+                    capture = content_type.startswith(b'application/json')
+            elif capture and message['type'] == 'http.response.body':
+                _append(response_chunks, message.get('body', b''), 1)
+            await send(message)
+
+        def _append(chunks, body, which):
+            size = sum(len(c) for c in chunks)
+            if size + len(body) > limit:
+                body = body[:max(limit - size, 0)]
+                truncated[which] = True
+            if body:
+                chunks.append(body)
+
+        error = None
+        try:
+            await self.app(scope, receive_wrapper if capture else receive, send_wrapper)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._record(
+                writer, scope, status_code, started, error,
+                request_chunks, response_chunks, truncated
+            )
+
+    def _record(self, writer, scope, status_code, started, error,
+                request_chunks, response_chunks, truncated):
+        auth = scope.get('state', {}).get('auth')
+        if auth is None:
+            return
+        if status_code < 400 and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            writer.sampled_out += 1
+            return
+
+        client = scope.get('client')
+        ip_address = client[0] if client else None
+        if ip_address:
+            try:
+                ipaddress.ip_address(ip_address)
+            except ValueError:
+                ip_address = None
+
+        user_agent = None
+        for name, value in scope.get('headers', ()):
+            if name == b'user-agent':
+                user_agent = value.decode('latin-1')
+                break
+
+        writer.append((
+            auth.tenant_id,
+            auth.user_id,
+            scope['method'],
+            scope['path'],
+            status_code,
+            int((time.perf_counter() - started) * 1000),
+            _body_json(request_chunks, truncated[0]) if self.capture_bodies else None,
+            _body_json(response_chunks, truncated[1]) if self.capture_bodies else None,
+            error,
+            ip_address,
+            user_agent,
+            datetime.now(timezone.utc),
+        ))
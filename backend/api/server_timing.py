@@ -0,0 +1,67 @@
+"""
+DOM360 Server-Timing Middleware
+Reports each request's database, pool and Agent API time
+"""
+import json
+import logging
+from typing import Iterable
+
+try:
+    from ..db.timing import start_request_timings, stop_request_timings
+except ImportError:
+    from db.timing import start_request_timings, stop_request_timings
+
+logger = logging.getLogger('dom360.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware exposing backend/db/timing.py per request
+
+    Adds a Server-Timing header (db, pool, agent, app and total durations,
+    visible in the browser's network panel) and, once the body has been
+    sent, logs one JSON line on the `dom360.timing` logger for requests
+    slower than `log_min_ms`. Streaming responses send their headers
+    before the work is done, so for them only the log line is complete.
+
+    Usage:
+        app.add_middleware(ServerTimingMiddleware, log_min_ms=0)
+    """
+
+    def __init__(self, app, header: bool = True, log_min_ms: float = 0.0,
+                 exclude_paths: Iterable[str] = ()):
+        self.app = app
+        self.header = header
+        self.log_min_ms = log_min_ms
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        timings, token = start_request_timings()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.header:
+                    message['headers'] = list(message.get('headers', ())) + [
+                        (b'server-timing', timings.server_timing().encode('latin-1'))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_request_timings(token)
+            record = timings.as_dict()
+            if record['total_ms'] >= self.log_min_ms and logger.isEnabledFor(logging.INFO):
+                route = scope.get('route')
+                logger.info(json.dumps({
+                    'method': scope['method'],
+                    'path': getattr(route, 'path', scope['path']),
+                    'status': status_code,
+                    **record,
+                }))
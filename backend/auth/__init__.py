@@ -3,6 +3,7 @@ DOM360 Authentication & Authorization Module
 """
 from .models import UserRole, AuthContext, TokenPayload, UserCreate, UserUpdate, UserResponse, LoginRequest, LoginResponse
 from .middleware import (
+    authenticate_token,
     get_current_user, 
     get_optional_user,
     require_role, 
@@ -12,9 +13,14 @@ from .middleware import (
     set_rls_context,
     create_access_token,
     log_audit,
+    set_audit_writer,
+    token_cache,
     JWT_EXPIRATION_HOURS
 )
-from .rbac import RBACManager
+from .token_cache import VerifiedTokenCache
+from .passwords import PasswordHasher, password_hasher
+from .rls import bind_rls, is_rls_bound, unbind_rls
+from .rbac import RBACManager, verify_login
 
 __all__ = [
     'UserRole',
@@ -25,6 +31,7 @@ __all__ = [
     'UserResponse',
     'LoginRequest',
     'LoginResponse',
+    'authenticate_token',
     'get_current_user',
     'get_optional_user',
     'require_role',
@@ -32,8 +39,17 @@ __all__ = [
     'require_tenant_admin',
     'require_tenant_access',
     'set_rls_context',
+    'bind_rls',
+    'is_rls_bound',
+    'unbind_rls',
     'create_access_token',
     'log_audit',
+    'set_audit_writer',
+    'token_cache',
+    'VerifiedTokenCache',
+    'PasswordHasher',
+    'password_hasher',
     'JWT_EXPIRATION_HOURS',
     'RBACManager',
+    'verify_login',
 ]
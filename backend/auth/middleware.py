@@ -2,16 +2,20 @@
 DOM360 RBAC Middleware & Dependencies
 """
 import os
+import ipaddress
+import json
 import logging
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 import jwt
-import bcrypt
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, Request, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from .models import AuthContext, TokenPayload, UserRole
+from .passwords import hash_password, verify_password
+from .rls import bind_rls
+from .token_cache import VerifiedTokenCache, token_digest
 
 logger = logging.getLogger(__name__)
 
@@ -19,29 +23,15 @@ logger = logging.getLogger(__name__)
 JWT_SECRET = os.getenv("JWT_SECRET", "CHANGE_ME_IN_PRODUCTION_USE_STRONG_SECRET")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", 24))
+# Verified tokens kept in memory per worker (0 disables the cache)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 4096))
+
+token_cache = VerifiedTokenCache(JWT_CACHE_SIZE)
 
 # Security scheme
 security = HTTPBearer()
 
 
-# ============================================================================
-# Password Utilities
-# ============================================================================
-
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    try:
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except Exception as e:
-        logger.error(f"Error verifying password: {e}")
-        return False
-
-
 # ============================================================================
 # JWT Utilities
 # ============================================================================
@@ -73,18 +63,17 @@ def create_access_token(
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def decode_access_token(token: str) -> TokenPayload:
-    """Decode and validate JWT token"""
+def _decode_claims(token: str) -> dict:
+    """Verify signature and expiry; raise 401 on any invalid token"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return TokenPayload(**payload)
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.JWTError as e:
+    except jwt.InvalidTokenError as e:
         logger.error(f"JWT decode error: {e}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,11 +82,51 @@ def decode_access_token(token: str) -> TokenPayload:
         )
 
 
+def decode_access_token(token: str) -> TokenPayload:
+    """Decode and validate JWT token"""
+    return TokenPayload(**_decode_claims(token))
+
+
+def authenticate_token(token: str) -> AuthContext:
+    """
+    Resolve a bearer token to its AuthContext
+
+    Verified tokens are served from token_cache until their `exp`; only a
+    miss pays for jwt.decode().
+    """
+    key = token_digest(token)
+    auth_context = token_cache.get(key)
+    if auth_context is not None:
+        return auth_context
+
+    claims = _decode_claims(token)
+    try:
+        auth_context = AuthContext(
+            user_id=claims['sub'],
+            tenant_id=int(claims['tenant_id']),
+            role=UserRole(claims['role']),
+            username=claims['username'],
+            email=claims['email'],
+        )
+        exp = int(claims['exp'])
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"JWT claims error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    token_cache.put(key, exp, auth_context)
+    return auth_context
+
+
 # ============================================================================
 # FastAPI Dependencies
 # ============================================================================
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> AuthContext:
     """
@@ -108,9 +137,7 @@ async def get_current_user(
         async def protected_route(user: AuthContext = Depends(get_current_user)):
             return {"user_id": user.user_id, "role": user.role}
     """
-    token = credentials.credentials
-    token_payload = decode_access_token(token)
-    auth_context = token_payload.to_auth_context()
+    auth_context = authenticate_token(credentials.credentials)
     
     if not auth_context.is_active:
         raise HTTPException(
@@ -118,17 +145,20 @@ async def get_current_user(
             detail="User account is inactive"
         )
     
+    # Read back by ApiLogMiddleware to attribute the request
+    request.state.auth = auth_context
     return auth_context
 
 
 async def get_optional_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[AuthContext]:
     """Get user if authenticated, None otherwise (for optional auth)"""
     if credentials is None:
         return None
     try:
-        return await get_current_user(credentials)
+        return await get_current_user(request, credentials)
     except HTTPException:
         return None
 
@@ -257,25 +287,77 @@ def require_tenant_access(
 # Database Context Helper
 # ============================================================================
 
-def set_rls_context(cursor, user: AuthContext):
+async def set_rls_context(cursor, user: AuthContext):
     """
     Set PostgreSQL session variables for RLS
     
+    Always (re)binds the current transaction; see auth.rls.bind_rls for the
+    variant that skips an already-bound transaction.
+    
     Usage:
         cursor = conn.cursor()
-        set_rls_context(cursor, user)
-        cursor.execute("SELECT * FROM messages")  # RLS policies applied
+        await set_rls_context(cursor, user)
+        await cursor.execute("SELECT * FROM messages")  # RLS policies applied
     """
-    cursor.execute(f"SET LOCAL app.tenant_id = '{user.tenant_id}'")
-    cursor.execute(f"SET LOCAL app.user_role = '{user.role.value}'")
-    
-    logger.debug(f"RLS context set: tenant_id={user.tenant_id}, role={user.role.value}")
+    await bind_rls(cursor, user, force=True)
 
 
 # ============================================================================
 # Audit Logger
 # ============================================================================
 
+# Background writer set up by the app lifespan (backend/db/audit_writer.py)
+_audit_writer = None
+
+
+def set_audit_writer(writer):
+    """Route log_audit() through a background AuditWriter (None to disable)"""
+    global _audit_writer
+    _audit_writer = writer
+
+
+def _audit_event(
+    user: AuthContext,
+    action: str,
+    resource_type: str,
+    resource_id: Optional[str],
+    old_values: Optional[dict],
+    new_values: Optional[dict],
+    metadata: Optional[dict],
+    ip_address: Optional[str],
+    user_agent: Optional[str]
+) -> tuple:
+    """Build an audit_logs row in AUDIT_COLUMNS order"""
+    # audit_logs has a single jsonb `changes` column for the event details
+    changes = {'user_role': user.role.value}
+    if old_values is not None:
+        changes['old'] = old_values
+    if new_values is not None:
+        changes['new'] = new_values
+    if metadata is not None:
+        changes['metadata'] = metadata
+
+    # ip_address is inet; anything else (e.g. test client names) is dropped
+    if ip_address:
+        try:
+            ipaddress.ip_address(ip_address)
+        except ValueError:
+            ip_address = None
+
+    return (
+        user.tenant_id,
+        user.user_id,
+        action,
+        resource_type,
+        str(resource_id) if resource_id is not None else None,
+        # Use default=str to safely serialize datetimes and other non-serializable types
+        json.dumps(changes, default=str),
+        ip_address or None,
+        user_agent,
+        datetime.now(timezone.utc),
+    )
+
+
 async def log_audit(
     user: AuthContext,
     action: str,
@@ -291,6 +373,11 @@ async def log_audit(
     """
     Log sensitive operation to audit_logs table
     
+    With the background AuditWriter running the event is only queued, so the
+    request neither waits for the insert nor shares a transaction with it.
+    Without it, the row is written on `conn` inside a savepoint, so within a
+    unit_of_work() it commits or rolls back with the request's changes.
+
     Usage:
         await log_audit(
             user=user,
@@ -301,46 +388,31 @@ async def log_audit(
             ip_address=request.client.host
         )
     """
+    event = _audit_event(
+        user, action, resource_type, resource_id,
+        old_values, new_values, metadata, ip_address, user_agent
+    )
+
+    if _audit_writer is not None:
+        await _audit_writer.submit(event)
+        return
+
     if conn is None:
         # Skip logging if no connection provided
         logger.warning("Audit log skipped: no database connection")
         return
     
     try:
-        cursor = conn.cursor()
-        
-        query = """
-            INSERT INTO audit_logs (
-                user_id, user_role, tenant_id,
-                action, resource_type, resource_id,
-                old_values, new_values, metadata,
-                ip_address, user_agent
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        import json
-
-        # Use default=str to safely serialize datetimes and other non-serializable types
-        old_values_json = json.dumps(old_values, default=str) if old_values is not None else None
-        new_values_json = json.dumps(new_values, default=str) if new_values is not None else None
-        metadata_json = json.dumps(metadata, default=str) if metadata is not None else None
-
-        cursor.execute(query, (
-            user.user_id,
-            user.role.value,
-            user.tenant_id,
-            action,
-            resource_type,
-            resource_id,
-            old_values_json,
-            new_values_json,
-            metadata_json,
-            ip_address,
-            user_agent
-        ))
-        
-        conn.commit()
-        cursor.close()
+        async with conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO audit_logs (
+                    tenant_id, user_id, action, resource_type, resource_id,
+                    changes, ip_address, user_agent, created_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                event
+            )
         
         logger.info(f"Audit log: {action} by {user.username} ({user.role.value})")
         
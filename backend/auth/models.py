@@ -31,15 +31,39 @@ class UserRole(str, Enum):
         return False
 
 
-class AuthContext(BaseModel):
-    """Authentication context for requests"""
-    user_id: str = Field(..., description="User UUID")
-    tenant_id: int = Field(..., description="Tenant ID (INTEGER, Chatwoot account ID)")
-    role: UserRole = Field(..., description="User role")
-    username: str = Field(..., description="Username")
-    email: str = Field(..., description="User email")
-    is_active: bool = Field(True, description="User active status")
-    
+class AuthContext:
+    """
+    Authentication context for requests
+
+    Built on every authenticated request (and shared through the verified
+    token cache), so it is a plain slotted object without pydantic
+    validation; the claims were validated when the token was decoded.
+    Treat it as read-only.
+    """
+    __slots__ = ('user_id', 'tenant_id', 'role', 'username', 'email', 'is_active')
+
+    def __init__(
+        self,
+        user_id: str,
+        tenant_id: int,
+        role: UserRole,
+        username: str,
+        email: str,
+        is_active: bool = True
+    ):
+        self.user_id = user_id
+        self.tenant_id = tenant_id
+        self.role = role
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+
+    def __repr__(self) -> str:
+        return (
+            f"AuthContext(user_id={self.user_id!r}, tenant_id={self.tenant_id!r}, "
+            f"role={self.role.value}, username={self.username!r})"
+        )
+
     @property
     def is_master(self) -> bool:
         """Check if user is MASTER"""
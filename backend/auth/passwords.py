@@ -0,0 +1,114 @@
+"""
+DOM360 Password Hashing
+bcrypt on a dedicated thread pool, off the event loop
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor for new hashes; stored hashes with another cost are
+# rewritten on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Concurrent hashes per worker process (defaults to the number of cores)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash password using bcrypt"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash"""
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except Exception as e:
+        logger.error(f"Error verifying password: {e}")
+        return False
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor of a stored hash ($2b$12$...), None if unrecognised"""
+    parts = hashed_password.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a thread pool of `workers` threads
+
+    bcrypt releases the GIL while hashing, so threads use every core
+    without blocking the event loop. A semaphore of the same size caps the
+    hashes in flight; excess logins wait on it (counted in `waiting`)
+    instead of piling up in the executor queue.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.rounds = rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Counters reported by stats()
+        self.in_flight = 0
+        self.waiting = 0
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        self.hashes += 1
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        self.verifications += 1
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True if the stored hash was made with a different cost factor"""
+        return hash_rounds(hashed_password) != self.rounds
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'rounds': self.rounds,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'hashes': self.hashes,
+            'verifications': self.verifications,
+            'rehashes': self.rehashes,
+        }
+
+
+password_hasher = PasswordHasher()
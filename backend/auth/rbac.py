@@ -3,17 +3,60 @@ DOM360 RBAC Manager
 Database operations for user/role management
 """
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from uuid import UUID
 import json
 
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 
 from .models import UserRole, UserCreate, UserUpdate, UserResponse, AuthContext
-from .middleware import hash_password, set_rls_context
+from .middleware import set_rls_context
+from .passwords import password_hasher
+
+try:
+    from ..db.statements import statements
+except ImportError:
+    from db.statements import statements
 
 logger = logging.getLogger(__name__)
 
+# Login lookup; the caller may pass a username in the email parameter
+AUTHENTICATE_USER = statements.register('authenticate_user', """
+    SELECT
+        u.id, u.tenant_id, u.role, u.full_name, u.username,
+        u.email, u.password_hash, u.is_active,
+        u.created_at, u.updated_at, u.last_login_at
+    FROM users u
+    WHERE (LOWER(u.email) = LOWER(%s) OR LOWER(u.username) = LOWER(%s))
+    LIMIT 1
+""")
+
+
+
+async def verify_login(user: Dict[str, Any], password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check `password` against a row from RBACManager.get_login_user
+
+    Runs bcrypt on the hasher's thread pool and needs no connection, so
+    callers must not hold a lease while awaiting it.
+
+    Returns:
+        (verified, new_hash); new_hash is set when the stored hash was made
+        with another cost factor and should be written by record_login
+    """
+    if not await password_hasher.verify(password, user['password_hash']):
+        logger.warning(f"Authentication failed: invalid password ({user['email']})")
+        return False, None
+    
+    # Upgrade hashes made with another cost factor while the plain
+    # password is at hand
+    new_hash = None
+    if password_hasher.needs_rehash(user['password_hash']):
+        new_hash = await password_hasher.hash(password)
+        password_hasher.rehashes += 1
+        logger.info(f"Password rehashed with cost {password_hasher.rounds}: {user['email']}")
+    
+    return True, new_hash
 
 class RBACManager:
     """Manager for RBAC operations"""
@@ -22,30 +65,23 @@ class RBACManager:
         """Initialize with database connection"""
         self.conn = conn
     
-    def authenticate_user(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+    async def get_login_user(self, email: str) -> Optional[Dict[str, Any]]:
         """
-        Authenticate user by email and password
-        
+        Look up an active user for login, password_hash included
+
+        The transaction is ended before returning, so the caller can give
+        the connection back before verifying the password (see verify_login).
+
         Returns:
-            User dict if authenticated, None otherwise
+            User dict if found and active, None otherwise
         """
-        from .middleware import verify_password
-        
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
-            query = """
-                SELECT 
-                    u.id, u.tenant_id, u.role, u.full_name, u.username, 
-                    u.email, u.password_hash, u.is_active,
-                    u.created_at, u.updated_at, u.last_login_at
-                FROM users u
-                WHERE (LOWER(u.email) = LOWER(%s) OR LOWER(u.username) = LOWER(%s))
-                LIMIT 1
-            """
-            # Use email parameter for both comparisons; caller may pass username into the email param
-            cursor.execute(query, (email, email))
-            user = cursor.fetchone()
+            # Use email parameter for both comparisons
+            await statements.execute(cursor, AUTHENTICATE_USER, (email, email))
+            user = await cursor.fetchone()
+            await self.conn.commit()
             
             if not user:
                 logger.warning(f"Authentication failed: user not found ({email})")
@@ -55,36 +91,49 @@ class RBACManager:
                 logger.warning(f"Authentication failed: user inactive ({email})")
                 return None
             
-            # Verify password
-            if not verify_password(password, user['password_hash']):
-                logger.warning(f"Authentication failed: invalid password ({email})")
-                return None
-            
-            # Update last login
-            update_query = "UPDATE users SET last_login_at = NOW() WHERE id = %s"
-            cursor.execute(update_query, (user['id'],))
-            self.conn.commit()
-            
-            # Remove password_hash from response
-            user = dict(user)
-            del user['password_hash']
-            
-            logger.info(f"User authenticated: {email} (role: {user['role']})")
             return user
             
         except Exception as e:
             logger.error(f"Error authenticating user: {e}")
-            self.conn.rollback()
+            await self.conn.rollback()
             return None
         finally:
-            cursor.close()
+            await cursor.close()
+    
+    async def record_login(self, user_id, new_hash: Optional[str] = None) -> bool:
+        """
+        Set last_login_at (and the rehashed password, if any) after a login
+
+        Returns:
+            False if the user was deactivated meanwhile or the update failed
+        """
+        cursor = self.conn.cursor()
+        
+        try:
+            update_query = """
+                UPDATE users
+                SET last_login_at = NOW(),
+                    password_hash = COALESCE(%s, password_hash)
+                WHERE id = %s AND is_active
+            """
+            await cursor.execute(update_query, (new_hash, user_id))
+            updated = cursor.rowcount == 1
+            await self.conn.commit()
+            return updated
+            
+        except Exception as e:
+            logger.error(f"Error recording login: {e}")
+            await self.conn.rollback()
+            return False
+        finally:
+            await cursor.close()
     
-    def get_user_by_id(self, user_id: str, requester: AuthContext) -> Optional[Dict[str, Any]]:
+    async def get_user_by_id(self, user_id: str, requester: AuthContext) -> Optional[Dict[str, Any]]:
         """Get user by ID (with RBAC check)"""
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
-            set_rls_context(cursor, requester)
+            await set_rls_context(cursor, requester)
             
             query = """
                 SELECT 
@@ -94,13 +143,13 @@ class RBACManager:
                 WHERE id = %s
             """
             
-            cursor.execute(query, (user_id,))
-            return cursor.fetchone()
+            await cursor.execute(query, (user_id,))
+            return await cursor.fetchone()
             
         finally:
-            cursor.close()
+            await cursor.close()
     
-    def list_users(
+    async def list_users(
         self,
         requester: AuthContext,
         tenant_id: Optional[str] = None,
@@ -116,10 +165,10 @@ class RBACManager:
         TENANT_ADMIN can see users in their tenant
         TENANT_USER can only see themselves
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
-            set_rls_context(cursor, requester)
+            await set_rls_context(cursor, requester)
             
             query = """
                 SELECT 
@@ -151,19 +200,16 @@ class RBACManager:
             query += " ORDER BY created_at DESC LIMIT %s OFFSET %s"
             params.extend([limit, offset])
             
-            cursor.execute(query, tuple(params))
-            return cursor.fetchall()
+            await cursor.execute(query, tuple(params))
+            return await cursor.fetchall()
             
         finally:
-            cursor.close()
+            await cursor.close()
     
-    def create_user(
-        self,
-        user_data: UserCreate,
-        requester: AuthContext
-    ) -> Dict[str, Any]:
+    @staticmethod
+    def check_create_permission(user_data: UserCreate, requester: AuthContext):
         """
-        Create new user (with RBAC validation)
+        Raise PermissionError unless `requester` may create `user_data`
         
         MASTER can create any user
         TENANT_ADMIN can create TENANT_USER in their tenant
@@ -177,13 +223,24 @@ class RBACManager:
         # TENANT_ADMIN can only create users in their own tenant
         if requester.is_tenant_admin and user_data.tenant_id != requester.tenant_id:
             raise PermissionError("TENANT_ADMIN can only create users in their own tenant")
+    
+    async def create_user(
+        self,
+        user_data: UserCreate,
+        requester: AuthContext,
+        password_hash: str
+    ) -> Dict[str, Any]:
+        """
+        Create new user (with RBAC validation)
         
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        `password_hash` is password_hasher.hash(user_data.password), computed
+        by the caller before leasing the connection.
+        """
+        self.check_create_permission(user_data, requester)
+        
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
-            # Hash password
-            password_hash = hash_password(user_data.password)
-            
             query = """
                 INSERT INTO users (
                     tenant_id, role, full_name, username, email, password_hash, is_active
@@ -193,7 +250,7 @@ class RBACManager:
                           is_active, created_at, updated_at, last_login_at
             """
             
-            cursor.execute(query, (
+            await cursor.execute(query, (
                 user_data.tenant_id,
                 user_data.role.value,
                 user_data.name,
@@ -202,20 +259,20 @@ class RBACManager:
                 password_hash
             ))
             
-            new_user = cursor.fetchone()
-            self.conn.commit()
+            new_user = await cursor.fetchone()
+            await self.conn.commit()
             
             logger.info(f"User created: {new_user['email']} by {requester.username}")
             return new_user
             
         except Exception as e:
-            self.conn.rollback()
+            await self.conn.rollback()
             logger.error(f"Error creating user: {e}")
             raise
         finally:
-            cursor.close()
+            await cursor.close()
     
-    def update_user(
+    async def update_user(
         self,
         user_id: str,
         user_data: UserUpdate,
@@ -228,15 +285,15 @@ class RBACManager:
         TENANT_ADMIN can update users in their tenant (except MASTER users)
         MASTER can update any user
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
             # Get existing user
-            set_rls_context(cursor, requester)
+            await set_rls_context(cursor, requester)
             
             query = "SELECT * FROM users WHERE id = %s"
-            cursor.execute(query, (user_id,))
-            existing_user = cursor.fetchone()
+            await cursor.execute(query, (user_id,))
+            existing_user = await cursor.fetchone()
             
             if not existing_user:
                 raise ValueError(f"User {user_id} not found")
@@ -296,36 +353,36 @@ class RBACManager:
             params.append(user_id)
             
             logger.debug(f"Executing user update: query={query} params={params}")
-            cursor.execute(query, tuple(params))
-            updated_user = cursor.fetchone()
-            self.conn.commit()
+            await cursor.execute(query, tuple(params))
+            updated_user = await cursor.fetchone()
+            await self.conn.commit()
             
             logger.info(f"User updated: {updated_user['email']} by {requester.username}")
             return updated_user
             
         except Exception as e:
-            self.conn.rollback()
+            await self.conn.rollback()
             logger.error(f"Error updating user: {e}")
             raise
         finally:
-            cursor.close()
+            await cursor.close()
     
-    def delete_user(self, user_id: str, requester: AuthContext) -> bool:
+    async def delete_user(self, user_id: str, requester: AuthContext) -> bool:
         """
         Soft delete user (set is_active = false)
         
         MASTER can delete any user
         TENANT_ADMIN can delete TENANT_USER in their tenant
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = self.conn.cursor(row_factory=dict_row)
         
         try:
-            set_rls_context(cursor, requester)
+            await set_rls_context(cursor, requester)
             
             # Get existing user
             query = "SELECT * FROM users WHERE id = %s"
-            cursor.execute(query, (user_id,))
-            existing_user = cursor.fetchone()
+            await cursor.execute(query, (user_id,))
+            existing_user = await cursor.fetchone()
             
             if not existing_user:
                 raise ValueError(f"User {user_id} not found")
@@ -341,15 +398,15 @@ class RBACManager:
             
             # Soft delete
             query = "UPDATE users SET is_active = FALSE, updated_at = NOW() WHERE id = %s"
-            cursor.execute(query, (user_id,))
-            self.conn.commit()
+            await cursor.execute(query, (user_id,))
+            await self.conn.commit()
             
             logger.info(f"User deleted: {existing_user['email']} by {requester.username}")
             return True
             
         except Exception as e:
-            self.conn.rollback()
+            await self.conn.rollback()
             logger.error(f"Error deleting user: {e}")
             raise
         finally:
-            cursor.close()
+            await cursor.close()
@@ -0,0 +1,73 @@
+"""
+DOM360 RLS Session Binder
+Binds the request's tenant/role to the current transaction for RLS policies
+"""
+import logging
+from weakref import WeakKeyDictionary
+
+from psycopg.pq import TransactionStatus
+
+from .models import AuthContext, UserRole
+
+logger = logging.getLogger(__name__)
+
+# Variable contract read by the RLS policies (database/migrations/013):
+#   app.current_tenant_id  -> current_tenant_id()
+#   app.current_user_role  -> current_user_role()
+#   app.is_master_user     -> is_master_user()
+RLS_TENANT_SETTING = 'app.current_tenant_id'
+RLS_ROLE_SETTING = 'app.current_user_role'
+RLS_MASTER_SETTING = 'app.is_master_user'
+
+# Transaction-local (is_local = true): values vanish at COMMIT/ROLLBACK
+_BIND_QUERY = f"""
+    SELECT set_config('{RLS_TENANT_SETTING}', %s, true),
+           set_config('{RLS_ROLE_SETTING}', %s, true),
+           set_config('{RLS_MASTER_SETTING}', %s, true)
+"""
+
+# Binding applied to each connection's open transaction
+_bound: 'WeakKeyDictionary' = WeakKeyDictionary()
+
+
+def rls_binding(user: AuthContext) -> tuple:
+    """Parameters of the set_config call for `user`"""
+    return (
+        str(user.tenant_id),
+        user.role.value,
+        'true' if user.role == UserRole.MASTER else 'false'
+    )
+
+
+def is_rls_bound(conn, user: AuthContext) -> bool:
+    """True if the open transaction on `conn` is already bound to `user`"""
+    if conn.info.transaction_status != TransactionStatus.INTRANS:
+        # Committed, rolled back or failed: SET LOCAL values are gone
+        _bound.pop(conn, None)
+        return False
+    return _bound.get(conn) == rls_binding(user)
+
+
+async def bind_rls(cursor, user: AuthContext, force: bool = False) -> bool:
+    """
+    Bind tenant, role and master flag with a single set_config statement
+
+    Skipped when this binder already bound the open transaction to the
+    same user; returns whether a statement was sent. Use `force` when the
+    transaction may have been restarted outside the binder (a direct
+    conn.commit() followed by other statements).
+    """
+    conn = cursor.connection
+    if not force and is_rls_bound(conn, user):
+        return False
+
+    binding = rls_binding(user)
+    await cursor.execute(_BIND_QUERY, binding)
+    _bound[conn] = binding
+    logger.debug(f"RLS context set: tenant_id={user.tenant_id}, role={user.role.value}")
+    return True
+
+
+def unbind_rls(conn):
+    """Forget the binding of `conn` (call after COMMIT/ROLLBACK)"""
+    _bound.pop(conn, None)
@@ -0,0 +1,77 @@
+"""
+DOM360 Verified Token Cache
+LRU of already-verified JWTs so repeated requests skip decoding
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .models import AuthContext
+
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a token; the raw token is never stored"""
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified tokens, keyed by token digest
+
+    Each entry holds the AuthContext built from the token claims and the
+    token's `exp`. A lookup at or after `exp` removes the entry and misses,
+    so a cached token never outlives its own expiry; the caller then
+    decodes it again and gets the usual "Token expired" error. At most
+    `max_entries` tokens are kept, least recently used evicted first.
+    `max_entries=0` disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[bytes, Tuple[int, AuthContext]]' = OrderedDict()
+
+        # Counters reported by stats()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[AuthContext]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        exp, context = entry
+        if time.time() >= exp:
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return context
+
+    def put(self, key: bytes, exp: int, context: AuthContext):
+        if not self.max_entries:
+            return
+        self._entries[key] = (exp, context)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+        }
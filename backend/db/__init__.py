@@ -0,0 +1,58 @@
+"""
+DOM360 Database Module
+"""
+from .pool import AsyncConnectionPool, PoolError, PoolTimeout, lease_connection
+from .api_log_writer import API_LOG_COLUMNS, ApiLogWriter, get_api_log_writer
+from .audit_writer import AUDIT_COLUMNS, AuditWriter, get_audit_writer
+from .history_cache import ConversationHistoryCache, get_history_cache
+from .dashboard_cache import DashboardCache, get_dashboard_cache
+from .metrics_snapshot import MetricsSnapshotRefresher, get_metrics_snapshot_refresher
+from .partitions import PartitionManager, get_partition_manager
+from .usage_aggregator import WRITE_BEHIND_OPTIONS, UsageAggregator, get_usage_aggregator
+from .unit_of_work import in_unit_of_work, unit_of_work
+from .statements import Statement, StatementRegistry, statements
+from .timing import RequestTimings, TimedAsyncCursor, current_timings, timed_agent, timed_db
+from .settings_cache import (
+    MASTER_SETTINGS_CHANNEL,
+    MasterSettings,
+    MasterSettingsCache,
+    get_settings_cache
+)
+
+__all__ = [
+    'AsyncConnectionPool',
+    'PoolError',
+    'PoolTimeout',
+    'lease_connection',
+    'API_LOG_COLUMNS',
+    'ApiLogWriter',
+    'get_api_log_writer',
+    'AUDIT_COLUMNS',
+    'AuditWriter',
+    'get_audit_writer',
+    'ConversationHistoryCache',
+    'get_history_cache',
+    'DashboardCache',
+    'get_dashboard_cache',
+    'MetricsSnapshotRefresher',
+    'get_metrics_snapshot_refresher',
+    'PartitionManager',
+    'get_partition_manager',
+    'WRITE_BEHIND_OPTIONS',
+    'UsageAggregator',
+    'get_usage_aggregator',
+    'in_unit_of_work',
+    'unit_of_work',
+    'Statement',
+    'StatementRegistry',
+    'statements',
+    'RequestTimings',
+    'TimedAsyncCursor',
+    'current_timings',
+    'timed_agent',
+    'timed_db',
+    'MASTER_SETTINGS_CHANNEL',
+    'MasterSettings',
+    'MasterSettingsCache',
+    'get_settings_cache',
+]
@@ -0,0 +1,123 @@
+"""
+DOM360 API Log Writer
+Ring buffer of request log rows bulk-loaded into api_logs with COPY
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+# Column order of the tuples accepted by ApiLogWriter.append()
+API_LOG_COLUMNS = (
+    'tenant_id', 'user_id', 'method', 'path', 'status_code', 'response_time_ms',
+    'request_body', 'response_body', 'error_message', 'ip_address', 'user_agent',
+    'created_at'
+)
+
+_COPY = f"COPY api_logs ({', '.join(API_LOG_COLUMNS)}) FROM STDIN"
+
+
+class ApiLogWriter:
+    """
+    Best-effort request log sink
+
+    append() is a plain deque append on the event loop: no lock, no await,
+    no I/O. The deque is a ring of `buffer_size` rows; when the flusher
+    falls behind, the oldest rows are overwritten and counted as dropped.
+    Every `flush_interval` seconds the background task swaps the ring for
+    an empty one and COPYs the rows into api_logs. A failed COPY discards
+    its rows (counted) instead of retrying: request logs are not worth
+    back-pressure on the application.
+    """
+
+    def __init__(self, pool, buffer_size: int = 10000, flush_interval: float = 2.0):
+        self.pool = pool
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters reported by stats()
+        self.appended = 0
+        self.sampled_out = 0
+        self.dropped_overflow = 0
+        self.dropped_failed = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.last_flush_ms = 0.0
+
+    def append(self, row: Tuple):
+        """Buffer one row (see API_LOG_COLUMNS)"""
+        if len(self._buffer) == self.buffer_size:
+            self.dropped_overflow += 1
+        self._buffer.append(row)
+        self.appended += 1
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write what is still buffered"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """COPY the buffered rows; returns how many were written"""
+        if not self._buffer:
+            return 0
+
+        batch, self._buffer = self._buffer, deque(maxlen=self.buffer_size)
+        started = time.monotonic()
+        try:
+            async with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                async with cursor.copy(_COPY) as copy:
+                    for row in batch:
+                        await copy.write_row(row)
+                await conn.commit()
+        except (psycopg.Error, OSError) as e:
+            self.flush_failures += 1
+            self.dropped_failed += len(batch)
+            logger.warning(f"API log flush of {len(batch)} rows failed, rows discarded: {e}")
+            return 0
+
+        self.flushes += 1
+        self.written += len(batch)
+        self.last_flush_ms = round((time.monotonic() - started) * 1000, 3)
+        return len(batch)
+
+    def stats(self) -> dict:
+        return {
+            'buffered': len(self._buffer),
+            'buffer_size': self.buffer_size,
+            'appended': self.appended,
+            'sampled_out': self.sampled_out,
+            'dropped_overflow': self.dropped_overflow,
+            'dropped_failed': self.dropped_failed,
+            'written': self.written,
+            'flushes': self.flushes,
+            'flush_failures': self.flush_failures,
+            'last_flush_ms': self.last_flush_ms,
+        }
+
+
+def get_api_log_writer(request) -> Optional[ApiLogWriter]:
+    """Return the API log writer created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'api_log_writer', None)
@@ -0,0 +1,209 @@
+"""
+DOM360 Audit Writer
+Bounded queue of audit events drained into audit_logs in the background
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+# Column order of the tuples accepted by AuditWriter.submit()
+AUDIT_COLUMNS = (
+    'tenant_id', 'user_id', 'action', 'resource_type', 'resource_id',
+    'changes', 'ip_address', 'user_agent', 'created_at'
+)
+
+_COPY = f"COPY audit_logs ({', '.join(AUDIT_COLUMNS)}) FROM STDIN"
+
+OVERFLOW_POLICIES = ('block', 'drop')
+
+
+class AuditWriter:
+    """
+    Writes audit events with COPY, off the request path
+
+    submit() puts an event in a queue of at most `max_queue` entries and
+    returns without touching the database. A background task takes up to
+    `batch_size` events, waiting at most `flush_interval` seconds after the
+    first one, and COPYs them into audit_logs on a pooled connection. A
+    failed batch is retried with backoff and never reordered behind newer
+    events.
+
+    When the queue is full, `overflow='block'` makes submit() wait up to
+    `block_timeout` seconds for room before dropping the event;
+    `overflow='drop'` drops it at once. Dropped events are counted and
+    logged. stop() drains whatever is queued within `drain_timeout`.
+    """
+
+    def __init__(
+        self,
+        pool,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = 'block',
+        block_timeout: float = 0.5,
+        drain_timeout: float = 10.0
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid audit overflow policy: {overflow}")
+
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.drain_timeout = drain_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._inflight: List[Tuple] = []
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters reported by stats()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_batch_ms = 0.0
+
+    async def submit(self, event: Tuple) -> bool:
+        """Queue one event (see AUDIT_COLUMNS); returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.overflow == 'drop' or self._task is None:
+                return self._drop(event)
+            try:
+                await asyncio.wait_for(self._queue.put(event), self.block_timeout)
+            except asyncio.TimeoutError:
+                return self._drop(event)
+        self.submitted += 1
+        return True
+
+    def _drop(self, event: Tuple) -> bool:
+        self.dropped += 1
+        logger.error(f"Audit event dropped, queue full: {event[2]} {event[3]}/{event[4]}")
+        return False
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write what is still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        deadline = time.monotonic() + self.drain_timeout
+        while (self._inflight or not self._queue.empty()) and time.monotonic() < deadline:
+            if not self._inflight:
+                self._inflight = self._take(self.batch_size)
+            try:
+                await asyncio.wait_for(self._write(self._inflight), deadline - time.monotonic())
+                self._inflight = []
+            except (psycopg.Error, OSError, asyncio.TimeoutError) as e:
+                logger.error(f"Audit drain failed: {e}")
+                break
+
+        lost = len(self._inflight) + self._queue.qsize()
+        if lost:
+            self.dropped += lost
+            logger.error(f"Audit writer stopped with {lost} unwritten events")
+
+    def _take(self, limit: int) -> List[Tuple]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _next_batch(self) -> List[Tuple]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            batch.extend(self._take(self.batch_size - len(batch)))
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        failures = 0
+        while True:
+            if not self._inflight:
+                self._inflight = await self._next_batch()
+            try:
+                try:
+                    await self._write(self._inflight)
+                    self._inflight = []
+                except (psycopg.DataError, psycopg.IntegrityError) as e:
+                    # A bad event must not block the queue: write one by one
+                    logger.warning(f"Audit batch rejected ({e}); writing events individually")
+                    await self._write_each()
+                failures = 0
+            except (psycopg.Error, OSError) as e:
+                failures += 1
+                self.failed_batches += 1
+                backoff = min(2 ** failures, 30)
+                logger.warning(
+                    f"Audit batch of {len(self._inflight)} events failed, "
+                    f"retrying in {backoff}s: {e}"
+                )
+                await asyncio.sleep(backoff)
+
+    async def _write(self, batch: List[Tuple]):
+        started = time.monotonic()
+        async with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            async with cursor.copy(_COPY) as copy:
+                for event in batch:
+                    await copy.write_row(event)
+            await conn.commit()
+
+        self.batches += 1
+        self.written += len(batch)
+        self.last_batch_ms = round((time.monotonic() - started) * 1000, 3)
+
+    async def _write_each(self):
+        """Write the in-flight batch event by event, dropping rejected ones"""
+        while self._inflight:
+            event = self._inflight[0]
+            try:
+                await self._write([event])
+            except (psycopg.DataError, psycopg.IntegrityError) as e:
+                self.dropped += 1
+                logger.error(f"Audit event rejected: {event[2]} {event[3]}/{event[4]}: {e}")
+            self._inflight.pop(0)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'inflight': len(self._inflight),
+            'overflow': self.overflow,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'last_batch_ms': self.last_batch_ms,
+        }
+
+
+def get_audit_writer(request) -> Optional[AuditWriter]:
+    """Return the audit writer created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'audit_writer', None)
@@ -0,0 +1,91 @@
+"""
+DOM360 Dashboard Cache
+Short-lived per-tenant cache of dashboard responses
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardCache:
+    """
+    In-process TTL cache keyed by (tenant_id, from_date, to_date)
+
+    Concurrent misses on the same key share a single load, so a burst of
+    dashboard refreshes costs one round of queries per worker per `ttl`
+    seconds. Least recently used keys are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl: float = 15.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+        self._loading: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, calling `loader` on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            try:
+                value = await asyncio.shield(pending)
+                self.hits += 1
+                return value
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The loading request was cancelled; load on our own
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody waited for is not logged
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+    def invalidate_tenant(self, tenant_id: int):
+        """Drop every cached range of one tenant"""
+        for key in [k for k in self._entries if k[0] == tenant_id]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_dashboard_cache(request) -> Optional[DashboardCache]:
+    """Return the dashboard cache created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'dashboard_cache', None)
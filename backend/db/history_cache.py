@@ -0,0 +1,115 @@
+"""
+DOM360 Conversation History Cache
+Byte-bounded LRU of conversation histories, appended to as messages are stored
+"""
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead (dict, two keys, list slot) on top of the text
+_MESSAGE_OVERHEAD_BYTES = 96
+
+
+def _message_size(message: Dict) -> int:
+    return len(message['content'].encode('utf-8')) + _MESSAGE_OVERHEAD_BYTES
+
+
+class _Entry:
+    __slots__ = ('messages', 'last_index', 'size')
+
+    def __init__(self, messages: List[Dict], last_index: int):
+        self.messages = messages
+        self.last_index = last_index
+        self.size = sum(_message_size(m) for m in messages)
+
+
+class ConversationHistoryCache:
+    """
+    In-process cache of `[{"role", "content"}, ...]` histories
+
+    Entries remember the message_index of the last message they include, so
+    an append is only accepted when it is the very next index. A gap means
+    another worker wrote to the conversation; the entry is dropped and the
+    next turn reads the history from the database again.
+
+    Keys are (tenant_id, conversation_id). Least recently used entries are
+    evicted once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple, _Entry]' = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Tuple[List[Dict], int]]:
+        """Return a copy of (history, last_index), or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry.messages), entry.last_index
+
+    def put(self, key: Tuple, messages: List[Dict], last_index: int):
+        """Store a full history read from the database"""
+        self.discard(key)
+        entry = _Entry(list(messages), last_index)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._size += entry.size
+        self._evict()
+
+    def append(self, key: Tuple, role: str, content: Optional[str], index: int) -> bool:
+        """Append the message stored at `index`; drops the entry on a gap"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if index != entry.last_index + 1:
+            self.discard(key)
+            return False
+
+        entry.last_index = index
+        if content:
+            message = {"role": role, "content": content}
+            entry.messages.append(message)
+            size = _message_size(message)
+            entry.size += size
+            self._size += size
+            self._entries.move_to_end(key)
+            self._evict()
+        return True
+
+    def discard(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+def get_history_cache(request) -> Optional[ConversationHistoryCache]:
+    """Return the history cache created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'history_cache', None)
@@ -0,0 +1,94 @@
+"""
+DOM360 Metrics Snapshot Refresher
+Keeps metrics_daily fresh in the background for GET /api/admin/metrics
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSnapshotRefresher:
+    """
+    Periodically calls maintain_metrics_snapshot() (migration 014)
+
+    The endpoint only reads metrics_daily; this task keeps it current.
+    Every worker runs one, but the database decides what is due, so across
+    all of them the snapshot is refreshed incrementally (today's rows)
+    once per `max_age` seconds and rebuilt from scratch once per
+    `full_interval` seconds. The full rebuild is what picks up deletes and
+    dropped partitions in closed days.
+    """
+
+    def __init__(self, pool, max_age: float = 60.0, full_interval: float = 24 * 3600):
+        self.pool = pool
+        self.max_age = max_age
+        self.full_interval = full_interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters reported by stats()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_ms = 0.0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            # Polling at half the max age keeps the snapshot under 1.5x of it
+            await asyncio.sleep(self.max_age / 2)
+
+    async def refresh(self) -> bool:
+        """Refresh the snapshot if due; returns whether this worker did it"""
+        started = time.monotonic()
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute(
+                    """
+                    SELECT maintain_metrics_snapshot(
+                        make_interval(secs => %s), make_interval(secs => %s)
+                    )
+                    """,
+                    (self.max_age, self.full_interval)
+                )
+                refreshed_at = (await cursor.fetchone())[0]
+                await conn.commit()
+        except (psycopg.Error, OSError) as e:
+            self.failures += 1
+            logger.warning(f"Metrics snapshot refresh failed: {e}")
+            return False
+
+        if refreshed_at is None:
+            return False
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.monotonic() - started) * 1000, 3)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'max_age': self.max_age,
+            'full_interval': self.full_interval,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_refresh_ms': self.last_refresh_ms,
+        }
+
+
+def get_metrics_snapshot_refresher(request) -> Optional[MetricsSnapshotRefresher]:
+    """Return the snapshot refresher created in the app lifespan"""
+    return getattr(request.app.state, 'metrics_snapshot_refresher', None)
@@ -0,0 +1,220 @@
+"""
+DOM360 Partition Manager
+Keeps monthly range partitions ahead of time and retires old ones
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import psycopg
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+# Session advisory lock so only one worker maintains partitions at a time
+_MAINTENANCE_LOCK_KEY = 0x70617274  # 'part'
+
+# Bounds as rendered by pg_get_expr(): FOR VALUES FROM ('...') TO ('...')
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound_date(value: str) -> date:
+    return datetime.fromisoformat(value).astimezone(timezone.utc).date()
+
+
+class PartitionManager:
+    """
+    Monthly partition lifecycle for tables partitioned by created_at
+
+    `retention` maps each parent table to the number of months to keep
+    (0 keeps everything). Every `interval` seconds one worker, holding an
+    advisory lock, creates the current month and the next
+    `premake_months` via ensure_monthly_partition() (migration 012), then
+    detaches partitions whose whole range is older than the retention
+    window. Detached tables are dropped only when `drop_detached` is set;
+    otherwise they stay in place for archiving.
+
+    A DETACH ... CONCURRENTLY interrupted by a killed or cancelled worker
+    leaves the partition pending detach, and Postgres refuses any other
+    detach on that parent until it is finished. Pending partitions are
+    therefore completed with DETACH PARTITION ... FINALIZE before anything
+    else is detached.
+
+    plan() returns the same actions without executing them.
+    """
+
+    def __init__(
+        self,
+        pool,
+        retention: Dict[str, int],
+        premake_months: int = 3,
+        interval: float = 6 * 3600,
+        drop_detached: bool = False
+    ):
+        self.pool = pool
+        self.retention = retention
+        self.premake_months = premake_months
+        self.interval = interval
+        self.drop_detached = drop_detached
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[dict] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.maintain()
+            except (psycopg.Error, OSError) as e:
+                logger.error(f"Partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _partitions(self, conn, parent: str) -> List[dict]:
+        cursor = await conn.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound, i.inhdetachpending
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            (parent,)
+        )
+        partitions = []
+        for name, bound, detach_pending in await cursor.fetchall():
+            match = _BOUND_RE.search(bound or '')
+            if not match:
+                # DEFAULT partition or a layout we do not manage
+                continue
+            partitions.append({
+                'name': name,
+                'from': _bound_date(match.group(1)),
+                'to': _bound_date(match.group(2)),
+                'detach_pending': detach_pending,
+            })
+        return partitions
+
+    async def _plan(self, conn, today: date) -> dict:
+        current = today.replace(day=1)
+        wanted = [_add_months(current, n) for n in range(self.premake_months + 1)]
+        report = {}
+
+        for parent, keep_months in self.retention.items():
+            partitions = await self._partitions(conn, parent)
+            covered = {p['from'] for p in partitions}
+            create = [
+                f"{parent}_{month:%Y_%m}" for month in wanted
+                if month not in covered
+            ]
+
+            # Interrupted DETACH ... CONCURRENTLY, finished before anything else
+            finalize = [p['name'] for p in partitions if p['detach_pending']]
+
+            retire = []
+            cutoff = None
+            if keep_months:
+                cutoff = _add_months(current, -keep_months)
+                retire = [
+                    p['name'] for p in partitions
+                    if p['to'] <= cutoff and not p['detach_pending']
+                ]
+
+            report[parent] = {
+                'partitions': len(partitions),
+                'newest': partitions[-1]['name'] if partitions else None,
+                'create': create,
+                'retention_months': keep_months,
+                'cutoff': cutoff.isoformat() if cutoff else None,
+                'finalize': finalize,
+                'detach': retire,
+                'drop': finalize + retire if self.drop_detached else [],
+            }
+        return report
+
+    async def plan(self, today: Optional[date] = None) -> dict:
+        """Dry run: what maintain() would create, detach and drop"""
+        today = today or datetime.now(timezone.utc).date()
+        async with self.pool.connection() as conn:
+            report = await self._plan(conn, today)
+            await conn.rollback()
+        return {'dry_run': True, 'date': today.isoformat(), 'tables': report}
+
+    async def maintain(self, today: Optional[date] = None) -> Optional[dict]:
+        """Apply the plan; returns None if another worker holds the lock"""
+        today = today or datetime.now(timezone.utc).date()
+        async with self.pool.connection() as conn:
+            # DETACH ... CONCURRENTLY cannot run inside a transaction block
+            await conn.set_autocommit(True)
+            try:
+                cursor = await conn.execute("SELECT pg_try_advisory_lock(%s)", (_MAINTENANCE_LOCK_KEY,))
+                if not (await cursor.fetchone())[0]:
+                    return None
+                try:
+                    report = await self._apply(conn, today)
+                finally:
+                    await conn.execute("SELECT pg_advisory_unlock(%s)", (_MAINTENANCE_LOCK_KEY,))
+            finally:
+                await conn.set_autocommit(False)
+
+        self.last_run = {'dry_run': False, 'date': today.isoformat(), 'tables': report}
+        return self.last_run
+
+    async def _apply(self, conn, today: date) -> dict:
+        report = await self._plan(conn, today)
+
+        for parent, actions in report.items():
+            for name in actions['finalize']:
+                await conn.execute(
+                    sql.SQL("ALTER TABLE {} DETACH PARTITION {} FINALIZE").format(
+                        sql.Identifier(parent), sql.Identifier(name)
+                    )
+                )
+                logger.warning(f"Partition detach finalized after an interrupted run: {name}")
+
+                if self.drop_detached:
+                    await conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    logger.info(f"Partition dropped: {name}")
+
+            for name in actions['create']:
+                month = datetime.strptime(name[-7:], '%Y_%m').date()
+                await conn.execute(
+                    "SELECT ensure_monthly_partition(%s::regclass, %s)",
+                    (parent, month)
+                )
+                logger.info(f"Partition created: {name}")
+
+            for name in actions['detach']:
+                await conn.execute(
+                    sql.SQL("ALTER TABLE {} DETACH PARTITION {} CONCURRENTLY").format(
+                        sql.Identifier(parent), sql.Identifier(name)
+                    )
+                )
+                logger.info(f"Partition detached: {name} (older than {actions['cutoff']})")
+
+                if self.drop_detached:
+                    await conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    logger.info(f"Partition dropped: {name}")
+
+        return report
+
+
+def get_partition_manager(request) -> Optional[PartitionManager]:
+    """Return the partition manager created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'partition_manager', None)
@@ -0,0 +1,323 @@
+"""
+DOM360 Async PostgreSQL Connection Pool
+Bounded pool of psycopg AsyncConnection objects for use inside the event loop
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg.pq import TransactionStatus
+
+from .timing import record_pool_wait
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(psycopg.Error):
+    """Raised when the pool cannot hand out a connection"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became free within the acquire timeout"""
+
+
+def _connect_kwargs(config: dict) -> dict:
+    """Translate DATABASE_CONFIG keys into libpq connection parameters"""
+    kwargs = dict(config)
+    if 'database' in kwargs:
+        kwargs['dbname'] = kwargs.pop('database')
+    return kwargs
+
+
+class _ConnInfo:
+    """Bookkeeping kept for each pooled connection"""
+    __slots__ = ('created_at', 'uses', 'returned_at')
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.returned_at = self.created_at
+
+
+class AsyncConnectionPool:
+    """
+    Awaitable connection pool
+
+    Waiters are served in FIFO order and give up with PoolTimeout after
+    `acquire_timeout` seconds. Idle connections are pinged on checkout once
+    they have been idle for `check_idle` seconds, and recycled after
+    `max_uses` checkouts or `max_lifetime` seconds (0 disables either limit).
+
+    All state lives on the event loop that opened the pool; share it between
+    coroutines, not threads. Each worker process owns its own pool.
+
+    Usage:
+        pool = AsyncConnectionPool(minconn=2, maxconn=10, **DATABASE_CONFIG)
+        await pool.open()
+
+        async with pool.connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute("SELECT 1")
+
+        await pool.close()
+    """
+
+    def __init__(
+        self,
+        minconn: int = 1,
+        maxconn: int = 10,
+        acquire_timeout: float = 5.0,
+        max_uses: int = 0,
+        max_lifetime: float = 0,
+        check_idle: float = 30.0,
+        **config
+    ):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: minconn={minconn}, maxconn={maxconn}")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self._connect_kwargs = _connect_kwargs(config)
+        self._idle: deque = deque()
+        self._waiters: deque = deque()
+        self._info: Dict[int, _ConnInfo] = {}
+        self._in_use = 0
+        self._closed = True
+
+        # Counters reported by stats()
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._connections_opened = 0
+        self._connections_recycled = 0
+        self._connections_failed_check = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def open(self):
+        """Open the pool and pre-create `minconn` connections"""
+        self._closed = False
+        for _ in range(self.minconn):
+            self._idle.append(await self._connect())
+
+    async def close(self):
+        """Close every idle connection; checked-out ones are closed on return"""
+        self._closed = True
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(PoolError("Connection pool is closed"))
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    async def _connect(self) -> AsyncConnection:
+        conn = await AsyncConnection.connect(**self._connect_kwargs)
+        self._info[id(conn)] = _ConnInfo()
+        self._connections_opened += 1
+        return conn
+
+    async def _discard(self, conn: AsyncConnection):
+        self._info.pop(id(conn), None)
+        try:
+            await conn.close()
+        except psycopg.Error as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def _expired(self, info: _ConnInfo, now: float) -> bool:
+        if self.max_uses and info.uses >= self.max_uses:
+            return True
+        if self.max_lifetime and now - info.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    async def _check(self, conn: AsyncConnection) -> bool:
+        """Ping a connection without leaving a transaction open"""
+        try:
+            await conn.set_autocommit(True)
+            await conn.execute("")
+            await conn.set_autocommit(False)
+            return True
+        except psycopg.Error as e:
+            logger.warning(f"Discarding pooled connection that failed health check: {e}")
+            self._connections_failed_check += 1
+            return False
+
+    # ------------------------------------------------------------------------
+    # Slots
+    # ------------------------------------------------------------------------
+
+    async def _acquire_slot(self, timeout: Optional[float]):
+        if self._in_use < self.maxconn and not self._waiters:
+            self._in_use += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was handed over as we gave up; pass it on
+                self._release_slot()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            if isinstance(e, asyncio.TimeoutError):
+                self._timeouts += 1
+                raise PoolTimeout(
+                    f"No database connection available after {timeout}s "
+                    f"(maxconn={self.maxconn}, waiting={len(self._waiters)})"
+                ) from None
+            raise
+
+    def _release_slot(self):
+        """Hand the slot to the oldest waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_use -= 1
+
+    # ------------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------------
+
+    async def getconn(self, timeout: Optional[float] = None) -> AsyncConnection:
+        """Check a connection out, waiting up to `timeout` seconds for a free slot"""
+        if self._closed:
+            raise PoolError("Connection pool is closed")
+
+        if timeout is None:
+            timeout = self.acquire_timeout
+
+        started = time.monotonic()
+        await self._acquire_slot(timeout)
+        try:
+            conn = await self._checkout()
+        except BaseException:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        record_pool_wait(waited * 1000)
+        return conn
+
+    async def _checkout(self) -> AsyncConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            info = self._info.get(id(conn))
+            now = time.monotonic()
+
+            if conn.closed or info is None:
+                await self._discard(conn)
+                continue
+            if self._expired(info, now):
+                self._connections_recycled += 1
+                await self._discard(conn)
+                continue
+            if now - info.returned_at >= self.check_idle and not await self._check(conn):
+                await self._discard(conn)
+                continue
+
+            info.uses += 1
+            return conn
+
+        conn = await self._connect()
+        self._info[id(conn)].uses += 1
+        return conn
+
+    async def putconn(self, conn: AsyncConnection, close: bool = False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if not close and not conn.closed:
+                status = conn.info.transaction_status
+                if status in (TransactionStatus.INTRANS, TransactionStatus.INERROR):
+                    try:
+                        await conn.rollback()
+                    except psycopg.Error as e:
+                        logger.warning(f"Discarding connection after failed rollback: {e}")
+                        close = True
+                elif status != TransactionStatus.IDLE:
+                    # ACTIVE (query interrupted mid-flight) or UNKNOWN (broken)
+                    close = True
+
+            info = self._info.get(id(conn))
+            now = time.monotonic()
+            if not close and info is not None and self._expired(info, now):
+                self._connections_recycled += 1
+                close = True
+
+            if close or self._closed or conn.closed or info is None:
+                await self._discard(conn)
+            else:
+                info.returned_at = now
+                self._idle.append(conn)
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of an `async with` block"""
+        conn = await self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            await self.putconn(conn)
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for sizing `maxconn`"""
+        return {
+            'minconn': self.minconn,
+            'maxconn': self.maxconn,
+            'in_use': self._in_use,
+            'idle': len(self._idle),
+            'waiting': sum(1 for w in self._waiters if not w.done()),
+            'connections_opened': self._connections_opened,
+            'connections_recycled': self._connections_recycled,
+            'connections_failed_check': self._connections_failed_check,
+            'acquired': self._acquired,
+            'acquire_timeouts': self._timeouts,
+            'acquire_wait_avg_ms': round(self._wait_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+            'acquire_wait_max_ms': round(self._wait_max * 1000, 3),
+        }
+
+
+def lease_connection(request):
+    """
+    Lease a pooled connection for one unit of DB work
+
+    The connection goes back to the pool as soon as the block exits, so
+    handlers must not hold a lease across external awaits (Agent API calls,
+    health checks).
+
+    Usage:
+        async with lease_connection(request) as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute("SELECT 1")
+    """
+    pool = getattr(request.app.state, 'db_pool', None)
+    if pool is None or pool.closed:
+        # Imported lazily so the pool module stays framework-agnostic
+        from fastapi import HTTPException, status
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database connection not available"
+        )
+    return pool.connection()
@@ -0,0 +1,169 @@
+"""
+DOM360 Master Settings Cache
+Process-local copy of the master_settings row, invalidated by LISTEN/NOTIFY
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+from .pool import AsyncConnectionPool, _connect_kwargs
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the master_settings trigger (migration 002)
+MASTER_SETTINGS_CHANNEL = 'master_settings_changed'
+
+
+@dataclass(frozen=True)
+class MasterSettings:
+    """Subset of master_settings used on the request path"""
+    id: int
+    sdr_agent_endpoint: str
+    sdr_agent_timeout_ms: int
+    server_config: dict = field(default_factory=dict)
+    health_check_enabled: bool = True
+    health_check_interval_seconds: int = 300
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'MasterSettings':
+        server_config = row.get('server_config') or {}
+        if isinstance(server_config, str):
+            server_config = json.loads(server_config)
+        return cls(
+            id=row['id'],
+            sdr_agent_endpoint=row['sdr_agent_endpoint'],
+            sdr_agent_timeout_ms=row['sdr_agent_timeout_ms'],
+            server_config=server_config,
+            health_check_enabled=row.get('health_check_enabled', True),
+            health_check_interval_seconds=row.get('health_check_interval_seconds') or 300,
+        )
+
+
+class MasterSettingsCache:
+    """
+    Serve master_settings from memory
+
+    The row is loaded at startup and reloaded lazily after a NOTIFY on
+    `master_settings_changed` or once `ttl` seconds have passed, so a missed
+    notification is never stale for longer than the TTL.
+
+    Usage:
+        cache = MasterSettingsCache(pool, ttl=300, **DATABASE_CONFIG)
+        await cache.start()
+        settings = await cache.get()
+        await cache.stop()
+    """
+
+    def __init__(self, pool: AsyncConnectionPool, ttl: float = 300.0, **config):
+        self.pool = pool
+        self.ttl = ttl
+        self._connect_kwargs = _connect_kwargs(config)
+        self._settings: Optional[MasterSettings] = None
+        self._loaded_at = 0.0
+        # Bumped by invalidate(); a reload only counts as fresh if no
+        # invalidation happened while its SELECT was in flight
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.reloads = 0
+        self.invalidations = 0
+
+    async def start(self):
+        """Load the settings and start listening for change notifications"""
+        await self.get()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def invalidate(self):
+        """Force a reload on the next get()"""
+        self._generation += 1
+        self._loaded_at = 0.0
+        self.invalidations += 1
+
+    def _fresh(self) -> bool:
+        return self._loaded_at > 0 and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get(self) -> Optional[MasterSettings]:
+        """Return the cached settings, reloading them if stale"""
+        if self._fresh():
+            self.hits += 1
+            return self._settings
+
+        async with self._lock:
+            # Another coroutine may have reloaded while we waited for the lock
+            if not self._fresh():
+                await self._reload()
+            return self._settings
+
+    async def _reload(self):
+        generation = self._generation
+        async with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            try:
+                await cursor.execute("SELECT * FROM master_settings LIMIT 1")
+                row = await cursor.fetchone()
+            finally:
+                await cursor.close()
+
+        if row is None:
+            logger.warning("Master settings not found")
+        self._settings = MasterSettings.from_row(row) if row else None
+        self.reloads += 1
+        if generation != self._generation:
+            # A NOTIFY arrived mid-SELECT: the row may predate the change,
+            # so leave the cache stale and read it again on the next get()
+            return
+        self._loaded_at = time.monotonic()
+
+    async def _listen(self):
+        """Keep a dedicated LISTEN connection open, reconnecting on failure"""
+        backoff = 1.0
+        while True:
+            try:
+                conn = await AsyncConnection.connect(autocommit=True, **self._connect_kwargs)
+                async with conn:
+                    await conn.execute(f"LISTEN {MASTER_SETTINGS_CHANNEL}")
+                    # Anything may have changed while we were not listening
+                    self.invalidate()
+                    backoff = 1.0
+                    logger.info(f"Listening on '{MASTER_SETTINGS_CHANNEL}' for settings changes")
+                    async for _ in conn.notifies():
+                        logger.info("master_settings changed, invalidating cache")
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except (psycopg.Error, OSError) as e:
+                logger.warning(f"Settings listener disconnected ({e}); retrying in {backoff:.0f}s, TTL still applies")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def stats(self) -> dict:
+        return {
+            'ttl': self.ttl,
+            'age_seconds': round(time.monotonic() - self._loaded_at, 3) if self._loaded_at else None,
+            'listening': self._listener is not None and not self._listener.done(),
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'invalidations': self.invalidations,
+        }
+
+
+def get_settings_cache(request) -> Optional[MasterSettingsCache]:
+    """Return the settings cache created in the app lifespan, if any"""
+    return getattr(request.app.state, 'settings_cache', None)
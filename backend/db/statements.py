@@ -0,0 +1,115 @@
+"""
+DOM360 Prepared Statement Registry
+Named hot-path statements, prepared per connection and timed per name
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class Statement:
+    """One registered statement and its counters"""
+    __slots__ = ('name', 'sql', 'calls', 'errors', 'total_ms', 'max_ms')
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def is_select(self) -> bool:
+        return self.sql.lstrip().upper().startswith('SELECT')
+
+    def observe(self, elapsed_ms: float, failed: bool = False):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        if failed:
+            self.errors += 1
+
+
+class StatementRegistry:
+    """
+    Central registry of the hot-path SQL statements
+
+    Modules register their statements once at import time and execute them
+    through the registry by name. With `prepare=True` each statement is
+    prepared on a connection the first time that connection runs it
+    (psycopg's protocol-level Parse, cached per connection), and later
+    calls only Bind/Execute, skipping parse and planning on the server.
+
+    `prepare=False` sends every statement as plain text: use it behind
+    transaction-pooling proxies (PgBouncer before 1.21) where consecutive
+    transactions may land on different server connections. The pool must
+    then also be opened with `prepare_threshold=None` so psycopg does not
+    auto-prepare other queries.
+
+    Per-name call counts, errors and mean/max time are kept for stats().
+    Times are measured in the worker, from execute to results, so under a
+    pipeline they include the other statements of the same round trip.
+    """
+
+    def __init__(self, prepare: bool = True):
+        self.prepare = prepare
+        self._statements: Dict[str, Statement] = {}
+
+    def register(self, name: str, sql: str) -> Statement:
+        """Register (or return the already registered) statement `name`"""
+        statement = self._statements.get(name)
+        if statement is not None:
+            if statement.sql != sql:
+                raise ValueError(f"Statement {name!r} already registered with different SQL")
+            return statement
+        statement = self._statements[name] = Statement(name, sql)
+        return statement
+
+    def get(self, name: str) -> Statement:
+        return self._statements[name]
+
+    def _resolve(self, statement) -> Statement:
+        return statement if isinstance(statement, Statement) else self._statements[statement]
+
+    async def execute(self, cursor, statement, params=None):
+        """Execute a registered statement (object or name) and record its timing"""
+        async with self.track(statement) as resolved:
+            await cursor.execute(resolved.sql, params, prepare=self.prepare)
+        return cursor
+
+    @asynccontextmanager
+    async def track(self, statement):
+        """
+        Time a block that runs a registered statement
+
+        For pipelines, where execute() returns before the results: wrap the
+        whole pipeline and execute `resolved.sql` with `prepare=self.prepare`.
+        """
+        resolved = self._resolve(statement)
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield resolved
+            failed = False
+        finally:
+            resolved.observe((time.perf_counter() - started) * 1000, failed)
+
+    def stats(self) -> dict:
+        return {
+            'prepare': self.prepare,
+            'statements': {
+                s.name: {
+                    'calls': s.calls,
+                    'errors': s.errors,
+                    'mean_ms': round(s.total_ms / s.calls, 3) if s.calls else None,
+                    'max_ms': round(s.max_ms, 3),
+                }
+                for s in self._statements.values()
+            },
+        }
+
+
+# Process-wide registry; server_rbac sets `prepare` from DB_PREPARE_STATEMENTS
+statements = StatementRegistry()
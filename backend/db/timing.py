@@ -0,0 +1,151 @@
+"""
+DOM360 Request Timing
+Per-request counters for database, pool and Agent API time
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from psycopg import AsyncCursor
+from psycopg.pq import PipelineStatus
+
+
+class RequestTimings:
+    """
+    Time spent by one request outside Python
+
+    Filled in by the hooks below while the request runs and read by
+    ServerTimingMiddleware once the response is sent. All times are in
+    milliseconds.
+    """
+    __slots__ = (
+        'started', 'db_queries', 'db_ms', 'pool_acquires', 'pool_wait_ms',
+        'agent_calls', 'agent_ms'
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.pool_acquires = 0
+        self.pool_wait_ms = 0.0
+        self.agent_calls = 0
+        self.agent_ms = 0.0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Value of the Server-Timing header (app = time not spent waiting)"""
+        total = self.elapsed_ms()
+        app = max(total - self.db_ms - self.pool_wait_ms - self.agent_ms, 0.0)
+        parts = [
+            f'db;dur={self.db_ms:.1f};desc="{self.db_queries} queries"',
+            f'pool;dur={self.pool_wait_ms:.1f}',
+        ]
+        if self.agent_calls:
+            parts.append(f'agent;dur={self.agent_ms:.1f}')
+        parts.append(f'app;dur={app:.1f}')
+        parts.append(f'total;dur={total:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self) -> dict:
+        return {
+            'total_ms': round(self.elapsed_ms(), 1),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_ms, 1),
+            'pool_acquires': self.pool_acquires,
+            'pool_wait_ms': round(self.pool_wait_ms, 1),
+            'agent_calls': self.agent_calls,
+            'agent_ms': round(self.agent_ms, 1),
+        }
+
+
+# Timings of the request running in the current task (None outside requests
+# and in background tasks started by the lifespan)
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def start_request_timings():
+    """Attach a new RequestTimings to the current context; returns (timings, token)"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop_request_timings(token):
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record_db(elapsed_ms: float, queries: int = 1):
+    timings = _current.get()
+    if timings is not None:
+        timings.db_queries += queries
+        timings.db_ms += elapsed_ms
+
+
+def record_pool_wait(elapsed_ms: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.pool_acquires += 1
+        timings.pool_wait_ms += elapsed_ms
+
+
+@contextmanager
+def timed_db(queries: int = 0):
+    """Add the block's duration to the request's DB time"""
+    if _current.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_db((time.perf_counter() - started) * 1000, queries)
+
+
+@contextmanager
+def timed_agent():
+    """Add the block's duration to the request's Agent API time"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.agent_calls += 1
+        timings.agent_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedAsyncCursor(AsyncCursor):
+    """
+    Cursor that reports its statements to the request's timings
+
+    Installed as the pool's cursor_factory, so every conn.cursor() and
+    conn.execute() is counted (admin routes, auth, query_with_rls). In
+    pipeline mode execute() returns before the server answers: the
+    statement is only counted here and the caller times the pipeline
+    with timed_db().
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        if _current.get() is None:
+            return await super().execute(query, params, **kwargs)
+        if self.connection.pgconn.pipeline_status != PipelineStatus.OFF:
+            record_db(0.0)
+            return await super().execute(query, params, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            record_db((time.perf_counter() - started) * 1000)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        with timed_db(queries=1):
+            return await super().executemany(query, params_seq, **kwargs)
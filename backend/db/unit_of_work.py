@@ -0,0 +1,69 @@
+"""
+DOM360 Unit of Work
+One transaction per request instead of a commit per statement
+"""
+import logging
+from contextlib import asynccontextmanager
+from weakref import WeakSet
+
+import psycopg
+
+from .pool import lease_connection
+
+logger = logging.getLogger(__name__)
+
+# Connections currently running a unit of work
+_active: 'WeakSet' = WeakSet()
+
+
+def in_unit_of_work(conn) -> bool:
+    """True if `conn` is inside unit_of_work(); callers must not commit it"""
+    return conn in _active
+
+
+@asynccontextmanager
+async def unit_of_work(request, read_only: bool = False):
+    """
+    Lease a connection and run the whole block as one transaction
+
+    BEGIN is sent on entry and COMMIT when the block exits normally; any
+    exception (HTTPException included) rolls everything back, so multi-step
+    writes are atomic and pay for a single WAL flush. Nested steps that may
+    fail on their own go in `async with conn.transaction():`, which becomes
+    a SAVEPOINT. Code inside the block must not call conn.commit() or
+    conn.rollback().
+
+    `read_only=True` is for GET routes: the transaction starts as
+    BEGIN READ ONLY together with the first statement (in the same
+    pipeline when query_with_rls is used), Postgres rejects writes and
+    never assigns a transaction ID.
+
+    Usage:
+        async with unit_of_work(request) as conn:
+            await conn.execute("UPDATE ...")
+            await log_audit(..., conn=conn)   # savepoint in the same transaction
+    """
+    async with lease_connection(request) as conn:
+        if read_only:
+            await conn.set_read_only(True)
+        _active.add(conn)
+        try:
+            if read_only:
+                try:
+                    yield conn
+                except BaseException:
+                    await conn.rollback()
+                    raise
+                await conn.commit()
+            else:
+                async with conn.transaction():
+                    yield conn
+        finally:
+            _active.discard(conn)
+            if read_only:
+                try:
+                    await conn.set_read_only(False)
+                except psycopg.Error as e:
+                    # Connection left mid-transaction or broken: the pool
+                    # discards it on return, so the flag cannot leak
+                    logger.warning(f"Could not reset read-only connection: {e}")
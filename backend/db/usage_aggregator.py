@@ -0,0 +1,283 @@
+"""
+DOM360 Usage Aggregator
+Write-behind buffer for consumption_inbox_daily
+"""
+import asyncio
+import logging
+import time
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+# Session setting that makes update_consumption_daily() skip its upsert
+# (database/migrations/010_consumption_write_behind.sql)
+WRITE_BEHIND_OPTIONS = "-c app.consumption_write_behind=on"
+
+# pg_try_advisory_xact_lock key so only one worker reconciles at a time
+_RECONCILE_LOCK_KEY = 0x636F6E73  # 'cons'
+
+_UPSERT_PREFIX = """
+    INSERT INTO consumption_inbox_daily AS d (
+        tenant_id, inbox_id, date, agent_type,
+        total_messages, input_tokens, output_tokens,
+        cached_tokens, session_tokens, total_tokens
+    )
+    SELECT * FROM (VALUES
+"""
+
+_UPSERT_ROW = "(%s::integer, %s::integer, %s::date, %s::agent_type_enum, %s::integer, %s::bigint, %s::bigint, %s::bigint, %s::bigint, %s::bigint)"
+
+# Days up to (now() - grace)::date - 1 belong to reconcile_consumption_daily():
+# deltas for them are skipped, as the day may already have been recomputed
+_UPSERT_SUFFIX = """
+    ) AS v (
+        tenant_id, inbox_id, date, agent_type,
+        total_messages, input_tokens, output_tokens,
+        cached_tokens, session_tokens, total_tokens
+    )
+    WHERE v.date > (now() - make_interval(secs => %s))::date - 1
+    ON CONFLICT (tenant_id, inbox_id, date, agent_type) DO UPDATE SET
+        total_messages = d.total_messages + EXCLUDED.total_messages,
+        input_tokens = d.input_tokens + EXCLUDED.input_tokens,
+        output_tokens = d.output_tokens + EXCLUDED.output_tokens,
+        cached_tokens = d.cached_tokens + EXCLUDED.cached_tokens,
+        session_tokens = d.session_tokens + EXCLUDED.session_tokens,
+        total_tokens = d.total_tokens + EXCLUDED.total_tokens,
+        updated_at = NOW()
+"""
+
+
+class _Delta:
+    """Counts accumulated for one consumption_inbox_daily row"""
+    __slots__ = ('messages', 'input_tokens', 'output_tokens', 'cached_tokens', 'session_tokens')
+
+    def __init__(self):
+        self.messages = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.session_tokens = 0
+
+    def merge(self, other: '_Delta'):
+        self.messages += other.messages
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cached_tokens += other.cached_tokens
+        self.session_tokens += other.session_tokens
+
+
+class UsageAggregator:
+    """
+    Accumulates per-message usage in memory and upserts it in batches
+
+    Keys match consumption_inbox_daily: (tenant_id, inbox_id, date,
+    agent_type). Buffered deltas are written as one multi-row upsert every
+    `flush_interval` seconds, or sooner once `max_events` messages were
+    recorded; rows are sorted so concurrent workers lock them in the same
+    order. A failed flush keeps its deltas for the next attempt and
+    stop() flushes whatever is left.
+
+    Deltas for a day that reconcile already owns (closed, see below) are
+    dropped by the upsert instead of being written: a worker retrying
+    after an outage longer than `reconcile_grace` would otherwise add them
+    on top of totals another worker recomputed from messages. Those days
+    are restored by reconcile_consumption_daily() (counted in
+    `rows_skipped`); after an outage longer than `reconcile_days`, run it
+    by hand over the missing range.
+
+    Deltas still in memory when a worker dies are not lost for good: every
+    `reconcile_interval` seconds one worker recomputes the last
+    `reconcile_days` closed days from messages. A day counts as closed once
+    `reconcile_grace` seconds have passed since midnight, long after every
+    live worker flushed it.
+
+    Only messages written through connections opened with
+    WRITE_BEHIND_OPTIONS may be recorded here; the database trigger still
+    counts everything else.
+    """
+
+    def __init__(
+        self,
+        pool,
+        flush_interval: float = 5.0,
+        max_events: int = 500,
+        reconcile_days: int = 2,
+        reconcile_interval: float = 3600.0,
+        reconcile_grace: float = 300.0
+    ):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.reconcile_days = reconcile_days
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_grace = max(reconcile_grace, 3 * flush_interval)
+        self._buffer: Dict[Tuple, _Delta] = {}
+        self._events = 0
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._next_reconcile = 0.0
+
+        # Counters reported by stats()
+        self.recorded = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_flushed = 0
+        self.last_flush_ms = 0.0
+        self.reconciled_rows = 0
+        self.rows_skipped = 0
+
+    def record(
+        self,
+        tenant_id: int,
+        inbox_id: int,
+        day: date,
+        agent_type: str,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached_tokens: int = 0,
+        session_tokens: int = 0
+    ):
+        """Count one committed message"""
+        key = (tenant_id, inbox_id, day, agent_type)
+        delta = self._buffer.get(key)
+        if delta is None:
+            delta = self._buffer[key] = _Delta()
+        delta.messages += 1
+        delta.input_tokens += input_tokens or 0
+        delta.output_tokens += output_tokens or 0
+        delta.cached_tokens += cached_tokens or 0
+        delta.session_tokens += session_tokens or 0
+
+        self.recorded += 1
+        self._events += 1
+        if self._events >= self.max_events:
+            self._wake.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush what is still buffered"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            logger.error(
+                f"Usage aggregator stopped with {len(self._buffer)} unflushed rows; "
+                f"they will be restored by reconcile_consumption_daily()"
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            await self.flush()
+            if time.monotonic() >= self._next_reconcile:
+                self._next_reconcile = time.monotonic() + self.reconcile_interval
+                await self.reconcile()
+
+    async def flush(self) -> int:
+        """Write the buffered deltas; returns the number of rows upserted"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+
+            batch, self._buffer = self._buffer, {}
+            self._events = 0
+            keys = sorted(batch)
+            params = []
+            for key in keys:
+                delta = batch[key]
+                params.extend(key)
+                params.extend((
+                    delta.messages, delta.input_tokens, delta.output_tokens,
+                    delta.cached_tokens, delta.session_tokens,
+                    delta.input_tokens + delta.output_tokens
+                ))
+            params.append(self.reconcile_grace)
+            query = _UPSERT_PREFIX + ",\n".join([_UPSERT_ROW] * len(keys)) + _UPSERT_SUFFIX
+
+            started = time.monotonic()
+            try:
+                async with self.pool.connection() as conn:
+                    cursor = await conn.execute(query, params)
+                    written = cursor.rowcount
+                    await conn.commit()
+            except (psycopg.Error, OSError) as e:
+                # Put the batch back in front of anything recorded meanwhile
+                for key, delta in batch.items():
+                    current = self._buffer.get(key)
+                    if current is None:
+                        self._buffer[key] = delta
+                    else:
+                        current.merge(delta)
+                self.flush_failures += 1
+                logger.warning(f"Usage flush of {len(keys)} rows failed, will retry: {e}")
+                return 0
+
+            self.flushes += 1
+            self.rows_flushed += written
+            self.last_flush_ms = round((time.monotonic() - started) * 1000, 3)
+            if written < len(keys):
+                self.rows_skipped += len(keys) - written
+                logger.warning(
+                    f"Usage flush skipped {len(keys) - written} rows of closed days; "
+                    f"they are restored by reconcile_consumption_daily()"
+                )
+            return written
+
+    async def reconcile(self) -> int:
+        """Recompute closed days from messages if no other worker is doing it"""
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute(
+                    """
+                    SELECT CASE WHEN pg_try_advisory_xact_lock(%s)
+                        THEN reconcile_consumption_daily(
+                            (now() - make_interval(secs => %s))::date - %s,
+                            (now() - make_interval(secs => %s))::date - 1
+                        )
+                    END
+                    """,
+                    (_RECONCILE_LOCK_KEY, self.reconcile_grace, self.reconcile_days, self.reconcile_grace)
+                )
+                written = (await cursor.fetchone())[0]
+                await conn.commit()
+        except (psycopg.Error, OSError) as e:
+            logger.warning(f"Usage reconcile failed: {e}")
+            return 0
+
+        if written:
+            self.reconciled_rows += written
+            logger.info(f"Usage reconcile corrected {written} consumption_inbox_daily rows")
+        return written or 0
+
+    def stats(self) -> dict:
+        return {
+            'buffered_rows': len(self._buffer),
+            'recorded': self.recorded,
+            'flushes': self.flushes,
+            'flush_failures': self.flush_failures,
+            'rows_flushed': self.rows_flushed,
+            'last_flush_ms': self.last_flush_ms,
+            'reconciled_rows': self.reconciled_rows,
+            'rows_skipped': self.rows_skipped,
+        }
+
+
+def get_usage_aggregator(request) -> Optional[UsageAggregator]:
+    """Return the usage aggregator created in the app lifespan, if enabled"""
+    return getattr(request.app.state, 'usage_aggregator', None)
@@ -6,24 +6,48 @@ Integra PostgreSQL com Agent API (SDR/COPILOT) + Master/Tenant RBAC
 import os
 import json
 import logging
-from datetime import datetime
-from typing import Optional, List, Dict, Any
-from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any, Union
+from contextlib import asynccontextmanager, nullcontext
 import re
 import sys
+import time
+import uuid
 
 import httpx
-import psycopg2
-from psycopg2.pool import SimpleConnectionPool
-from psycopg2.extras import RealDictCursor
+import psycopg
+from psycopg.rows import dict_row
 from fastapi import FastAPI, HTTPException, Header, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 # Add parent directory to path to import config
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from config import (
     DATABASE_CONFIG,
+    DATABASE_POOL_CONFIG,
+    DB_PREPARE_STATEMENTS,
+    AGENT_HTTP_CONFIG,
+    AGENT_HISTORY_CONFIG,
+    MASTER_SETTINGS_CACHE_TTL,
+    HISTORY_CACHE_MAX_BYTES,
+    DASHBOARD_CACHE_TTL,
+    DASHBOARD_CACHE_MAX_ENTRIES,
+    USAGE_AGGREGATOR_ENABLED,
+    USAGE_AGGREGATOR_CONFIG,
+    AUDIT_WRITER_ENABLED,
+    AUDIT_WRITER_CONFIG,
+    PARTITION_MANAGER_ENABLED,
+    PARTITION_MANAGER_CONFIG,
+    API_LOG_ENABLED,
+    API_LOG_WRITER_CONFIG,
+    API_LOG_MIDDLEWARE_CONFIG,
+    REQUEST_TIMING_ENABLED,
+    SERVER_TIMING_CONFIG,
+    METRICS_ENABLED,
+    METRICS_SAMPLE_INTERVAL,
+    METRICS_SNAPSHOT_CONFIG,
     BACKEND_BIND_HOST,
     BACKEND_BIND_PORT,
     CORS_ORIGINS,
@@ -38,10 +62,51 @@ try:
         UserRole,
         get_current_user,
         get_optional_user,
+        password_hasher,
         require_tenant_access,
-        set_rls_context
+        set_audit_writer,
+        bind_rls,
+        unbind_rls
     )
-    from .api import auth_router, admin_router
+    from .api import (
+        auth_router,
+        admin_router,
+        ApiLogMiddleware,
+        ServerTimingMiddleware,
+        MetricsSampler,
+        PrometheusMiddleware,
+        metrics_router,
+        observe_agent_call,
+        record_agent_tokens,
+        NEXT_CURSOR_HEADER,
+        encode_cursor,
+        decode_cursor
+    )
+    from .db import (
+        ApiLogWriter,
+        AsyncConnectionPool,
+        AuditWriter,
+        ConversationHistoryCache,
+        DashboardCache,
+        MasterSettingsCache,
+        MetricsSnapshotRefresher,
+        PartitionManager,
+        PoolTimeout,
+        UsageAggregator,
+        WRITE_BEHIND_OPTIONS,
+        get_dashboard_cache,
+        get_history_cache,
+        get_usage_aggregator,
+        Statement,
+        TimedAsyncCursor,
+        in_unit_of_work,
+        lease_connection,
+        statements,
+        timed_agent,
+        timed_db,
+        unit_of_work
+    )
+    from .agent import AgentHTTPClient, ContextWindow
 except ImportError:
     # Fall back to absolute imports (when run directly as python server_rbac.py)
     sys.path.insert(0, os.path.dirname(__file__))
@@ -50,10 +115,51 @@ except ImportError:
         UserRole,
         get_current_user,
         get_optional_user,
+        password_hasher,
         require_tenant_access,
-        set_rls_context
+        set_audit_writer,
+        bind_rls,
+        unbind_rls
+    )
+    from api import (
+        auth_router,
+        admin_router,
+        ApiLogMiddleware,
+        ServerTimingMiddleware,
+        MetricsSampler,
+        PrometheusMiddleware,
+        metrics_router,
+        observe_agent_call,
+        record_agent_tokens,
+        NEXT_CURSOR_HEADER,
+        encode_cursor,
+        decode_cursor
     )
-    from api import auth_router, admin_router
+    from db import (
+        ApiLogWriter,
+        AsyncConnectionPool,
+        AuditWriter,
+        ConversationHistoryCache,
+        DashboardCache,
+        MasterSettingsCache,
+        MetricsSnapshotRefresher,
+        PartitionManager,
+        PoolTimeout,
+        UsageAggregator,
+        WRITE_BEHIND_OPTIONS,
+        get_dashboard_cache,
+        get_history_cache,
+        get_usage_aggregator,
+        Statement,
+        TimedAsyncCursor,
+        in_unit_of_work,
+        lease_connection,
+        statements,
+        timed_agent,
+        timed_db,
+        unit_of_work
+    )
+    from agent import AgentHTTPClient, ContextWindow
 
 # Configuração de logging
 logging.basicConfig(
@@ -66,7 +172,13 @@ logger = logging.getLogger(__name__)
 PORT = BACKEND_BIND_PORT
 
 # Pool de conexões global
-db_pool: Optional[SimpleConnectionPool] = None
+db_pool: Optional[AsyncConnectionPool] = None
+
+# Cache de master_settings (invalidado via LISTEN/NOTIFY)
+settings_cache: Optional[MasterSettingsCache] = None
+
+# Cliente HTTP compartilhado para o Agent API
+agent_client: Optional[AgentHTTPClient] = None
 
 
 # ============================================================================
@@ -76,17 +188,92 @@ db_pool: Optional[SimpleConnectionPool] = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
-    global db_pool
+    global db_pool, settings_cache, agent_client
     
     # Startup
     logger.info("🚀 Iniciando DOM360 Backend API com RBAC...")
     try:
-        db_pool = SimpleConnectionPool(
-            minconn=2,
-            maxconn=10,
+        pool_connect_config = dict(DATABASE_CONFIG)
+        if USAGE_AGGREGATOR_ENABLED:
+            # update_consumption_daily() deixa o consumo para o UsageAggregator
+            pool_connect_config['options'] = WRITE_BEHIND_OPTIONS
+        statements.prepare = DB_PREPARE_STATEMENTS
+        if not DB_PREPARE_STATEMENTS:
+            # Modo compatível com pooling por transação: nenhum statement
+            # preparado, nem os automáticos do psycopg (prepare_threshold)
+            pool_connect_config['prepare_threshold'] = None
+        if REQUEST_TIMING_ENABLED:
+            # Conta e cronometra as queries de cada requisição (Server-Timing)
+            pool_connect_config['cursor_factory'] = TimedAsyncCursor
+        db_pool = AsyncConnectionPool(
+            **DATABASE_POOL_CONFIG,
+            **pool_connect_config
+        )
+        await db_pool.open()
+        app.state.db_pool = db_pool
+        logger.info(
+            f"✓ Pool de conexões PostgreSQL criado "
+            f"(min={db_pool.minconn}, max={db_pool.maxconn})"
+        )
+        settings_cache = MasterSettingsCache(
+            db_pool,
+            ttl=MASTER_SETTINGS_CACHE_TTL,
             **DATABASE_CONFIG
         )
-        logger.info("✓ Pool de conexões PostgreSQL criado")
+        await settings_cache.start()
+        app.state.settings_cache = settings_cache
+        logger.info(f"✓ Cache de master_settings carregado (ttl={MASTER_SETTINGS_CACHE_TTL:.0f}s)")
+
+        if HISTORY_CACHE_MAX_BYTES > 0:
+            app.state.history_cache = ConversationHistoryCache(max_bytes=HISTORY_CACHE_MAX_BYTES)
+            logger.info(f"✓ Cache de histórico ativado ({HISTORY_CACHE_MAX_BYTES // 1024} KiB)")
+
+        if DASHBOARD_CACHE_TTL > 0:
+            app.state.dashboard_cache = DashboardCache(
+                ttl=DASHBOARD_CACHE_TTL,
+                max_entries=DASHBOARD_CACHE_MAX_ENTRIES
+            )
+            logger.info(f"✓ Cache do dashboard ativado (ttl={DASHBOARD_CACHE_TTL:.0f}s)")
+
+        if USAGE_AGGREGATOR_ENABLED:
+            usage_aggregator = UsageAggregator(db_pool, **USAGE_AGGREGATOR_CONFIG)
+            await usage_aggregator.start()
+            app.state.usage_aggregator = usage_aggregator
+            logger.info(f"✓ Agregador de consumo ativado (flush a cada {usage_aggregator.flush_interval:.0f}s)")
+
+        if AUDIT_WRITER_ENABLED:
+            audit_writer = AuditWriter(db_pool, **AUDIT_WRITER_CONFIG)
+            await audit_writer.start()
+            app.state.audit_writer = audit_writer
+            set_audit_writer(audit_writer)
+            logger.info(f"✓ Auditoria assíncrona ativada (fila de {AUDIT_WRITER_CONFIG['max_queue']} eventos)")
+
+        if PARTITION_MANAGER_ENABLED:
+            partition_manager = PartitionManager(db_pool, **PARTITION_MANAGER_CONFIG)
+            await partition_manager.start()
+            app.state.partition_manager = partition_manager
+            logger.info(f"✓ Manutenção de partições ativada ({partition_manager.premake_months} meses à frente)")
+
+        if API_LOG_ENABLED:
+            api_log_writer = ApiLogWriter(db_pool, **API_LOG_WRITER_CONFIG)
+            await api_log_writer.start()
+            app.state.api_log_writer = api_log_writer
+            logger.info(f"✓ Log de requisições ativado (amostragem {API_LOG_MIDDLEWARE_CONFIG['sample_rate']:.0%})")
+
+        metrics_snapshot_refresher = MetricsSnapshotRefresher(db_pool, **METRICS_SNAPSHOT_CONFIG)
+        await metrics_snapshot_refresher.start()
+        app.state.metrics_snapshot_refresher = metrics_snapshot_refresher
+        logger.info(f"✓ Snapshot de métricas atualizado em background (a cada {metrics_snapshot_refresher.max_age:.0f}s)")
+
+        if METRICS_ENABLED:
+            metrics_sampler = MetricsSampler(db_pool, interval=METRICS_SAMPLE_INTERVAL)
+            await metrics_sampler.start()
+            app.state.metrics_sampler = metrics_sampler
+            logger.info(f"✓ Métricas Prometheus ativadas (amostragem a cada {METRICS_SAMPLE_INTERVAL:.1f}s)")
+
+        agent_client = AgentHTTPClient(**AGENT_HTTP_CONFIG)
+        app.state.agent_client = agent_client
+        logger.info(f"✓ Cliente HTTP do Agent API criado (http2={agent_client.http2})")
         logger.info("✓ RBAC Master/Tenant ativado")
     except Exception as e:
         logger.error(f"✗ Erro ao conectar PostgreSQL: {e}")
@@ -96,8 +283,35 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Encerrando DOM360 Backend API...")
+    if agent_client:
+        await agent_client.aclose()
+        logger.info("✓ Cliente HTTP do Agent API fechado")
+    metrics_sampler = getattr(app.state, 'metrics_sampler', None)
+    if metrics_sampler:
+        await metrics_sampler.stop()
+    metrics_snapshot_refresher = getattr(app.state, 'metrics_snapshot_refresher', None)
+    if metrics_snapshot_refresher:
+        await metrics_snapshot_refresher.stop()
+    api_log_writer = getattr(app.state, 'api_log_writer', None)
+    if api_log_writer:
+        await api_log_writer.stop()
+    partition_manager = getattr(app.state, 'partition_manager', None)
+    if partition_manager:
+        await partition_manager.stop()
+    audit_writer = getattr(app.state, 'audit_writer', None)
+    if audit_writer:
+        set_audit_writer(None)
+        await audit_writer.stop()
+        logger.info("✓ Eventos de auditoria pendentes gravados")
+    usage_aggregator = getattr(app.state, 'usage_aggregator', None)
+    if usage_aggregator:
+        await usage_aggregator.stop()
+        logger.info("✓ Consumo pendente gravado")
+    if settings_cache:
+        await settings_cache.stop()
+    password_hasher.shutdown()
     if db_pool:
-        db_pool.closeall()
+        await db_pool.close()
         logger.info("✓ Pool de conexões fechado")
 
 
@@ -119,30 +333,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Server-Timing"],
 )
 
+# Log de requisições em api_logs (inativo se app.state.api_log_writer não existir)
+app.add_middleware(ApiLogMiddleware, **API_LOG_MIDDLEWARE_CONFIG)
 
-# ============================================================================
-# Middleware: Database Connection
-# ============================================================================
+# Tempo de banco, pool e Agent API por requisição (header Server-Timing)
+if REQUEST_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware, **SERVER_TIMING_CONFIG)
+
+# Histogramas de latência por rota para o Prometheus (GET /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    """
-    Injects database connection into request.state
-    """
-    conn = None
-    try:
-        if db_pool:
-            conn = db_pool.getconn()
-            request.state.db = conn
-        
-        response = await call_next(request)
-        return response
-        
-    finally:
-        if conn and db_pool:
-            db_pool.putconn(conn)
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Pool esgotado: pedir ao cliente que tente novamente"""
+    logger.warning(f"Pool de conexões esgotado em {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
 
 
 # ============================================================================
@@ -155,6 +369,10 @@ app.include_router(auth_router)
 # Admin (Master Only)
 app.include_router(admin_router)
 
+# Prometheus
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
+
 
 # ============================================================================
 # Models (Chat-specific)
@@ -213,67 +431,86 @@ class DashboardData(BaseModel):
 # Helper Functions
 # ============================================================================
 
-def get_sdr_agent_endpoint(conn) -> str:
-    """Get SDR agent endpoint from master_settings"""
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cursor.execute("SELECT sdr_agent_endpoint, sdr_agent_timeout_ms FROM master_settings LIMIT 1")
-        settings = cursor.fetchone()
-        
-        if settings:
-            return settings['sdr_agent_endpoint'], settings['sdr_agent_timeout_ms']
-        
-        logger.warning("Master settings not found, using fallback endpoint")
-        pass
-        
-    finally:
-        cursor.close()
+async def get_sdr_agent_endpoint():
+    """Get SDR agent endpoint and timeout from the cached master_settings"""
+    settings = await settings_cache.get()
+
+    if not settings:
+        logger.warning("Master settings not found")
+        raise HTTPException(status_code=500, detail="Master settings not initialized")
 
+    return settings.sdr_agent_endpoint, settings.sdr_agent_timeout_ms
 
-def query_with_rls(conn, query: str, params: tuple, user: AuthContext):
-    """Executa query com contexto RLS do usuário"""
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+async def query_with_rls(conn, query: Union[str, Statement], params: tuple, user: AuthContext, commit: Optional[bool] = None):
+    """
+    Executa query com contexto RLS do usuário
+
+    O contexto RLS, a query e o COMMIT são enviados em pipeline, numa única
+    ida e volta ao banco. Por padrão faz commit de tudo que não é SELECT;
+    use `commit=True` para SELECTs que chamam funções que escrevem.
+
+    O contexto é vinculado uma vez por transação: consultas seguidas sem
+    commit na mesma conexão reaproveitam o set_config já enviado. Dentro
+    de unit_of_work() não há commit nem rollback aqui: a transação é da
+    requisição.
+
+    `query` pode ser um Statement do registro (db.statements): ele é
+    preparado na conexão na primeira execução e cronometrado pelo nome.
+    """
+    statement = query if isinstance(query, Statement) else None
+    sql = statement.sql if statement else query
+    if commit is None:
+        commit = not (statement.is_select if statement else sql.strip().upper().startswith('SELECT'))
+    owns_transaction = not in_unit_of_work(conn)
+
+    cursor = conn.cursor(row_factory=dict_row)
     try:
-        # Set RLS context
-        set_rls_context(cursor, user)
-        
-        # Execute query
-        cursor.execute(query, params)
-        
-        if query.strip().upper().startswith('SELECT'):
-            result = cursor.fetchall()
-            return result
-        else:
-            conn.commit()
-            if cursor.description:
-                return cursor.fetchall()
-            return None
+        async with statements.track(statement) if statement else nullcontext():
+            with timed_db():
+                async with conn.pipeline():
+                    # Set RLS context (no-op if this transaction is already bound)
+                    await bind_rls(cursor, user)
+
+                    # Execute query
+                    if statement:
+                        await cursor.execute(sql, params, prepare=statements.prepare)
+                    else:
+                        await cursor.execute(sql, params)
+
+                    if commit and owns_transaction:
+                        await conn.commit()
+                        unbind_rls(conn)
+
+                return await cursor.fetchall() if cursor.description else None
     except Exception as e:
-        conn.rollback()
+        if owns_transaction:
+            await conn.rollback()
+            unbind_rls(conn)
         logger.error(f"Erro na query: {e}")
         raise
     finally:
-        cursor.close()
+        await cursor.close()
 
 
 # ============================================================================
 # Agent API Integration
 # ============================================================================
 
-async def call_agent_api(
-    conn,
+async def build_agent_request(
     agent_type: str,
     message: str,
     conversation_history: List[Dict] = None,
     tenant_id: int = 1,
     inbox_id: int = 27,
     user_phone: str = "+5511999999999",
-    conversation_id: str = None
-) -> Dict:
-    """Chama API do Agente (SDR ou COPILOT) usando endpoint configurado"""
+    conversation_id: str = None,
+    stream: bool = False
+):
+    """Monta endpoint, timeout e payload para o Agent API"""
     
-    # Get endpoint from master_settings
-    agent_endpoint, timeout_ms = get_sdr_agent_endpoint(conn)
+    # Get endpoint from master_settings (served from the in-memory cache)
+    agent_endpoint, timeout_ms = await get_sdr_agent_endpoint()
     
     # Determine the correct endpoint based on agent type
     # Map database enum values to API endpoints
@@ -321,7 +558,8 @@ async def call_agent_api(
             "phone_e164": user_phone
         },
         "conversation": {
-            "id": conversation_id or "new"
+            "id": conversation_id or "new",
+            "history": conversation_history or []
         },
         "rag_options": {
             "enabled": True,
@@ -330,6 +568,9 @@ async def call_agent_api(
             "match_threshold": 0.7
         }
     }
+    if stream:
+        # Agents that cannot stream ignore this and answer with plain JSON
+        payload["stream"] = True
     
     # Defensive validations before sending to Agent API
     # Ensure routing.agent_type matches endpoint expectations
@@ -347,52 +588,87 @@ async def call_agent_api(
             logger.error(f"Invalid phone format for Agent API call: {phone}")
             raise HTTPException(status_code=400, detail=f"INVALID_PHONE_FORMAT: expected E.164, got: {phone}")
 
-    logger.info(f"Chamando Agent API: {endpoint} (timeout: {timeout_ms}ms)")
+    headers = {
+        "Content-Type": "application/json",
+        "X-Request-ID": payload.get('request_id', '')
+    }
+    if stream:
+        headers["Accept"] = "text/event-stream, application/x-ndjson, application/json"
+
+    logger.info(f"Chamando Agent API: {endpoint} (timeout: {timeout_ms}ms, stream={stream})")
     logger.debug(f"Payload: {payload}")
+
+    return endpoint, timeout_ms, payload, headers
+
+
+def transform_agent_response(data: Dict) -> Dict:
+    """Converte a resposta do SDR para o formato usado pelo backend"""
+    agent_output = data.get('agent_output', {})
+    usage = data.get('usage', {})
+    
+    return {
+        'response': agent_output.get('text', ''),
+        'tokens': {
+            'input': usage.get('input_tokens', 0),
+            'output': usage.get('output_tokens', 0),
+            'total': usage.get('total_tokens', 0)
+        },
+        'latency_ms': data.get('latency_ms', 0),
+        'model': usage.get('model', 'unknown'),
+        'tool_calls': agent_output.get('tool_calls', []),
+        'rag_context': agent_output.get('rag_context', [])
+    }
+
+
+async def _raise_for_agent_status(response: httpx.Response):
+    """If the agent returned 4xx/5xx, capture the body for easier debugging"""
+    if response.status_code >= 400:
+        body = None
+        try:
+            body = (await response.aread()).decode(errors='replace')
+        except Exception:
+            body = '<unreadable body>'
+        logger.error(f"Agent API returned status={response.status_code}, body={body}")
+        # Raise HTTPException with safe detail (avoid leaking sensitive internals)
+        raise HTTPException(status_code=502, detail=f"Agent API error: {response.status_code}")
+
+
+async def call_agent_api(
+    agent_type: str,
+    message: str,
+    conversation_history: List[Dict] = None,
+    tenant_id: int = 1,
+    inbox_id: int = 27,
+    user_phone: str = "+5511999999999",
+    conversation_id: str = None
+) -> Dict:
+    """Chama API do Agente (SDR ou COPILOT) usando endpoint configurado"""
+    endpoint, timeout_ms, payload, headers = await build_agent_request(
+        agent_type, message, conversation_history,
+        tenant_id=tenant_id,
+        inbox_id=inbox_id,
+        user_phone=user_phone,
+        conversation_id=conversation_id
+    )
     
+    started = time.perf_counter()
+    outcome = 'error'
     try:
-        async with httpx.AsyncClient(timeout=timeout_ms / 1000.0) as client:
-            headers = {
-                "Content-Type": "application/json",
-                "X-Request-ID": payload.get('request_id', '')
-            }
-
-            response = await client.post(endpoint, json=payload, headers=headers)
-
-            # If the agent returned 4xx/5xx, capture the body for easier debugging
-            if response.status_code >= 400:
-                body = None
-                try:
-                    body = response.text
-                except Exception:
-                    body = '<unreadable body>'
-                logger.error(f"Agent API returned status={response.status_code}, body={body}")
-                # Raise HTTPException with safe detail (avoid leaking sensitive internals)
-                raise HTTPException(status_code=502, detail=f"Agent API error: {response.status_code}")
-
-            data = response.json()
-            
-            # Transform SDR response to our expected format
-            agent_output = data.get('agent_output', {})
-            usage = data.get('usage', {})
-            
-            transformed_response = {
-                'response': agent_output.get('text', ''),
-                'tokens': {
-                    'input': usage.get('input_tokens', 0),
-                    'output': usage.get('output_tokens', 0),
-                    'total': usage.get('total_tokens', 0)
-                },
-                'latency_ms': data.get('latency_ms', 0),
-                'model': usage.get('model', 'unknown'),
-                'tool_calls': agent_output.get('tool_calls', []),
-                'rag_context': agent_output.get('rag_context', [])
-            }
-            
-            logger.info(f"✓ Agent API respondeu: {len(transformed_response['response'])} chars")
-            return transformed_response
-            
+        with timed_agent():
+            response = await agent_client.post(endpoint, timeout_ms, json=payload, headers=headers)
+        await _raise_for_agent_status(response)
+
+        transformed_response = transform_agent_response(response.json())
+        outcome = 'ok'
+        record_agent_tokens(tenant_id, agent_type, transformed_response['tokens'])
+        
+        logger.info(f"✓ Agent API respondeu: {len(transformed_response['response'])} chars")
+        return transformed_response
+        
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
+        outcome = 'timeout'
         logger.error("Timeout ao chamar Agent API")
         raise HTTPException(status_code=504, detail="Agent API timeout")
     except httpx.HTTPError as e:
@@ -401,6 +677,97 @@ async def call_agent_api(
     except Exception as e:
         logger.error(f"Erro ao chamar Agent API: {e}")
         raise HTTPException(status_code=500, detail=f"Agent API call failed: {str(e)}")
+    finally:
+        observe_agent_call(agent_type, time.perf_counter() - started, outcome)
+
+
+async def stream_agent_api(
+    agent_type: str,
+    message: str,
+    conversation_history: List[Dict] = None,
+    tenant_id: int = 1,
+    inbox_id: int = 27,
+    user_phone: str = "+5511999999999",
+    conversation_id: str = None
+):
+    """
+    Chama o Agent API em modo streaming
+
+    Yields ('delta', text) for each chunk of agent output and finally
+    ('final', transformed_response). Agents may answer with SSE
+    (`data: {...}` lines) or NDJSON, where chunks carry `{"delta": "..."}`
+    and the last object has the regular `agent_output`/`usage` shape. A
+    plain JSON answer is treated as a single final chunk.
+    """
+    endpoint, timeout_ms, payload, headers = await build_agent_request(
+        agent_type, message, conversation_history,
+        tenant_id=tenant_id,
+        inbox_id=inbox_id,
+        user_phone=user_phone,
+        conversation_id=conversation_id,
+        stream=True
+    )
+
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        # Inclui o tempo até o último chunk do agente
+        with timed_agent():
+            async with agent_client.stream("POST", endpoint, timeout_ms, json=payload, headers=headers) as response:
+                await _raise_for_agent_status(response)
+                content_type = response.headers.get('content-type', '')
+
+                if 'text/event-stream' not in content_type and 'ndjson' not in content_type:
+                    # Non-streaming agent: the whole body is the final answer
+                    transformed_response = transform_agent_response(json.loads(await response.aread()))
+                    outcome = 'ok'
+                    record_agent_tokens(tenant_id, agent_type, transformed_response['tokens'])
+                    if transformed_response['response']:
+                        yield 'delta', transformed_response['response']
+                    yield 'final', transformed_response
+                    return
+
+                text_parts = []
+                final = None
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if 'text/event-stream' in content_type:
+                        if not line.startswith('data:'):
+                            continue
+                        line = line[len('data:'):].strip()
+                    if not line or line == '[DONE]':
+                        continue
+
+                    chunk = json.loads(line)
+                    if chunk.get('delta'):
+                        text_parts.append(chunk['delta'])
+                        yield 'delta', chunk['delta']
+                    if 'agent_output' in chunk or 'usage' in chunk:
+                        final = chunk
+
+                transformed_response = transform_agent_response(final or {})
+                if not transformed_response['response']:
+                    transformed_response['response'] = ''.join(text_parts)
+                outcome = 'ok'
+                record_agent_tokens(tenant_id, agent_type, transformed_response['tokens'])
+
+        logger.info(f"✓ Agent API (stream) respondeu: {len(transformed_response['response'])} chars")
+        yield 'final', transformed_response
+
+    except HTTPException:
+        raise
+    except httpx.TimeoutException:
+        outcome = 'timeout'
+        logger.error("Timeout ao chamar Agent API")
+        raise HTTPException(status_code=504, detail="Agent API timeout")
+    except httpx.HTTPError as e:
+        logger.error(f"Erro HTTP na Agent API: {e}")
+        raise HTTPException(status_code=502, detail=f"Agent API error: {str(e)}")
+    except Exception as e:
+        logger.error(f"Erro ao chamar Agent API: {e}")
+        raise HTTPException(status_code=500, detail=f"Agent API call failed: {str(e)}")
+    finally:
+        observe_agent_call(agent_type, time.perf_counter() - started, outcome)
 
 
 # ============================================================================
@@ -410,13 +777,12 @@ async def call_agent_api(
 @app.get("/api/health")
 async def health_check(request: Request):
     """Health check endpoint"""
-    conn = request.state.db
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        
+        async with lease_connection(request) as conn:
+            cursor = conn.cursor()
+            await cursor.execute("SELECT 1")
+            await cursor.close()
+
         return {
             "status": "healthy",
             "database": "connected",
@@ -436,30 +802,11 @@ async def health_check(request: Request):
 # Chat Endpoints (RBAC Protected)
 # ============================================================================
 
-@app.post("/api/chat")
-async def send_chat_message(
-    data: ChatMessage,
-    request: Request,
-    user: AuthContext = Depends(get_current_user),
-    x_inbox_id: str = Header(..., alias="X-Inbox-ID")
-):
-    """
-    Envia mensagem para o agente e salva no banco
-    
-    **Requires authentication** (JWT token)
-    
-    Fluxo:
-    1. Buscar/criar conversa (com RLS tenant_id)
-    2. Salvar mensagem do usuário
-    3. Chamar Agent API (endpoint configurado em master_settings)
-    4. Salvar resposta do agente
-    5. Retornar resposta
-    """
-    conn = request.state.db
-
+def parse_chat_request(data: ChatMessage, request: Request, x_inbox_id: str) -> int:
+    """Valida o X-Inbox-ID e registra a requisição de chat"""
     # Log incoming headers for debugging auth/tenant issues
     try:
-        logger.info(f"Incoming /api/chat request headers: {dict(request.headers)}")
+        logger.info(f"Incoming {request.url.path} request headers: {dict(request.headers)}")
     except Exception:
         # Non-fatal, continue
         logger.debug("Could not stringify request headers")
@@ -476,131 +823,180 @@ async def send_chat_message(
     # Log do payload recebido para debug
     logger.info(f"📨 Chat payload - message='{data.message}', conversation_id='{data.conversation_id}', agent_type='{data.agent_type}', user_phone='{data.user_phone}', user_name='{data.user_name}'")
 
-    try:
-        # 1. Buscar ou criar conversa
-        conversation_id = None
-        
-        # Validar se conversation_id é um UUID válido
-        if data.conversation_id:
-            try:
-                import uuid
-                uuid.UUID(data.conversation_id)
-                conversation_id = data.conversation_id
-            except (ValueError, AttributeError):
-                # Não é um UUID válido, será criada uma nova conversa
-                logger.warning(f"conversation_id inválido recebido: {data.conversation_id}, criando nova conversa")
-                conversation_id = None
-        
-        if not conversation_id:
-            # Criar nova conversa (RLS aplicado)
-            db_agent_type = data.get_db_agent_type()
-            logger.info(f"Creating conversation with: tenant_id={user.tenant_id}, inbox_id={inbox_id_int}, agent_type={db_agent_type}, user_phone={data.user_phone}, user_name={data.user_name}")
-            
-            query = """
-                INSERT INTO conversations (tenant_id, inbox_id, agent_type, contact_phone_e164, contact_name, status)
-                VALUES (%s, %s, %s, %s, %s, 'open')
-                RETURNING id
-            """
-            result = query_with_rls(
-                conn, query,
-                (user.tenant_id, inbox_id_int, db_agent_type, data.user_phone, data.user_name or 'Usuário'),
-                user
-            )
-            conversation_id = str(result[0]['id'])
-            logger.info(f"✓ Nova conversa criada: {conversation_id} (tenant: {user.tenant_id}, inbox: {inbox_id_int})")
-        
-        # 2. Obter próximo message_index
-        query = """
-            SELECT COALESCE(MAX(message_index), 0) + 1 as next_index
-            FROM messages
-            WHERE conversation_id = %s
-        """
-        result = query_with_rls(conn, query, (conversation_id,), user)
-        message_index = result[0]['next_index']
-        
-        # 3. Salvar mensagem do usuário
-        db_agent_type = data.get_db_agent_type()
-        query = """
-            INSERT INTO messages (
-                tenant_id, conversation_id, inbox_id, message_index, role, user_message,
-                agent_type, created_at
-            )
-            VALUES (%s, %s, %s, %s, 'user', %s, %s, NOW())
-            RETURNING id, created_at
-        """
-        result = query_with_rls(
-            conn, query,
-            (user.tenant_id, conversation_id, inbox_id_int, message_index, data.message, db_agent_type),
-            user
-        )
-        user_message_id = str(result[0]['id'])
-        # capture created_at returned by the INSERT
+    return inbox_id_int
+
+
+CONVERSATION_HISTORY = statements.register('conversation_history', """
+        SELECT
+            COALESCE(
+                jsonb_agg(
+                    jsonb_build_object(
+                        'role', m.role,
+                        'content', CASE WHEN m.role = 'user' THEN m.user_message ELSE m.assistant_message END
+                    )
+                    ORDER BY m.message_index
+                ),
+                '[]'::jsonb
+            ) AS history
+        FROM messages m
+        WHERE m.conversation_id = %s
+          AND m.message_index <= %s
+          AND (
+              (m.role = 'user' AND COALESCE(m.user_message, '') <> '')
+              OR (m.role = 'assistant' AND COALESCE(m.assistant_message, '') <> '')
+          )
+""")
+
+
+async def load_conversation_history(request: Request, user: AuthContext, conversation_id: str, up_to_index: int):
+    """
+    Lê o histórico até message_index = `up_to_index` (inclusive)
+
+    Mensagens de turnos concorrentes gravadas depois ficam de fora, então
+    o último elemento é a mensagem de índice `up_to_index`.
+    """
+    async with unit_of_work(request, read_only=True) as conn:
+        result = await query_with_rls(conn, CONVERSATION_HISTORY, (conversation_id, up_to_index), user)
+    return result[0]['history']
+
+
+CHAT_BEGIN_TURN = statements.register(
+    'chat_begin_turn',
+    "SELECT * FROM chat_begin_turn(%s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+async def start_chat_turn(
+    request: Request,
+    data: ChatMessage,
+    user: AuthContext,
+    inbox_id_int: int
+) -> Dict[str, Any]:
+    """
+    Passos anteriores ao agente: conversa, mensagem do usuário e histórico
+
+    Uma única chamada a chat_begin_turn, com a lease devolvida antes da
+    chamada ao Agent API. Se o histórico estiver no cache do worker, ele
+    não é relido do banco. O id da mensagem do assistente é reservado aqui
+    para poder ser enviado ao cliente antes da resposta do agente.
+    """
+    db_agent_type = data.get_db_agent_type()
+
+    # Validar se conversation_id é um UUID válido
+    conversation_id = None
+    if data.conversation_id:
         try:
-            user_message_created_at = result[0]['created_at'].isoformat()
-        except Exception:
-            user_message_created_at = datetime.utcnow().isoformat()
-        
-        # 3. Buscar histórico da conversa
-        query = """
-            SELECT role, user_message, assistant_message
-            FROM messages
-            WHERE conversation_id = %s
-            ORDER BY message_index ASC
-        """
-        history_result = query_with_rls(conn, query, (conversation_id,), user)
-        
-        conversation_history = []
-        for msg in history_result:
-            if msg['role'] == 'user' and msg['user_message']:
-                conversation_history.append({
-                    "role": "user",
-                    "content": msg['user_message']
-                })
-            elif msg['role'] == 'assistant' and msg['assistant_message']:
-                conversation_history.append({
-                    "role": "assistant",
-                    "content": msg['assistant_message']
-                })
-        
-        # 4. Chamar Agent API (usando endpoint configurado)
-        agent_response = await call_agent_api(
-            conn,
-            db_agent_type,  # Use converted value
-            data.message,
-            conversation_history,
-            tenant_id=int(user.tenant_id) if user.tenant_id else 1,
-            inbox_id=inbox_id_int,
-            user_phone=data.user_phone,
-            conversation_id=conversation_id
-        )
-        
-        # 5. Obter próximo message_index para resposta
-        query = """
-            SELECT COALESCE(MAX(message_index), 0) + 1 as next_index
-            FROM messages
-            WHERE conversation_id = %s
-        """
-        result = query_with_rls(conn, query, (conversation_id,), user)
-        assistant_message_index = result[0]['next_index']
-        
-        # 6. Salvar resposta do agente
-        query = """
-            INSERT INTO messages (
-                tenant_id, conversation_id, inbox_id, message_index, role, assistant_message,
-                agent_type, input_tokens, output_tokens, latency_ms, model_used, created_at
+            uuid.UUID(data.conversation_id)
+            conversation_id = data.conversation_id
+        except (ValueError, AttributeError):
+            # Não é um UUID válido, será criada uma nova conversa
+            logger.warning(f"conversation_id inválido recebido: {data.conversation_id}, criando nova conversa")
+
+    history_cache = get_history_cache(request)
+    cached = None
+    if conversation_id and history_cache:
+        cached = history_cache.get((user.tenant_id, conversation_id))
+
+    # Buscar/criar conversa, salvar mensagem do usuário e buscar histórico
+    # numa única chamada (ver database/migrations/006_chat_begin_turn_agent_config.sql)
+    try:
+        async with lease_connection(request) as conn:
+            result = await query_with_rls(
+                conn,
+                CHAT_BEGIN_TURN,
+                (
+                    user.tenant_id,
+                    inbox_id_int,
+                    conversation_id,
+                    db_agent_type,
+                    data.user_phone,
+                    data.user_name or 'Usuário',
+                    data.message,
+                    cached is None
+                ),
+                user,
+                commit=True
             )
-            VALUES (%s, %s, %s, %s, 'assistant', %s, %s, %s, %s, %s, %s, NOW())
-            RETURNING id, created_at
-        """
-        result = query_with_rls(
-            conn, query,
+    except psycopg.errors.NoDataFound:
+        # allocate_message_index(): conversa inexistente ou de outro tenant
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+
+    row = result[0]
+    usage_aggregator = get_usage_aggregator(request)
+    if usage_aggregator:
+        usage_aggregator.record(user.tenant_id, inbox_id_int, row['created_at'].date(), db_agent_type)
+
+    if not conversation_id:
+        logger.info(f"✓ Nova conversa criada: {row['conversation_id']} (tenant: {user.tenant_id}, inbox: {inbox_id_int})")
+    conversation_id = str(row['conversation_id'])
+    cache_key = (user.tenant_id, conversation_id)
+
+    history = row['history']
+    if history is None:
+        # Cache hit: only valid if nothing was written since it was read
+        cached_history, cached_index = cached
+        appended = history_cache.append(cache_key, 'user', data.message, row['message_index'])
+        if appended and row['message_index'] == cached_index + 1:
+            history = cached_history + [{"role": "user", "content": data.message}]
+        else:
+            # Cortado no índice deste turno: history[-1] é a mensagem atual
+            history = await load_conversation_history(request, user, conversation_id, row['message_index'])
+            history_cache.put(cache_key, history, row['message_index'])
+    elif history_cache:
+        history_cache.put(cache_key, history, row['message_index'])
+
+    # Janela de histórico enviada ao agente (sem a mensagem atual, que vai em message.content)
+    window = ContextWindow.from_config(AGENT_HISTORY_CONFIG, row['agent_config'])
+    context, context_report = window.apply(history[:-1])
+    logger.info(
+        f"Context window: {context_report['messages_sent']}/{context_report['messages_total']} msgs, "
+        f"~{context_report['estimated_tokens']} tokens, {context_report['bytes']} bytes"
+    )
+
+    return {
+        'conversation_id': conversation_id,
+        'inbox_id': inbox_id_int,
+        'agent_type': db_agent_type,
+        'user_message': {
+            'id': str(row['message_id']),
+            'index': row['message_index'],
+            'content': data.message,
+            'created_at': row['created_at'].isoformat(),
+        },
+        'assistant_message_id': str(uuid.uuid4()),
+        'history': context,
+        'context_window': context_report,
+    }
+
+
+# message_index é alocado pelo trigger set_message_index (contador em conversations)
+INSERT_ASSISTANT_MESSAGE = statements.register('insert_assistant_message', """
+    INSERT INTO messages (
+        id, tenant_id, conversation_id, inbox_id, role, assistant_message,
+        agent_type, input_tokens, output_tokens, latency_ms, model_used, created_at
+    )
+    VALUES (%s, %s, %s, %s, 'assistant', %s, %s, %s, %s, %s, %s, NOW())
+    RETURNING id, message_index, created_at
+""")
+
+
+async def save_assistant_message(
+    request: Request,
+    user: AuthContext,
+    turn: Dict[str, Any],
+    agent_response: Dict
+) -> Dict[str, Any]:
+    """Salva a resposta do agente com o id reservado em start_chat_turn"""
+    async with lease_connection(request) as conn:
+        result = await query_with_rls(
+            conn, INSERT_ASSISTANT_MESSAGE,
             (
+                turn['assistant_message_id'],
                 user.tenant_id,
-                conversation_id,
-                inbox_id_int,
-                assistant_message_index,
+                turn['conversation_id'],
+                turn['inbox_id'],
                 agent_response.get('response', ''),
-                db_agent_type,  # Use converted value
+                turn['agent_type'],
                 agent_response.get('tokens', {}).get('input', 0),
                 agent_response.get('tokens', {}).get('output', 0),
                 agent_response.get('latency_ms', 0),
@@ -608,41 +1004,100 @@ async def send_chat_message(
             ),
             user
         )
-        
-        assistant_message_id = str(result[0]['id'])
-        created_at = result[0]['created_at'].isoformat()
-        
-        total_tokens = (
-            agent_response.get('tokens', {}).get('input', 0) +
-            agent_response.get('tokens', {}).get('output', 0)
+
+    usage_aggregator = get_usage_aggregator(request)
+    if usage_aggregator:
+        usage_aggregator.record(
+            user.tenant_id, turn['inbox_id'], result[0]['created_at'].date(), turn['agent_type'],
+            input_tokens=agent_response.get('tokens', {}).get('input', 0),
+            output_tokens=agent_response.get('tokens', {}).get('output', 0)
         )
-        
-        logger.info(f"✓ Mensagem processada: conversation_id={conversation_id}, tokens={total_tokens}")
-
-        # Build response payload expected by frontend
-        response_payload = {
-            'conversation_id': conversation_id,
-            'user_message': {
-                'id': user_message_id,
-                'index': message_index,
-                'content': data.message,
-                'created_at': user_message_created_at,
-            },
-            'assistant_message': {
-                'id': assistant_message_id,
-                'index': assistant_message_index,
-                'content': agent_response.get('response', ''),
-                'tool_calls': agent_response.get('tool_calls', []),
-                'rag_context': agent_response.get('rag_context', []),
-                'created_at': created_at,
-            },
-            'tokens_used': total_tokens,
-            'agent_response': agent_response.get('response', ''),
-        }
 
-        return response_payload
+    history_cache = get_history_cache(request)
+    if history_cache:
+        history_cache.append(
+            (user.tenant_id, turn['conversation_id']),
+            'assistant',
+            agent_response.get('response', ''),
+            result[0]['message_index']
+        )
+
+    return {
+        'id': str(result[0]['id']),
+        'index': result[0]['message_index'],
+        'created_at': result[0]['created_at'].isoformat(),
+    }
+
+
+def build_chat_response(turn: Dict[str, Any], agent_response: Dict, assistant: Dict[str, Any]) -> Dict[str, Any]:
+    """Build response payload expected by frontend"""
+    total_tokens = (
+        agent_response.get('tokens', {}).get('input', 0) +
+        agent_response.get('tokens', {}).get('output', 0)
+    )
+
+    logger.info(f"✓ Mensagem processada: conversation_id={turn['conversation_id']}, tokens={total_tokens}")
+
+    return {
+        'conversation_id': turn['conversation_id'],
+        'user_message': turn['user_message'],
+        'assistant_message': {
+            'id': assistant['id'],
+            'index': assistant['index'],
+            'content': agent_response.get('response', ''),
+            'tool_calls': agent_response.get('tool_calls', []),
+            'rag_context': agent_response.get('rag_context', []),
+            'created_at': assistant['created_at'],
+        },
+        'tokens_used': total_tokens,
+        'agent_response': agent_response.get('response', ''),
+        'context_window': turn['context_window'],
+    }
+
+
+@app.post("/api/chat")
+async def send_chat_message(
+    data: ChatMessage,
+    request: Request,
+    user: AuthContext = Depends(get_current_user),
+    x_inbox_id: str = Header(..., alias="X-Inbox-ID")
+):
+    """
+    Envia mensagem para o agente e salva no banco
+    
+    **Requires authentication** (JWT token)
+    
+    Fluxo:
+    1. Buscar/criar conversa (com RLS tenant_id)
+    2. Salvar mensagem do usuário
+    3. Chamar Agent API (endpoint configurado em master_settings)
+    4. Salvar resposta do agente
+    5. Retornar resposta
+
+    A conexão do pool é devolvida antes da chamada ao Agent API e
+    requisitada novamente para salvar a resposta.
+    """
+    inbox_id_int = parse_chat_request(data, request, x_inbox_id)
+
+    try:
+        turn = await start_chat_turn(request, data, user, inbox_id_int)
+
+        # Chamar Agent API (usando endpoint configurado) sem segurar conexão
+        agent_response = await call_agent_api(
+            turn['agent_type'],
+            data.message,
+            turn['history'],
+            tenant_id=int(user.tenant_id) if user.tenant_id else 1,
+            inbox_id=inbox_id_int,
+            user_phone=data.user_phone,
+            conversation_id=turn['conversation_id']
+        )
+
+        assistant = await save_assistant_message(request, user, turn, agent_response)
+
+        return build_chat_response(turn, agent_response, assistant)
         
-    except HTTPException:
+    except (HTTPException, PoolTimeout):
         raise
     except Exception as e:
         # Log full traceback for debugging
@@ -654,40 +1109,176 @@ async def send_chat_message(
         )
 
 
+def format_stream_event(event: str, data: Dict[str, Any], ndjson: bool) -> str:
+    """Serializa um evento como SSE ou como uma linha NDJSON"""
+    if ndjson:
+        return json.dumps({'event': event, 'data': data}, default=str) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def stream_chat_message(
+    data: ChatMessage,
+    request: Request,
+    user: AuthContext = Depends(get_current_user),
+    x_inbox_id: str = Header(..., alias="X-Inbox-ID")
+):
+    """
+    Versão streaming de /api/chat
+    
+    **Requires authentication** (JWT token)
+    
+    Responde com Server-Sent Events, ou NDJSON quando o cliente envia
+    `Accept: application/x-ndjson`. Eventos:
+    - start: conversation_id, user_message e o id reservado da resposta
+    - delta: trecho do texto do agente, à medida que chega
+    - done: mesmo payload de /api/chat, após salvar a resposta
+    - error: status_code e detail, se o agente ou o banco falharem
+    
+    A resposta só é salva quando o agente termina; se o cliente desconectar
+    antes disso, nada é gravado para o assistente.
+    """
+    inbox_id_int = parse_chat_request(data, request, x_inbox_id)
+    ndjson = 'application/x-ndjson' in request.headers.get('accept', '')
+
+    try:
+        turn = await start_chat_turn(request, data, user, inbox_id_int)
+    except (HTTPException, PoolTimeout):
+        raise
+    except Exception as e:
+        logger.exception("Unhandled error while processing /api/chat/stream")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process message: {str(e)}"
+        )
+
+    async def events():
+        yield format_stream_event('start', {
+            'conversation_id': turn['conversation_id'],
+            'user_message': turn['user_message'],
+            'assistant_message': {'id': turn['assistant_message_id']},
+        }, ndjson)
+
+        try:
+            agent_response = None
+            async for kind, value in stream_agent_api(
+                turn['agent_type'],
+                data.message,
+                turn['history'],
+                tenant_id=int(user.tenant_id) if user.tenant_id else 1,
+                inbox_id=inbox_id_int,
+                user_phone=data.user_phone,
+                conversation_id=turn['conversation_id']
+            ):
+                if kind == 'delta':
+                    yield format_stream_event('delta', {'content': value}, ndjson)
+                else:
+                    agent_response = value
+
+            assistant = await save_assistant_message(request, user, turn, agent_response)
+            yield format_stream_event('done', build_chat_response(turn, agent_response, assistant), ndjson)
+
+        except HTTPException as e:
+            yield format_stream_event('error', {'status_code': e.status_code, 'detail': e.detail}, ndjson)
+        except PoolTimeout:
+            yield format_stream_event('error', {'status_code': 503, 'detail': "Database busy, please retry"}, ndjson)
+        except Exception as e:
+            logger.exception("Unhandled error while streaming /api/chat/stream")
+            yield format_stream_event('error', {
+                'status_code': 500,
+                'detail': f"Failed to process message: {str(e)}"
+            }, ndjson)
+
+    return StreamingResponse(
+        events(),
+        media_type='application/x-ndjson' if ndjson else 'text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Disable proxy buffering so chunks reach the browser immediately
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
+
+_LIST_CONVERSATIONS_SQL = """
+    SELECT
+        c.id, c.agent_type, c.status, c.contact_name, c.contact_phone_e164,
+        c.lead_status, c.lead_score, c.created_at, c.last_message_at,
+        c.message_count, c.total_input_tokens, c.total_output_tokens,
+        c.last_message_role, c.last_message_preview,
+        COALESCE(c.last_message_at, c.created_at) as activity_at
+    FROM conversations c
+    WHERE c.tenant_id = %s
+    {page_clause}
+    ORDER BY COALESCE(c.last_message_at, c.created_at) DESC, c.id DESC
+    {limit_clause}
+"""
+
+# Ordenação por atividade (COALESCE(last_message_at, created_at), id),
+# servida por idx_conversations_tenant_activity
+LIST_CONVERSATIONS = statements.register('list_conversations', _LIST_CONVERSATIONS_SQL.format(
+    page_clause="",
+    limit_clause="LIMIT %s OFFSET %s"
+))
+LIST_CONVERSATIONS_AFTER = statements.register('list_conversations_after', _LIST_CONVERSATIONS_SQL.format(
+    page_clause="AND (COALESCE(c.last_message_at, c.created_at), c.id) < (%s::timestamptz, %s::uuid)",
+    limit_clause="LIMIT %s"
+))
+
+
 @app.get("/api/conversations")
 async def list_conversations(
     request: Request,
+    response: Response,
     user: AuthContext = Depends(get_current_user),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Lista conversas do tenant do usuário (RLS aplicado)
+
+    Paginação por keyset: passe o valor do header X-Next-Cursor em `cursor`
+    para obter a próxima página. `offset` só é usado sem cursor.
     """
-    conn = request.state.db
-    
+    seek = decode_cursor(cursor) if cursor else None
+    if seek is not None:
+        try:
+            seek = {'at': datetime.fromisoformat(seek['at']), 'id': uuid.UUID(seek['id'])}
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
     try:
-        query = """
-            SELECT 
-                c.id, c.agent_type, c.status, c.contact_name, c.contact_phone_e164,
-                c.lead_status, c.lead_score, c.created_at, c.last_message_at,
-                COUNT(m.id) as message_count
-            FROM conversations c
-            LEFT JOIN messages m ON m.conversation_id = c.id
-            WHERE c.tenant_id = %s
-            GROUP BY c.id
-            ORDER BY c.last_message_at DESC NULLS LAST, c.created_at DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        conversations = query_with_rls(
-            conn, query,
-            (user.tenant_id, limit, offset),
-            user
-        )
-        
-        return [dict(c) for c in conversations]
-        
+        async with unit_of_work(request, read_only=True) as conn:
+            if seek:
+                query = LIST_CONVERSATIONS_AFTER
+                page_params = (seek['at'], seek['id'], limit + 1)
+            else:
+                query = LIST_CONVERSATIONS
+                page_params = (limit + 1, offset)
+
+            conversations = await query_with_rls(
+                conn, query,
+                (user.tenant_id,) + page_params,
+                user
+            )
+
+            if len(conversations) > limit:
+                conversations = conversations[:limit]
+                last = conversations[-1]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor({
+                    'at': last['activity_at'].isoformat(),
+                    'id': str(last['id'])
+                })
+
+            result = []
+            for c in conversations:
+                row = dict(c)
+                row.pop('activity_at', None)
+                result.append(row)
+            return result
+
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Erro ao listar conversas: {e}")
         raise HTTPException(
@@ -696,50 +1287,84 @@ async def list_conversations(
         )
 
 
+_LIST_MESSAGES_SQL = """
+    SELECT
+        m.id, m.role, m.user_message, m.assistant_message,
+        m.input_tokens, m.output_tokens, m.latency_ms,
+        m.created_at, m.metadata, m.message_index
+    FROM messages m
+    WHERE m.conversation_id = %s
+    {page_clause}
+    ORDER BY m.message_index ASC
+    {limit_clause}
+"""
+
+# Busca por índice servida por idx_messages_conversation_order
+LIST_MESSAGES = statements.register('list_messages', _LIST_MESSAGES_SQL.format(
+    page_clause="",
+    limit_clause="LIMIT %s OFFSET %s"
+))
+LIST_MESSAGES_AFTER = statements.register('list_messages_after', _LIST_MESSAGES_SQL.format(
+    page_clause="AND m.message_index > %s",
+    limit_clause="LIMIT %s"
+))
+
+
 @app.get("/api/conversations/{conversation_id}/messages")
 async def get_conversation_messages(
     conversation_id: str,
     request: Request,
+    response: Response,
     user: AuthContext = Depends(get_current_user),
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Retorna mensagens de uma conversa (RLS aplicado)
+
+    Paginação por keyset sobre message_index (header X-Next-Cursor).
+    `offset` só é usado sem cursor.
     """
-    conn = request.state.db
-    
+    seek = decode_cursor(cursor) if cursor else None
+    if seek is not None and not isinstance(seek.get('index'), int):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
     try:
-        query = """
-            SELECT 
-                m.id, m.role, m.user_message, m.assistant_message,
-                m.input_tokens, m.output_tokens, m.latency_ms,
-                m.created_at, m.metadata
-            FROM messages m
-            WHERE m.conversation_id = %s
-            ORDER BY m.message_index ASC
-            LIMIT %s OFFSET %s
-        """
-        
-        messages = query_with_rls(
-            conn, query,
-            (conversation_id, limit, offset),
-            user
-        )
-        
-        result = []
-        for msg in messages:
-            content = msg['user_message'] if msg['role'] == 'user' else msg['assistant_message']
-            result.append(ConversationMessage(
-                message_id=str(msg['id']),
-                role=msg['role'],
-                content=content or '',
-                created_at=msg['created_at'].isoformat(),
-                metadata=msg.get('metadata')
-            ))
-        
-        return result
-        
+        async with unit_of_work(request, read_only=True) as conn:
+            if seek:
+                query = LIST_MESSAGES_AFTER
+                page_params = (seek['index'], limit + 1)
+            else:
+                query = LIST_MESSAGES
+                page_params = (limit + 1, offset)
+
+            messages = await query_with_rls(
+                conn, query,
+                (conversation_id,) + page_params,
+                user
+            )
+
+            if len(messages) > limit:
+                messages = messages[:limit]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor({
+                    'index': messages[-1]['message_index']
+                })
+
+            result = []
+            for msg in messages:
+                content = msg['user_message'] if msg['role'] == 'user' else msg['assistant_message']
+                result.append(ConversationMessage(
+                    message_id=str(msg['id']),
+                    role=msg['role'],
+                    content=content or '',
+                    created_at=msg['created_at'].isoformat(),
+                    metadata=msg.get('metadata')
+                ))
+
+            return result
+
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar mensagens: {e}")
         raise HTTPException(
@@ -748,6 +1373,78 @@ async def get_conversation_messages(
         )
 
 
+def parse_dashboard_date(value: Optional[str], name: str) -> Optional[date]:
+    """Parse from_date/to_date (YYYY-MM-DD, a timestamp prefix is accepted)"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected YYYY-MM-DD")
+
+
+async def load_dashboard_data(
+    request: Request,
+    user: AuthContext,
+    from_date: Optional[date],
+    to_date: Optional[date]
+) -> DashboardData:
+    """Monta o dashboard a partir dos rollups diários do tenant (semântica em get_dashboard_data)"""
+    range_clause = ""
+    range_params = []
+    if from_date:
+        range_clause += " AND date >= %s"
+        range_params.append(from_date)
+    if to_date:
+        range_clause += " AND date <= %s"
+        range_params.append(to_date)
+    params = [user.tenant_id] + range_params
+
+    # As duas leituras compartilham a transação e o contexto RLS
+    async with unit_of_work(request, read_only=True) as conn:
+        # Conversas por agente (conversation_stats_daily, migration 009):
+        # todo o histórico por agente e o total do período na mesma leitura
+        query = f"""
+            SELECT
+                agent_type,
+                SUM(conversations)::bigint as count,
+                COALESCE(SUM(conversations) FILTER (WHERE TRUE{range_clause}), 0)::bigint as period_count
+            FROM conversation_stats_daily
+            WHERE tenant_id = %s
+            GROUP BY agent_type
+        """
+        by_agent = await query_with_rls(conn, query, tuple(range_params + [user.tenant_id]), user)
+
+        # Série diária; os totais do período vêm da janela sobre todos os dias
+        query = f"""
+            SELECT 
+                date::text as date,
+                SUM(total_tokens)::bigint as tokens,
+                SUM(total_messages)::bigint as messages,
+                SUM(SUM(total_tokens)) OVER () as period_tokens,
+                SUM(SUM(total_messages)) OVER () as period_messages
+            FROM consumption_inbox_daily
+            WHERE tenant_id = %s{range_clause}
+            GROUP BY date
+            ORDER BY date DESC
+            LIMIT 30
+        """
+        daily = await query_with_rls(conn, query, tuple(params), user)
+
+    conversations_by_agent = {row['agent_type']: row['count'] for row in by_agent if row['count']}
+
+    return DashboardData(
+        total_conversations=sum(row['period_count'] for row in by_agent),
+        total_messages=daily[0]['period_messages'] if daily else 0,
+        total_tokens=daily[0]['period_tokens'] if daily else 0,
+        conversations_by_agent=conversations_by_agent,
+        daily_consumption=[
+            {'date': d['date'], 'tokens': d['tokens'], 'messages': d['messages']}
+            for d in daily
+        ]
+    )
+
+
 @app.get("/api/dashboard", response_model=DashboardData)
 async def get_dashboard_data(
     request: Request,
@@ -758,68 +1455,29 @@ async def get_dashboard_data(
     """
     Dashboard com métricas do tenant do usuário (RLS aplicado)
     
-    MASTER vê métricas globais, outros veem apenas seu tenant
+    MASTER vê métricas globais, outros veem apenas seu tenant.
+    Servido pelos rollups diários e cacheado por (tenant, período).
+
+    from_date/to_date (YYYY-MM-DD) são dias inteiros e inclusivos:
+    total_conversations conta conversas pelo dia de created_at, e
+    mensagens/tokens pelo dia em que cada mensagem foi gravada.
+    conversations_by_agent ignora o período e cobre todo o histórico.
     """
-    conn = request.state.db
-    
+    start = parse_dashboard_date(from_date, 'from_date')
+    end = parse_dashboard_date(to_date, 'to_date')
+
     try:
-        # Totals
-        query = """
-            SELECT 
-                COUNT(DISTINCT c.id) as total_conversations,
-                COUNT(DISTINCT m.id) as total_messages,
-                COALESCE(SUM(m.input_tokens + m.output_tokens), 0) as total_tokens
-            FROM conversations c
-            LEFT JOIN messages m ON m.conversation_id = c.id
-            WHERE c.tenant_id = %s
-        """
-        
-        params = [user.tenant_id]
-        
-        if from_date:
-            query += " AND c.created_at >= %s"
-            params.append(from_date)
-        
-        if to_date:
-            query += " AND c.created_at <= %s"
-            params.append(to_date)
-        
-        totals = query_with_rls(conn, query, tuple(params), user)[0]
-        
-        # By agent type
-        query = """
-            SELECT agent_type, COUNT(*) as count
-            FROM conversations
-            WHERE tenant_id = %s
-            GROUP BY agent_type
-        """
-        
-        by_agent = query_with_rls(conn, query, (user.tenant_id,), user)
-        conversations_by_agent = {row['agent_type']: row['count'] for row in by_agent}
-        
-        # Daily consumption
-        query = """
-            SELECT 
-                date_window::text as date,
-                SUM(total_tokens) as tokens,
-                SUM(message_count) as messages
-            FROM consumption_inbox_daily
-            WHERE tenant_id = %s
-            GROUP BY date_window
-            ORDER BY date_window DESC
-            LIMIT 30
-        """
-        
-        daily = query_with_rls(conn, query, (user.tenant_id,), user)
-        
-        return DashboardData(
-            total_conversations=totals['total_conversations'],
-            total_messages=totals['total_messages'],
-            total_tokens=totals['total_tokens'],
-            conversations_by_agent=conversations_by_agent,
-            daily_consumption=[dict(d) for d in daily]
+        dashboard_cache = get_dashboard_cache(request)
+        if dashboard_cache is None:
+            return await load_dashboard_data(request, user, start, end)
+
+        return await dashboard_cache.get_or_load(
+            (user.tenant_id, start, end),
+            lambda: load_dashboard_data(request, user, start, end)
         )
-        
+
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar dashboard: {e}")
         raise HTTPException(
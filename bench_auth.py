@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark do custo de autenticação por requisição.
+
+Compara três caminhos para transformar o Bearer token em AuthContext:
+  legado  - jwt.decode + TokenPayload + AuthContext pydantic (antes do cache)
+  decode  - authenticate_token() com cache vazio (primeira requisição do token)
+  cache   - authenticate_token() com o token já verificado no cache
+
+Uso:
+    python bench_auth.py                 # 20000 iterações
+    python bench_auth.py -n 100000
+"""
+
+import argparse
+import timeit
+
+import jwt
+from pydantic import BaseModel
+
+from backend.auth.middleware import (
+    JWT_ALGORITHM,
+    JWT_SECRET,
+    authenticate_token,
+    create_access_token,
+    token_cache
+)
+from backend.auth.models import TokenPayload, UserRole
+
+
+class LegacyAuthContext(BaseModel):
+    """AuthContext como era antes: modelo pydantic validado a cada requisição"""
+    user_id: str
+    tenant_id: int
+    role: UserRole
+    username: str
+    email: str
+    is_active: bool = True
+
+
+def legacy_auth(token):
+    payload = TokenPayload(**jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]))
+    return LegacyAuthContext(
+        user_id=payload.sub,
+        tenant_id=payload.tenant_id,
+        role=UserRole(payload.role),
+        username=payload.username,
+        email=payload.email,
+        is_active=True
+    )
+
+
+def uncached_auth(token):
+    token_cache.clear()
+    return authenticate_token(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1].strip())
+    parser.add_argument('-n', '--iterations', type=int, default=20000, help='Iterações por caminho')
+    args = parser.parse_args()
+
+    token = create_access_token(
+        user_id='00000000-0000-0000-0000-000000000001',
+        tenant_id=1,
+        role=UserRole.TENANT_ADMIN.value,
+        username='bench',
+        email='bench@dom360.com.br'
+    )
+    authenticate_token(token)
+
+    results = {}
+    for name, func in (('legado', legacy_auth), ('decode', uncached_auth), ('cache', authenticate_token)):
+        seconds = min(timeit.repeat(lambda: func(token), number=args.iterations, repeat=3))
+        results[name] = seconds / args.iterations * 1e6
+
+    baseline = results['legado']
+    for name, micros in results.items():
+        print(f"{name:<8} {micros:8.2f} µs/requisição  ({baseline / micros:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
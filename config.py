@@ -28,6 +28,149 @@ DATABASE_CONFIG = {
     'password': DB_PASSWORD,
 }
 
+# Connection pool (per worker process)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 5))
+DB_POOL_MAX_USES = int(os.getenv('DB_POOL_MAX_USES', 5000))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+DB_POOL_CHECK_IDLE = float(os.getenv('DB_POOL_CHECK_IDLE', 30))
+# Server-side prepared hot-path statements; disable behind transaction-pooling
+# proxies (PgBouncer pool_mode=transaction without prepared statement support)
+DB_PREPARE_STATEMENTS = os.getenv('DB_PREPARE_STATEMENTS', 'true').lower() == 'true'
+
+# master_settings is cached per worker and invalidated via LISTEN/NOTIFY;
+# the TTL bounds staleness if a notification is missed
+MASTER_SETTINGS_CACHE_TTL = float(os.getenv('MASTER_SETTINGS_CACHE_TTL', 300))
+
+# In-process conversation history cache, per worker (0 disables)
+HISTORY_CACHE_MAX_BYTES = int(os.getenv('HISTORY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Per-tenant dashboard response cache, per worker (TTL 0 disables)
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 15))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', 1024))
+
+# Write-behind aggregation of consumption_inbox_daily (opt-in, see
+# database/migrations/010_consumption_write_behind.sql)
+USAGE_AGGREGATOR_ENABLED = os.getenv('USAGE_AGGREGATOR_ENABLED', 'false').lower() == 'true'
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', 5))
+USAGE_FLUSH_MAX_EVENTS = int(os.getenv('USAGE_FLUSH_MAX_EVENTS', 500))
+USAGE_RECONCILE_DAYS = int(os.getenv('USAGE_RECONCILE_DAYS', 2))
+USAGE_RECONCILE_INTERVAL = float(os.getenv('USAGE_RECONCILE_INTERVAL', 3600))
+
+# Background audit_logs writer (see backend/db/audit_writer.py); overflow
+# is 'block' (wait AUDIT_BLOCK_TIMEOUT for room) or 'drop'
+AUDIT_WRITER_ENABLED = os.getenv('AUDIT_WRITER_ENABLED', 'true').lower() == 'true'
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_OVERFLOW = os.getenv('AUDIT_OVERFLOW', 'block')
+AUDIT_BLOCK_TIMEOUT = float(os.getenv('AUDIT_BLOCK_TIMEOUT', 0.5))
+AUDIT_DRAIN_TIMEOUT = float(os.getenv('AUDIT_DRAIN_TIMEOUT', 10))
+
+# Monthly partition maintenance for messages, api_logs and audit_logs
+# (retention in months, 0 keeps every partition). Only pre-creation runs by
+# default; detaching old months is opt-in through the retention settings
+PARTITION_MANAGER_ENABLED = os.getenv('PARTITION_MANAGER_ENABLED', 'true').lower() == 'true'
+PARTITION_PREMAKE_MONTHS = int(os.getenv('PARTITION_PREMAKE_MONTHS', 3))
+PARTITION_CHECK_INTERVAL = float(os.getenv('PARTITION_CHECK_INTERVAL', 6 * 3600))
+PARTITION_DROP_DETACHED = os.getenv('PARTITION_DROP_DETACHED', 'false').lower() == 'true'
+PARTITION_RETENTION_MESSAGES = int(os.getenv('PARTITION_RETENTION_MESSAGES', 0))
+PARTITION_RETENTION_API_LOGS = int(os.getenv('PARTITION_RETENTION_API_LOGS', 0))
+PARTITION_RETENTION_AUDIT_LOGS = int(os.getenv('PARTITION_RETENTION_AUDIT_LOGS', 0))
+
+# Request logging into api_logs (see backend/api/request_logging.py);
+# successful requests are sampled, errors are always kept
+API_LOG_ENABLED = os.getenv('API_LOG_ENABLED', 'true').lower() == 'true'
+API_LOG_BUFFER_SIZE = int(os.getenv('API_LOG_BUFFER_SIZE', 10000))
+API_LOG_FLUSH_INTERVAL = float(os.getenv('API_LOG_FLUSH_INTERVAL', 2.0))
+API_LOG_SAMPLE_RATE = float(os.getenv('API_LOG_SAMPLE_RATE', 1.0))
+API_LOG_CAPTURE_BODIES = os.getenv('API_LOG_CAPTURE_BODIES', 'false').lower() == 'true'
+API_LOG_BODY_MAX_BYTES = int(os.getenv('API_LOG_BODY_MAX_BYTES', 4096))
+API_LOG_EXCLUDE_PATHS = [
+    p.strip() for p in os.getenv('API_LOG_EXCLUDE_PATHS', '/api/health').split(',') if p.strip()
+]
+
+# Per-request DB / pool / Agent API timing (see backend/api/server_timing.py):
+# Server-Timing header plus one JSON log line per request slower than the
+# threshold, on the dom360.timing logger
+REQUEST_TIMING_ENABLED = os.getenv('REQUEST_TIMING_ENABLED', 'true').lower() == 'true'
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+REQUEST_TIMING_LOG_MIN_MS = float(os.getenv('REQUEST_TIMING_LOG_MIN_MS', 0))
+REQUEST_TIMING_EXCLUDE_PATHS = [
+    p.strip() for p in os.getenv('REQUEST_TIMING_EXCLUDE_PATHS', '/api/health,/metrics').split(',') if p.strip()
+]
+
+# Prometheus /metrics (see backend/api/metrics.py); gauges (pool, event loop
+# lag, RSS) are refreshed every METRICS_SAMPLE_INTERVAL seconds per worker
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', 1.0))
+
+# metrics_daily snapshot behind GET /api/admin/metrics, refreshed in the
+# background (backend/db/metrics_snapshot.py): incrementally once older than
+# METRICS_SNAPSHOT_MAX_AGE seconds, rebuilt every METRICS_SNAPSHOT_FULL_INTERVAL
+METRICS_SNAPSHOT_MAX_AGE = float(os.getenv('METRICS_SNAPSHOT_MAX_AGE', 60))
+METRICS_SNAPSHOT_FULL_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_FULL_INTERVAL', 24 * 3600))
+
+DATABASE_POOL_CONFIG = {
+    'minconn': DB_POOL_MIN,
+    'maxconn': DB_POOL_MAX,
+    'acquire_timeout': DB_POOL_ACQUIRE_TIMEOUT,
+    'max_uses': DB_POOL_MAX_USES,
+    'max_lifetime': DB_POOL_MAX_LIFETIME,
+    'check_idle': DB_POOL_CHECK_IDLE,
+}
+
+AUDIT_WRITER_CONFIG = {
+    'max_queue': AUDIT_QUEUE_SIZE,
+    'batch_size': AUDIT_BATCH_SIZE,
+    'flush_interval': AUDIT_FLUSH_INTERVAL,
+    'overflow': AUDIT_OVERFLOW,
+    'block_timeout': AUDIT_BLOCK_TIMEOUT,
+    'drain_timeout': AUDIT_DRAIN_TIMEOUT,
+}
+
+PARTITION_MANAGER_CONFIG = {
+    'retention': {
+        'messages': PARTITION_RETENTION_MESSAGES,
+        'api_logs': PARTITION_RETENTION_API_LOGS,
+        'audit_logs': PARTITION_RETENTION_AUDIT_LOGS,
+    },
+    'premake_months': PARTITION_PREMAKE_MONTHS,
+    'interval': PARTITION_CHECK_INTERVAL,
+    'drop_detached': PARTITION_DROP_DETACHED,
+}
+
+API_LOG_WRITER_CONFIG = {
+    'buffer_size': API_LOG_BUFFER_SIZE,
+    'flush_interval': API_LOG_FLUSH_INTERVAL,
+}
+
+API_LOG_MIDDLEWARE_CONFIG = {
+    'sample_rate': API_LOG_SAMPLE_RATE,
+    'capture_bodies': API_LOG_CAPTURE_BODIES,
+    'body_max_bytes': API_LOG_BODY_MAX_BYTES,
+    'exclude_paths': API_LOG_EXCLUDE_PATHS,
+}
+
+METRICS_SNAPSHOT_CONFIG = {
+    'max_age': METRICS_SNAPSHOT_MAX_AGE,
+    'full_interval': METRICS_SNAPSHOT_FULL_INTERVAL,
+}
+
+SERVER_TIMING_CONFIG = {
+    'header': SERVER_TIMING_HEADER,
+    'log_min_ms': REQUEST_TIMING_LOG_MIN_MS,
+    'exclude_paths': REQUEST_TIMING_EXCLUDE_PATHS,
+}
+
+USAGE_AGGREGATOR_CONFIG = {
+    'flush_interval': USAGE_FLUSH_INTERVAL,
+    'max_events': USAGE_FLUSH_MAX_EVENTS,
+    'reconcile_days': USAGE_RECONCILE_DAYS,
+    'reconcile_interval': USAGE_RECONCILE_INTERVAL,
+}
+
 # ============================================================================
 # Backend API (FastAPI)
 # ============================================================================
@@ -39,6 +182,39 @@ INTERNAL_BACKEND_PORT = int(os.getenv('INTERNAL_BACKEND_PORT', 3001))
 PUBLIC_BACKEND_URL = os.getenv('PUBLIC_BACKEND_URL', 'https://api.srcjohann.com.br')
 PUBLIC_BACKEND_HOST = os.getenv('PUBLIC_BACKEND_HOST', 'api.srcjohann.com.br')
 
+# ============================================================================
+# Agent API HTTP Client
+# ============================================================================
+# Read timeout comes from master_settings.sdr_agent_timeout_ms; these bound
+# the connect and pool-wait phases and the keep-alive pool per agent host.
+AGENT_HTTP2 = os.getenv('AGENT_HTTP2', 'true').lower() == 'true'
+AGENT_MAX_CONNECTIONS_PER_HOST = int(os.getenv('AGENT_MAX_CONNECTIONS_PER_HOST', 20))
+AGENT_MAX_KEEPALIVE_PER_HOST = int(os.getenv('AGENT_MAX_KEEPALIVE_PER_HOST', 10))
+AGENT_KEEPALIVE_EXPIRY = float(os.getenv('AGENT_KEEPALIVE_EXPIRY', 30))
+AGENT_CONNECT_TIMEOUT = float(os.getenv('AGENT_CONNECT_TIMEOUT', 5))
+AGENT_POOL_TIMEOUT = float(os.getenv('AGENT_POOL_TIMEOUT', 5))
+
+# Conversation history sent with each Agent API call (0 disables a limit).
+# Per-inbox overrides: inbox_agents.config -> {"history": {...}}
+AGENT_HISTORY_MAX_TURNS = int(os.getenv('AGENT_HISTORY_MAX_TURNS', 20))
+AGENT_HISTORY_MAX_TOKENS = int(os.getenv('AGENT_HISTORY_MAX_TOKENS', 4000))
+AGENT_HISTORY_PIN_FIRST_TURN = os.getenv('AGENT_HISTORY_PIN_FIRST_TURN', 'false').lower() == 'true'
+
+AGENT_HISTORY_CONFIG = {
+    'max_turns': AGENT_HISTORY_MAX_TURNS,
+    'max_tokens': AGENT_HISTORY_MAX_TOKENS,
+    'pin_first_turn': AGENT_HISTORY_PIN_FIRST_TURN,
+}
+
+AGENT_HTTP_CONFIG = {
+    'http2': AGENT_HTTP2,
+    'max_connections_per_host': AGENT_MAX_CONNECTIONS_PER_HOST,
+    'max_keepalive_per_host': AGENT_MAX_KEEPALIVE_PER_HOST,
+    'keepalive_expiry': AGENT_KEEPALIVE_EXPIRY,
+    'connect_timeout': AGENT_CONNECT_TIMEOUT,
+    'pool_timeout': AGENT_POOL_TIMEOUT,
+}
+
 # ============================================================================
 # Frontend Configuration
 # ============================================================================
@@ -0,0 +1,22 @@
+-- Notify backend workers when master_settings changes so their
+-- in-memory settings cache is invalidated (see backend/db/settings_cache.py).
+-- NOTIFY is delivered on commit; listeners reload lazily on the next request.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.notify_master_settings_changed() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    PERFORM pg_notify('master_settings_changed', TG_OP);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_master_settings_notify ON public.master_settings;
+
+CREATE TRIGGER trigger_master_settings_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.master_settings
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_master_settings_changed();
+
+COMMIT;
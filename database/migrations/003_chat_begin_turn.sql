@@ -0,0 +1,78 @@
+-- Single round-trip start of a chat turn (used by /api/chat and /api/chat/stream).
+-- Creates the conversation when needed, allocates the next message_index,
+-- stores the user message and returns the conversation history, so the
+-- backend runs one statement before calling the Agent API.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.chat_begin_turn(
+    p_tenant_id integer,
+    p_inbox_id integer,
+    p_conversation_id uuid,
+    p_agent_type public.agent_type_enum,
+    p_contact_phone text,
+    p_contact_name text,
+    p_message text
+) RETURNS TABLE (
+    conversation_id uuid,
+    message_id uuid,
+    message_index integer,
+    created_at timestamp with time zone,
+    history jsonb
+)
+    LANGUAGE plpgsql
+    AS $$
+#variable_conflict use_column
+DECLARE
+    v_conversation_id uuid := p_conversation_id;
+    v_message_index integer;
+    v_message_id uuid;
+    v_created_at timestamp with time zone;
+BEGIN
+    IF v_conversation_id IS NULL THEN
+        INSERT INTO conversations (tenant_id, inbox_id, agent_type, contact_phone_e164, contact_name, status)
+        VALUES (p_tenant_id, p_inbox_id, p_agent_type, p_contact_phone, p_contact_name, 'open')
+        RETURNING id INTO v_conversation_id;
+    END IF;
+
+    SELECT COALESCE(MAX(m.message_index), 0) + 1 INTO v_message_index
+    FROM messages m
+    WHERE m.conversation_id = v_conversation_id;
+
+    INSERT INTO messages (
+        tenant_id, conversation_id, inbox_id, message_index, role, user_message,
+        agent_type, created_at
+    )
+    VALUES (p_tenant_id, v_conversation_id, p_inbox_id, v_message_index, 'user', p_message, p_agent_type, NOW())
+    RETURNING id, created_at INTO v_message_id, v_created_at;
+
+    conversation_id := v_conversation_id;
+    message_id := v_message_id;
+    message_index := v_message_index;
+    created_at := v_created_at;
+
+    SELECT COALESCE(
+        jsonb_agg(
+            jsonb_build_object(
+                'role', m.role,
+                'content', CASE WHEN m.role = 'user' THEN m.user_message ELSE m.assistant_message END
+            )
+            ORDER BY m.message_index
+        ),
+        '[]'::jsonb
+    ) INTO history
+    FROM messages m
+    WHERE m.conversation_id = v_conversation_id
+      AND (
+          (m.role = 'user' AND COALESCE(m.user_message, '') <> '')
+          OR (m.role = 'assistant' AND COALESCE(m.assistant_message, '') <> '')
+      );
+
+    RETURN NEXT;
+END;
+$$;
+
+COMMENT ON FUNCTION public.chat_begin_turn(integer, integer, uuid, public.agent_type_enum, text, text, text)
+    IS 'Create conversation if needed, insert the user message and return history in one call';
+
+COMMIT;
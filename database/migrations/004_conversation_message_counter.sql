@@ -0,0 +1,124 @@
+-- Per-conversation message index counter.
+-- Replaces COALESCE(MAX(message_index), 0) + 1, which scanned every monthly
+-- partition of messages and could hand the same index to concurrent writers.
+-- allocate_message_index() increments conversations.next_message_index with
+-- UPDATE ... RETURNING: constant time, and the row lock serializes writers.
+
+BEGIN;
+
+ALTER TABLE public.conversations
+    ADD COLUMN IF NOT EXISTS next_message_index integer DEFAULT 1 NOT NULL;
+
+UPDATE public.conversations c
+SET next_message_index = m.max_index + 1
+FROM (
+    SELECT conversation_id, MAX(message_index) AS max_index
+    FROM public.messages
+    GROUP BY conversation_id
+) m
+WHERE m.conversation_id = c.id
+  AND c.next_message_index <= m.max_index;
+
+COMMENT ON COLUMN public.conversations.next_message_index
+    IS 'Next message_index to hand out; advanced by allocate_message_index()';
+
+
+CREATE OR REPLACE FUNCTION public.allocate_message_index(p_conversation_id uuid) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_index integer;
+BEGIN
+    UPDATE conversations
+    SET next_message_index = next_message_index + 1
+    WHERE id = p_conversation_id
+    RETURNING next_message_index - 1 INTO v_index;
+
+    IF v_index IS NULL THEN
+        RAISE EXCEPTION 'conversation % not found', p_conversation_id
+            USING ERRCODE = 'no_data_found';
+    END IF;
+
+    RETURN v_index;
+END;
+$$;
+
+
+-- Writers that omit message_index get the next value from the counter
+CREATE OR REPLACE FUNCTION public.set_message_index() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF NEW.message_index IS NULL THEN
+        NEW.message_index := allocate_message_index(NEW.conversation_id);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+
+-- chat_begin_turn (migration 003) now lets the trigger allocate the index
+CREATE OR REPLACE FUNCTION public.chat_begin_turn(
+    p_tenant_id integer,
+    p_inbox_id integer,
+    p_conversation_id uuid,
+    p_agent_type public.agent_type_enum,
+    p_contact_phone text,
+    p_contact_name text,
+    p_message text
+) RETURNS TABLE (
+    conversation_id uuid,
+    message_id uuid,
+    message_index integer,
+    created_at timestamp with time zone,
+    history jsonb
+)
+    LANGUAGE plpgsql
+    AS $$
+#variable_conflict use_column
+DECLARE
+    v_conversation_id uuid := p_conversation_id;
+    v_message_index integer;
+    v_message_id uuid;
+    v_created_at timestamp with time zone;
+BEGIN
+    IF v_conversation_id IS NULL THEN
+        INSERT INTO conversations (tenant_id, inbox_id, agent_type, contact_phone_e164, contact_name, status)
+        VALUES (p_tenant_id, p_inbox_id, p_agent_type, p_contact_phone, p_contact_name, 'open')
+        RETURNING id INTO v_conversation_id;
+    END IF;
+
+    INSERT INTO messages (
+        tenant_id, conversation_id, inbox_id, role, user_message,
+        agent_type, created_at
+    )
+    VALUES (p_tenant_id, v_conversation_id, p_inbox_id, 'user', p_message, p_agent_type, NOW())
+    RETURNING id, message_index, created_at INTO v_message_id, v_message_index, v_created_at;
+
+    conversation_id := v_conversation_id;
+    message_id := v_message_id;
+    message_index := v_message_index;
+    created_at := v_created_at;
+
+    SELECT COALESCE(
+        jsonb_agg(
+            jsonb_build_object(
+                'role', m.role,
+                'content', CASE WHEN m.role = 'user' THEN m.user_message ELSE m.assistant_message END
+            )
+            ORDER BY m.message_index
+        ),
+        '[]'::jsonb
+    ) INTO history
+    FROM messages m
+    WHERE m.conversation_id = v_conversation_id
+      AND (
+          (m.role = 'user' AND COALESCE(m.user_message, '') <> '')
+          OR (m.role = 'assistant' AND COALESCE(m.assistant_message, '') <> '')
+      );
+
+    RETURN NEXT;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,92 @@
+-- chat_begin_turn: also return the active inbox_agents.config for the inbox,
+-- so per-inbox settings (e.g. the history window sent to the Agent API,
+-- {"history": {"max_turns": 10, "max_tokens": 3000, "pin_first_turn": true}})
+-- arrive with the same round trip.
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.chat_begin_turn(integer, integer, uuid, public.agent_type_enum, text, text, text, boolean);
+
+CREATE FUNCTION public.chat_begin_turn(
+    p_tenant_id integer,
+    p_inbox_id integer,
+    p_conversation_id uuid,
+    p_agent_type public.agent_type_enum,
+    p_contact_phone text,
+    p_contact_name text,
+    p_message text,
+    p_include_history boolean DEFAULT true
+) RETURNS TABLE (
+    conversation_id uuid,
+    message_id uuid,
+    message_index integer,
+    created_at timestamp with time zone,
+    history jsonb,
+    agent_config jsonb
+)
+    LANGUAGE plpgsql
+    AS $$
+#variable_conflict use_column
+DECLARE
+    v_conversation_id uuid := p_conversation_id;
+    v_message_index integer;
+    v_message_id uuid;
+    v_created_at timestamp with time zone;
+BEGIN
+    IF v_conversation_id IS NULL THEN
+        INSERT INTO conversations (tenant_id, inbox_id, agent_type, contact_phone_e164, contact_name, status)
+        VALUES (p_tenant_id, p_inbox_id, p_agent_type, p_contact_phone, p_contact_name, 'open')
+        RETURNING id INTO v_conversation_id;
+    END IF;
+
+    INSERT INTO messages (
+        tenant_id, conversation_id, inbox_id, role, user_message,
+        agent_type, created_at
+    )
+    VALUES (p_tenant_id, v_conversation_id, p_inbox_id, 'user', p_message, p_agent_type, NOW())
+    RETURNING id, message_index, created_at INTO v_message_id, v_message_index, v_created_at;
+
+    conversation_id := v_conversation_id;
+    message_id := v_message_id;
+    message_index := v_message_index;
+    created_at := v_created_at;
+
+    -- The counter row lock is held until commit, so every lower index is
+    -- already committed and the history ends exactly at v_message_index.
+    IF p_include_history OR p_conversation_id IS NULL THEN
+        SELECT COALESCE(
+            jsonb_agg(
+                jsonb_build_object(
+                    'role', m.role,
+                    'content', CASE WHEN m.role = 'user' THEN m.user_message ELSE m.assistant_message END
+                )
+                ORDER BY m.message_index
+            ),
+            '[]'::jsonb
+        ) INTO history
+        FROM messages m
+        WHERE m.conversation_id = v_conversation_id
+          AND (
+              (m.role = 'user' AND COALESCE(m.user_message, '') <> '')
+              OR (m.role = 'assistant' AND COALESCE(m.assistant_message, '') <> '')
+          );
+    END IF;
+
+    -- Per-inbox agent settings (history window limits, etc.)
+    SELECT ia.config INTO agent_config
+    FROM inbox_agents ia
+    WHERE ia.tenant_id = p_tenant_id
+      AND ia.inbox_id = p_inbox_id
+      AND ia.agent_type = p_agent_type
+      AND ia.is_active
+    ORDER BY ia.updated_at DESC
+    LIMIT 1;
+
+    RETURN NEXT;
+END;
+$$;
+
+COMMENT ON FUNCTION public.chat_begin_turn(integer, integer, uuid, public.agent_type_enum, text, text, text, boolean)
+    IS 'Create conversation if needed, insert the user message, optionally return history, and return the inbox agent config';
+
+COMMIT;
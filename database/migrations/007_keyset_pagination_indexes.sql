@@ -0,0 +1,19 @@
+-- Index backing keyset pagination of GET /api/conversations.
+-- Conversations are listed by activity time, COALESCE(last_message_at,
+-- created_at), newest first, with id as tie-breaker; the seek predicate
+-- (activity, id) < (cursor_activity, cursor_id) is a single index range scan.
+--
+-- GET /api/conversations/{id}/messages seeks on message_index and is served
+-- by the existing idx_messages_conversation_order
+-- (conversation_id, message_index, created_at) on every partition.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_conversations_tenant_activity
+    ON public.conversations USING btree (
+        tenant_id,
+        (COALESCE(last_message_at, created_at)) DESC,
+        id DESC
+    );
+
+COMMIT;
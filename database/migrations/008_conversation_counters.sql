@@ -0,0 +1,149 @@
+-- Denormalized per-conversation counters.
+-- GET /api/conversations used to COUNT(messages) per conversation, which
+-- touched every monthly partition of messages for each page. The message
+-- count, token totals and a preview of the latest message now live on
+-- conversations and are maintained by the messages triggers below, so the
+-- listing is a plain range read of idx_conversations_tenant_activity.
+--
+-- repair_conversation_counters() recomputes the columns from messages; it
+-- backfills existing rows here and can be re-run at any time (see
+-- repair_conversation_counters.py) to fix drift.
+
+BEGIN;
+
+ALTER TABLE public.conversations
+    ADD COLUMN IF NOT EXISTS message_count integer DEFAULT 0 NOT NULL,
+    ADD COLUMN IF NOT EXISTS total_input_tokens bigint DEFAULT 0 NOT NULL,
+    ADD COLUMN IF NOT EXISTS total_output_tokens bigint DEFAULT 0 NOT NULL,
+    ADD COLUMN IF NOT EXISTS last_message_role public.message_role_enum,
+    ADD COLUMN IF NOT EXISTS last_message_preview text;
+
+COMMENT ON COLUMN public.conversations.message_count
+    IS 'Number of messages; maintained by update_conversation_last_message()';
+COMMENT ON COLUMN public.conversations.last_message_preview
+    IS 'First 200 characters of the latest message';
+
+
+-- AFTER INSERT ON messages: advance last_message_at, counters and preview.
+-- The conversation row is already locked by allocate_message_index(), so
+-- this adds no extra lock wait for the writer.
+CREATE OR REPLACE FUNCTION public.update_conversation_last_message() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_is_latest boolean;
+BEGIN
+    UPDATE conversations c
+    SET message_count = c.message_count + 1,
+        total_input_tokens = c.total_input_tokens + NEW.input_tokens,
+        total_output_tokens = c.total_output_tokens + NEW.output_tokens,
+        last_message_role = CASE
+            WHEN c.last_message_at IS NULL OR NEW.created_at >= c.last_message_at
+            THEN NEW.role ELSE c.last_message_role END,
+        last_message_preview = CASE
+            WHEN c.last_message_at IS NULL OR NEW.created_at >= c.last_message_at
+            THEN left(COALESCE(NEW.assistant_message, NEW.user_message), 200)
+            ELSE c.last_message_preview END,
+        last_message_at = GREATEST(c.last_message_at, NEW.created_at)
+    WHERE c.id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$;
+
+
+-- AFTER DELETE ON messages: keep count and token totals exact. The preview
+-- is left as is; repair_conversation_counters() recomputes it.
+CREATE OR REPLACE FUNCTION public.update_conversation_counters_on_delete() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    UPDATE conversations c
+    SET message_count = GREATEST(c.message_count - 1, 0),
+        total_input_tokens = GREATEST(c.total_input_tokens - OLD.input_tokens, 0),
+        total_output_tokens = GREATEST(c.total_output_tokens - OLD.output_tokens, 0)
+    WHERE c.id = OLD.conversation_id;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_counters_on_delete ON public.messages;
+CREATE TRIGGER trigger_update_conversation_counters_on_delete
+    AFTER DELETE ON public.messages
+    FOR EACH ROW EXECUTE FUNCTION public.update_conversation_counters_on_delete();
+
+
+-- Recompute the denormalized columns from messages for one conversation,
+-- one tenant, or everything (both NULL). Only rows that drifted are
+-- written; returns how many were fixed.
+CREATE OR REPLACE FUNCTION public.repair_conversation_counters(
+    p_tenant_id integer DEFAULT NULL,
+    p_conversation_id uuid DEFAULT NULL
+) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_fixed integer;
+BEGIN
+    WITH totals AS (
+        SELECT m.conversation_id,
+               COUNT(*)::integer AS message_count,
+               COALESCE(SUM(m.input_tokens), 0)::bigint AS total_input_tokens,
+               COALESCE(SUM(m.output_tokens), 0)::bigint AS total_output_tokens,
+               MAX(m.created_at) AS last_message_at
+        FROM messages m
+        WHERE (p_tenant_id IS NULL OR m.tenant_id = p_tenant_id)
+          AND (p_conversation_id IS NULL OR m.conversation_id = p_conversation_id)
+        GROUP BY m.conversation_id
+    ),
+    latest AS (
+        SELECT DISTINCT ON (m.conversation_id)
+               m.conversation_id,
+               m.role,
+               left(COALESCE(m.assistant_message, m.user_message), 200) AS preview
+        FROM messages m
+        WHERE (p_tenant_id IS NULL OR m.tenant_id = p_tenant_id)
+          AND (p_conversation_id IS NULL OR m.conversation_id = p_conversation_id)
+        ORDER BY m.conversation_id, m.created_at DESC, m.message_index DESC
+    ),
+    expected AS (
+        SELECT c.id,
+               COALESCE(t.message_count, 0) AS message_count,
+               COALESCE(t.total_input_tokens, 0) AS total_input_tokens,
+               COALESCE(t.total_output_tokens, 0) AS total_output_tokens,
+               t.last_message_at,
+               l.role AS last_message_role,
+               l.preview AS last_message_preview
+        FROM conversations c
+        LEFT JOIN totals t ON t.conversation_id = c.id
+        LEFT JOIN latest l ON l.conversation_id = c.id
+        WHERE (p_tenant_id IS NULL OR c.tenant_id = p_tenant_id)
+          AND (p_conversation_id IS NULL OR c.id = p_conversation_id)
+    )
+    UPDATE conversations c
+    SET message_count = e.message_count,
+        total_input_tokens = e.total_input_tokens,
+        total_output_tokens = e.total_output_tokens,
+        last_message_at = e.last_message_at,
+        last_message_role = e.last_message_role,
+        last_message_preview = e.last_message_preview
+    FROM expected e
+    WHERE c.id = e.id
+      AND (c.message_count, c.total_input_tokens, c.total_output_tokens,
+           c.last_message_at, c.last_message_role, c.last_message_preview)
+          IS DISTINCT FROM
+          (e.message_count, e.total_input_tokens, e.total_output_tokens,
+           e.last_message_at, e.last_message_role, e.last_message_preview);
+
+    GET DIAGNOSTICS v_fixed = ROW_COUNT;
+    RETURN v_fixed;
+END;
+$$;
+
+COMMENT ON FUNCTION public.repair_conversation_counters(integer, uuid)
+    IS 'Recompute conversations.message_count, token totals and last-message preview from messages';
+
+
+-- Backfill existing conversations
+SELECT public.repair_conversation_counters();
+
+COMMIT;
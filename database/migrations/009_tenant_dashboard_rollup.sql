@@ -0,0 +1,71 @@
+-- Rollup of conversations per tenant, day and agent type for the dashboard.
+-- GET /api/dashboard used to join conversations with every message of the
+-- tenant (COUNT DISTINCT over all partitions) on each load. Conversation
+-- totals and the per-agent breakdown now come from conversation_stats_daily,
+-- kept up to date by triggers on conversations; message and token totals and
+-- the daily series come from consumption_inbox_daily, which the
+-- update_consumption_daily() trigger on messages already maintains (read
+-- through the existing idx_consumption_tenant_date).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.conversation_stats_daily (
+    tenant_id integer NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+    date date NOT NULL,
+    agent_type public.agent_type_enum NOT NULL,
+    conversations integer DEFAULT 0 NOT NULL,
+    PRIMARY KEY (tenant_id, date, agent_type)
+);
+
+COMMENT ON TABLE public.conversation_stats_daily
+    IS 'Conversations started per tenant, day and agent type; maintained by update_conversation_stats_daily()';
+
+
+CREATE OR REPLACE FUNCTION public.update_conversation_stats_daily() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE conversation_stats_daily
+        SET conversations = conversations - 1
+        WHERE tenant_id = OLD.tenant_id
+          AND date = OLD.created_at::date
+          AND agent_type = OLD.agent_type;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO conversation_stats_daily (tenant_id, date, agent_type, conversations)
+        VALUES (NEW.tenant_id, NEW.created_at::date, NEW.agent_type, 1)
+        ON CONFLICT (tenant_id, date, agent_type) DO UPDATE SET
+            conversations = conversation_stats_daily.conversations + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_conversation_stats_daily ON public.conversations;
+CREATE TRIGGER trigger_conversation_stats_daily
+    AFTER INSERT OR DELETE ON public.conversations
+    FOR EACH ROW EXECUTE FUNCTION public.update_conversation_stats_daily();
+
+DROP TRIGGER IF EXISTS trigger_conversation_stats_daily_moved ON public.conversations;
+CREATE TRIGGER trigger_conversation_stats_daily_moved
+    AFTER UPDATE OF tenant_id, agent_type, created_at ON public.conversations
+    FOR EACH ROW
+    WHEN ((OLD.tenant_id, OLD.agent_type, OLD.created_at::date)
+          IS DISTINCT FROM (NEW.tenant_id, NEW.agent_type, NEW.created_at::date))
+    EXECUTE FUNCTION public.update_conversation_stats_daily();
+
+
+-- Backfill from existing conversations
+LOCK TABLE public.conversations IN SHARE MODE;
+
+DELETE FROM public.conversation_stats_daily;
+
+INSERT INTO public.conversation_stats_daily (tenant_id, date, agent_type, conversations)
+SELECT tenant_id, created_at::date, agent_type, COUNT(*)
+FROM public.conversations
+GROUP BY tenant_id, created_at::date, agent_type;
+
+COMMIT;
@@ -0,0 +1,123 @@
+-- Opt-in write-behind for consumption_inbox_daily.
+-- update_consumption_daily() upserts one (tenant, inbox, day, agent_type)
+-- row per message, so every message of a busy inbox waits on the same row
+-- lock and leaves a dead tuple behind. With USAGE_AGGREGATOR_ENABLED the
+-- backend opens its connections with app.consumption_write_behind=on; the
+-- trigger then skips the row and the backend's UsageAggregator flushes
+-- accumulated deltas as one multi-row upsert every few seconds.
+--
+-- Sessions without the setting (psql, other services) keep the per-message
+-- upsert. Deltas lost to a crash before a flush are repaired by
+-- reconcile_consumption_daily(), which recomputes closed days from messages.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.update_consumption_daily() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    -- Buffered by the application (backend/db/usage_aggregator.py)
+    IF current_setting('app.consumption_write_behind', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO consumption_inbox_daily (
+        tenant_id, inbox_id, date, agent_type,
+        total_messages, input_tokens, output_tokens, 
+        cached_tokens, session_tokens, total_tokens
+    )
+    VALUES (
+        NEW.tenant_id, NEW.inbox_id, CURRENT_DATE, NEW.agent_type,
+        1, NEW.input_tokens, NEW.output_tokens,
+        NEW.cached_tokens, NEW.session_tokens,
+        NEW.input_tokens + NEW.output_tokens
+    )
+    ON CONFLICT (tenant_id, inbox_id, date, agent_type) DO UPDATE SET
+        total_messages = consumption_inbox_daily.total_messages + 1,
+        input_tokens = consumption_inbox_daily.input_tokens + NEW.input_tokens,
+        output_tokens = consumption_inbox_daily.output_tokens + NEW.output_tokens,
+        cached_tokens = consumption_inbox_daily.cached_tokens + NEW.cached_tokens,
+        session_tokens = consumption_inbox_daily.session_tokens + NEW.session_tokens,
+        total_tokens = consumption_inbox_daily.total_tokens + NEW.input_tokens + NEW.output_tokens,
+        updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+
+-- Recompute consumption_inbox_daily for [p_from, p_to] from messages.
+-- Only call it for days no writer is still buffering (see UsageAggregator);
+-- rows that already match are left untouched. Returns rows written.
+CREATE OR REPLACE FUNCTION public.reconcile_consumption_daily(
+    p_from date,
+    p_to date
+) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_written integer;
+    v_zeroed integer;
+BEGIN
+    WITH actual AS (
+        SELECT m.tenant_id, m.inbox_id, m.created_at::date AS date, m.agent_type,
+               COUNT(*)::integer AS total_messages,
+               SUM(m.input_tokens)::bigint AS input_tokens,
+               SUM(m.output_tokens)::bigint AS output_tokens,
+               SUM(m.cached_tokens)::bigint AS cached_tokens,
+               SUM(m.session_tokens)::bigint AS session_tokens,
+               SUM(m.input_tokens + m.output_tokens)::bigint AS total_tokens
+        FROM messages m
+        WHERE m.created_at >= p_from::timestamptz
+          AND m.created_at < (p_to + 1)::timestamptz
+        GROUP BY 1, 2, 3, 4
+    )
+    INSERT INTO consumption_inbox_daily AS d (
+        tenant_id, inbox_id, date, agent_type,
+        total_messages, input_tokens, output_tokens,
+        cached_tokens, session_tokens, total_tokens
+    )
+    SELECT tenant_id, inbox_id, date, agent_type,
+           total_messages, input_tokens, output_tokens,
+           cached_tokens, session_tokens, total_tokens
+    FROM actual
+    ORDER BY tenant_id, inbox_id, date, agent_type
+    ON CONFLICT (tenant_id, inbox_id, date, agent_type) DO UPDATE SET
+        total_messages = EXCLUDED.total_messages,
+        input_tokens = EXCLUDED.input_tokens,
+        output_tokens = EXCLUDED.output_tokens,
+        cached_tokens = EXCLUDED.cached_tokens,
+        session_tokens = EXCLUDED.session_tokens,
+        total_tokens = EXCLUDED.total_tokens,
+        updated_at = NOW()
+    WHERE (d.total_messages, d.input_tokens, d.output_tokens,
+           d.cached_tokens, d.session_tokens, d.total_tokens)
+          IS DISTINCT FROM
+          (EXCLUDED.total_messages, EXCLUDED.input_tokens, EXCLUDED.output_tokens,
+           EXCLUDED.cached_tokens, EXCLUDED.session_tokens, EXCLUDED.total_tokens);
+
+    GET DIAGNOSTICS v_written = ROW_COUNT;
+
+    -- Rows whose messages are gone
+    UPDATE consumption_inbox_daily d
+    SET total_messages = 0, input_tokens = 0, output_tokens = 0,
+        cached_tokens = 0, session_tokens = 0, total_tokens = 0
+    WHERE d.date BETWEEN p_from AND p_to
+      AND d.total_messages <> 0
+      AND NOT EXISTS (
+          SELECT 1 FROM messages m
+          WHERE m.tenant_id = d.tenant_id
+            AND m.inbox_id = d.inbox_id
+            AND m.agent_type = d.agent_type
+            AND m.created_at >= d.date::timestamptz
+            AND m.created_at < (d.date + 1)::timestamptz
+      );
+
+    GET DIAGNOSTICS v_zeroed = ROW_COUNT;
+    RETURN v_written + v_zeroed;
+END;
+$$;
+
+COMMENT ON FUNCTION public.reconcile_consumption_daily(date, date)
+    IS 'Recompute consumption_inbox_daily rows for a date range from messages';
+
+COMMIT;
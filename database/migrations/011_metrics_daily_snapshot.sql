@@ -0,0 +1,217 @@
+-- Global metrics snapshot for GET /api/admin/metrics.
+-- get_global_metrics() runs a dozen full COUNT/SUM scans, five of them over
+-- every messages partition, on each master dashboard view. metrics_daily
+-- holds one row per day (conversations, messages, tokens, latency); a date
+-- range is answered by summing at most a few hundred rows.
+--
+-- The snapshot is refreshed incrementally rather than by per-message
+-- triggers, so writers never contend on a global row: messages are stamped
+-- with now(), so only days from the previous refresh onwards can have
+-- changed, and refresh_metrics_snapshot() recomputes just those days
+-- (normally today). get_metrics_snapshot() refreshes when the snapshot is
+-- older than the caller's max age and reports when it was taken.
+--
+-- get_approximate_metrics() reads row counts from planner statistics
+-- (pg_class.reltuples) for unfiltered totals without touching the tables.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.metrics_daily (
+    date date PRIMARY KEY,
+    conversations bigint DEFAULT 0 NOT NULL,
+    messages bigint DEFAULT 0 NOT NULL,
+    input_tokens bigint DEFAULT 0 NOT NULL,
+    output_tokens bigint DEFAULT 0 NOT NULL,
+    latency_ms_sum bigint DEFAULT 0 NOT NULL,
+    latency_samples bigint DEFAULT 0 NOT NULL
+);
+
+COMMENT ON TABLE public.metrics_daily
+    IS 'Global per-day totals; rebuilt incrementally by refresh_metrics_snapshot()';
+
+-- Gauges that have no date dimension, and the refresh watermark
+CREATE TABLE IF NOT EXISTS public.metrics_snapshot_state (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    refreshed_at timestamp with time zone,
+    total_tenants bigint DEFAULT 0 NOT NULL,
+    active_tenants bigint DEFAULT 0 NOT NULL,
+    total_inboxes bigint DEFAULT 0 NOT NULL,
+    active_inboxes bigint DEFAULT 0 NOT NULL,
+    open_conversations bigint DEFAULT 0 NOT NULL,
+    total_users bigint DEFAULT 0 NOT NULL,
+    active_users bigint DEFAULT 0 NOT NULL
+);
+
+INSERT INTO public.metrics_snapshot_state (id) VALUES (true) ON CONFLICT DO NOTHING;
+
+-- Day-range scans used by the refresh
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON public.messages USING btree (created_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON public.conversations USING btree (created_at);
+
+
+-- Recompute metrics_daily from the day of the previous refresh (or from
+-- scratch with p_full) and the gauges. Returns the new refreshed_at, or
+-- NULL when another session is already refreshing.
+CREATE OR REPLACE FUNCTION public.refresh_metrics_snapshot(p_full boolean DEFAULT false)
+RETURNS timestamp with time zone
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_from date;
+    v_now timestamp with time zone := now();
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_metrics_snapshot')) THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT CASE WHEN p_full THEN NULL ELSE refreshed_at::date END
+    INTO v_from
+    FROM metrics_snapshot_state;
+
+    IF v_from IS NULL THEN
+        DELETE FROM metrics_daily;
+        v_from := '-infinity'::date;
+    ELSE
+        DELETE FROM metrics_daily WHERE date >= v_from;
+    END IF;
+
+    INSERT INTO metrics_daily (
+        date, conversations, messages, input_tokens, output_tokens,
+        latency_ms_sum, latency_samples
+    )
+    SELECT day,
+           SUM(conversations), SUM(messages), SUM(input_tokens), SUM(output_tokens),
+           SUM(latency_ms_sum), SUM(latency_samples)
+    FROM (
+        SELECT created_at::date AS day, COUNT(*) AS conversations,
+               0 AS messages, 0 AS input_tokens, 0 AS output_tokens,
+               0 AS latency_ms_sum, 0 AS latency_samples
+        FROM conversations
+        WHERE created_at >= v_from::timestamptz
+        GROUP BY 1
+        UNION ALL
+        SELECT created_at::date, 0, COUNT(*),
+               SUM(input_tokens), SUM(output_tokens),
+               COALESCE(SUM(latency_ms), 0), COUNT(latency_ms)
+        FROM messages
+        WHERE created_at >= v_from::timestamptz
+        GROUP BY 1
+    ) d
+    GROUP BY day;
+
+    UPDATE metrics_snapshot_state
+    SET refreshed_at = v_now,
+        total_tenants = (SELECT COUNT(*) FROM tenants),
+        active_tenants = (SELECT COUNT(*) FROM tenants WHERE is_active = true),
+        total_inboxes = (SELECT COUNT(*) FROM inboxes),
+        active_inboxes = (SELECT COUNT(*) FROM inboxes WHERE is_active = true),
+        open_conversations = (SELECT COUNT(*) FROM conversations WHERE status = 'open'),
+        total_users = (SELECT COUNT(*) FROM users),
+        active_users = (SELECT COUNT(*) FROM users WHERE is_active = true);
+
+    RETURN v_now;
+END;
+$$;
+
+
+-- Metrics for [p_from, p_to] (NULL = unbounded) from the snapshot,
+-- refreshing it first when older than p_max_age
+CREATE OR REPLACE FUNCTION public.get_metrics_snapshot(
+    p_from date DEFAULT NULL,
+    p_to date DEFAULT NULL,
+    p_max_age interval DEFAULT '1 minute'
+) RETURNS TABLE (
+    total_tenants bigint,
+    active_tenants bigint,
+    total_inboxes bigint,
+    active_inboxes bigint,
+    total_conversations bigint,
+    open_conversations bigint,
+    total_messages bigint,
+    total_users bigint,
+    active_users bigint,
+    total_input_tokens bigint,
+    total_output_tokens bigint,
+    total_tokens bigint,
+    avg_latency_ms bigint,
+    refreshed_at timestamp with time zone
+)
+    LANGUAGE plpgsql
+    AS $$
+#variable_conflict use_column
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM metrics_snapshot_state s
+        WHERE s.refreshed_at > now() - p_max_age
+    ) THEN
+        PERFORM refresh_metrics_snapshot();
+    END IF;
+
+    RETURN QUERY
+    SELECT s.total_tenants, s.active_tenants, s.total_inboxes, s.active_inboxes,
+           COALESCE(SUM(d.conversations), 0)::bigint,
+           s.open_conversations,
+           COALESCE(SUM(d.messages), 0)::bigint,
+           s.total_users, s.active_users,
+           COALESCE(SUM(d.input_tokens), 0)::bigint,
+           COALESCE(SUM(d.output_tokens), 0)::bigint,
+           COALESCE(SUM(d.input_tokens + d.output_tokens), 0)::bigint,
+           COALESCE(SUM(d.latency_ms_sum) / NULLIF(SUM(d.latency_samples), 0), 0)::bigint,
+           s.refreshed_at
+    FROM metrics_snapshot_state s
+    LEFT JOIN metrics_daily d
+        ON (p_from IS NULL OR d.date >= p_from)
+       AND (p_to IS NULL OR d.date <= p_to)
+    GROUP BY s.id;
+END;
+$$;
+
+
+-- Unfiltered row counts from planner statistics (as of the last
+-- ANALYZE/autovacuum); partitioned tables are summed over their partitions
+CREATE OR REPLACE FUNCTION public.get_approximate_metrics()
+RETURNS TABLE (
+    total_tenants bigint,
+    total_inboxes bigint,
+    total_conversations bigint,
+    total_messages bigint,
+    total_users bigint,
+    analyzed_at timestamp with time zone
+)
+    LANGUAGE sql STABLE
+    AS $$
+    WITH rels AS (
+        SELECT c.oid, c.relname AS name
+        FROM pg_class c
+        WHERE c.relnamespace = 'public'::regnamespace
+          AND c.relname IN ('tenants', 'inboxes', 'conversations', 'messages', 'users')
+    ),
+    leaves AS (
+        SELECT r.name, COALESCE(p.oid, r.oid) AS oid
+        FROM rels r
+        LEFT JOIN pg_partition_tree(r.oid) t ON t.isleaf AND t.relid <> r.oid
+        LEFT JOIN pg_class p ON p.oid = t.relid
+    ),
+    est AS (
+        SELECT l.name,
+               SUM(GREATEST(c.reltuples, 0))::bigint AS n,
+               MIN(GREATEST(s.last_analyze, s.last_autoanalyze)) AS analyzed_at
+        FROM leaves l
+        JOIN pg_class c ON c.oid = l.oid
+        LEFT JOIN pg_stat_user_tables s ON s.relid = l.oid
+        GROUP BY l.name
+    )
+    SELECT
+        (SELECT n FROM est WHERE name = 'tenants'),
+        (SELECT n FROM est WHERE name = 'inboxes'),
+        (SELECT n FROM est WHERE name = 'conversations'),
+        (SELECT n FROM est WHERE name = 'messages'),
+        (SELECT n FROM est WHERE name = 'users'),
+        (SELECT MIN(analyzed_at) FROM est);
+$$;
+
+
+-- Initial snapshot
+SELECT public.refresh_metrics_snapshot(true);
+
+COMMIT;
@@ -0,0 +1,62 @@
+-- Monthly partition maintenance for messages, api_logs and audit_logs.
+-- The schema only ships partitions through 2025_12; without a matching
+-- partition an insert fails. ensure_monthly_partition() creates
+-- <parent>_YYYY_MM for a month (UTC bounds, like the existing partitions).
+-- CREATE TABLE ... PARTITION OF clones every index defined on the parent,
+-- so new partitions get the same indexes as the old ones.
+--
+-- The backend's PartitionManager (backend/db/partitions.py) calls it ahead
+-- of time and detaches partitions past retention; this migration creates
+-- the months up to the end of 2026 so existing deployments recover now.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.ensure_monthly_partition(
+    p_parent regclass,
+    p_month date
+) RETURNS boolean
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_start date := date_trunc('month', p_month)::date;
+    v_parent_name text;
+    v_name text;
+BEGIN
+    SELECT c.relname INTO v_parent_name FROM pg_class c WHERE c.oid = p_parent;
+    v_name := v_parent_name || '_' || to_char(v_start, 'YYYY_MM');
+
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        WHERE c.relname = v_name
+          AND c.relnamespace = (SELECT relnamespace FROM pg_class WHERE oid = p_parent)
+    ) THEN
+        RETURN false;
+    END IF;
+
+    BEGIN
+        EXECUTE format(
+            'CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+            (SELECT n.nspname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE c.oid = p_parent),
+            v_name,
+            p_parent,
+            (v_start::timestamp AT TIME ZONE 'UTC'),
+            ((v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC')
+        );
+    EXCEPTION WHEN invalid_object_definition THEN
+        -- Range already covered by a partition with another name
+        RETURN false;
+    END;
+
+    RETURN true;
+END;
+$$;
+
+COMMENT ON FUNCTION public.ensure_monthly_partition(regclass, date)
+    IS 'Create the monthly range partition <parent>_YYYY_MM if missing; returns true when created';
+
+
+SELECT public.ensure_monthly_partition(t.parent, m.month::date)
+FROM unnest(ARRAY['public.messages', 'public.api_logs', 'public.audit_logs']::regclass[]) AS t(parent)
+CROSS JOIN generate_series('2026-01-01'::date, '2026-12-01'::date, interval '1 month') AS m(month);
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- One RLS variable contract shared by the backend and the policies.
+-- The backend used to SET LOCAL app.tenant_id / app.user_role while
+-- current_tenant_id() and is_master_user() read app.current_tenant_id and
+-- app.is_master_user, so the policies never saw the request's tenant.
+-- backend/auth/rls.py now binds, once per transaction, in one statement:
+--
+--   app.current_tenant_id  tenant of the authenticated user
+--   app.current_user_role  MASTER | TENANT_ADMIN | TENANT_USER
+--   app.is_master_user     'true' | 'false'
+--
+-- The accessors become plain SQL functions: they are inlined into the
+-- policies, and is_master_user() no longer opens a subtransaction (its
+-- EXCEPTION block) on every call. Unset or empty values read as NULL
+-- tenant / NULL role / not master, so an unbound session sees no rows.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.current_tenant_id() RETURNS integer
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT NULLIF(current_setting('app.current_tenant_id', true), '')::integer
+$$;
+
+CREATE OR REPLACE FUNCTION public.current_user_role() RETURNS text
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT NULLIF(current_setting('app.current_user_role', true), '')
+$$;
+
+CREATE OR REPLACE FUNCTION public.is_master_user() RETURNS boolean
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT COALESCE(current_setting('app.is_master_user', true) = 'true', false)
+$$;
+
+COMMIT;
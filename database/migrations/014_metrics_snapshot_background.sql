@@ -0,0 +1,160 @@
+-- metrics_daily is refreshed by a background task instead of inside
+-- GET /api/admin/metrics. get_metrics_snapshot() used to call
+-- refresh_metrics_snapshot() when the snapshot was stale, so a dashboard
+-- view paid for rescanning today's messages; it now only reads.
+--
+-- maintain_metrics_snapshot() is called periodically by every worker
+-- (backend/db/metrics_snapshot.py) and does the work at most once per
+-- interval across all of them:
+--   * incremental refresh (days since the previous refresh) once the
+--     snapshot is older than p_max_age;
+--   * full rebuild once the last one is older than p_full_every, so that
+--     deletes and dropped partitions in closed days are reflected too.
+
+BEGIN;
+
+ALTER TABLE public.metrics_snapshot_state
+    ADD COLUMN IF NOT EXISTS full_refreshed_at timestamp with time zone;
+
+-- The snapshot taken by migration 011 was a full one
+UPDATE public.metrics_snapshot_state
+SET full_refreshed_at = refreshed_at
+WHERE full_refreshed_at IS NULL;
+
+
+CREATE OR REPLACE FUNCTION public.refresh_metrics_snapshot(p_full boolean DEFAULT false)
+RETURNS timestamp with time zone
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_from date;
+    v_now timestamp with time zone := now();
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_metrics_snapshot')) THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT CASE WHEN p_full THEN NULL ELSE refreshed_at::date END
+    INTO v_from
+    FROM metrics_snapshot_state;
+
+    IF v_from IS NULL THEN
+        DELETE FROM metrics_daily;
+        v_from := '-infinity'::date;
+    ELSE
+        DELETE FROM metrics_daily WHERE date >= v_from;
+    END IF;
+
+    INSERT INTO metrics_daily (
+        date, conversations, messages, input_tokens, output_tokens,
+        latency_ms_sum, latency_samples
+    )
+    SELECT day,
+           SUM(conversations), SUM(messages), SUM(input_tokens), SUM(output_tokens),
+           SUM(latency_ms_sum), SUM(latency_samples)
+    FROM (
+        SELECT created_at::date AS day, COUNT(*) AS conversations,
+               0 AS messages, 0 AS input_tokens, 0 AS output_tokens,
+               0 AS latency_ms_sum, 0 AS latency_samples
+        FROM conversations
+        WHERE created_at >= v_from::timestamptz
+        GROUP BY 1
+        UNION ALL
+        SELECT created_at::date, 0, COUNT(*),
+               SUM(input_tokens), SUM(output_tokens),
+               COALESCE(SUM(latency_ms), 0), COUNT(latency_ms)
+        FROM messages
+        WHERE created_at >= v_from::timestamptz
+        GROUP BY 1
+    ) d
+    GROUP BY day;
+
+    UPDATE metrics_snapshot_state
+    SET refreshed_at = v_now,
+        full_refreshed_at = CASE WHEN v_from = '-infinity'::date THEN v_now ELSE full_refreshed_at END,
+        total_tenants = (SELECT COUNT(*) FROM tenants),
+        active_tenants = (SELECT COUNT(*) FROM tenants WHERE is_active = true),
+        total_inboxes = (SELECT COUNT(*) FROM inboxes),
+        active_inboxes = (SELECT COUNT(*) FROM inboxes WHERE is_active = true),
+        open_conversations = (SELECT COUNT(*) FROM conversations WHERE status = 'open'),
+        total_users = (SELECT COUNT(*) FROM users),
+        active_users = (SELECT COUNT(*) FROM users WHERE is_active = true);
+
+    RETURN v_now;
+END;
+$$;
+
+
+-- Refresh if due: full rebuild when the last one is older than
+-- p_full_every, incremental when the snapshot is older than p_max_age.
+-- Returns the new refreshed_at, or NULL when nothing was due or another
+-- session is refreshing.
+CREATE OR REPLACE FUNCTION public.maintain_metrics_snapshot(
+    p_max_age interval,
+    p_full_every interval
+) RETURNS timestamp with time zone
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_state metrics_snapshot_state%ROWTYPE;
+BEGIN
+    SELECT * INTO v_state FROM metrics_snapshot_state;
+
+    IF v_state.full_refreshed_at IS NULL
+       OR v_state.full_refreshed_at <= now() - p_full_every THEN
+        RETURN refresh_metrics_snapshot(true);
+    END IF;
+
+    IF v_state.refreshed_at IS NULL
+       OR v_state.refreshed_at <= now() - p_max_age THEN
+        RETURN refresh_metrics_snapshot(false);
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+
+-- Read-only: metrics for [p_from, p_to] (NULL = unbounded) as of the last
+-- background refresh
+DROP FUNCTION IF EXISTS public.get_metrics_snapshot(date, date, interval);
+
+CREATE OR REPLACE FUNCTION public.get_metrics_snapshot(
+    p_from date DEFAULT NULL,
+    p_to date DEFAULT NULL
+) RETURNS TABLE (
+    total_tenants bigint,
+    active_tenants bigint,
+    total_inboxes bigint,
+    active_inboxes bigint,
+    total_conversations bigint,
+    open_conversations bigint,
+    total_messages bigint,
+    total_users bigint,
+    active_users bigint,
+    total_input_tokens bigint,
+    total_output_tokens bigint,
+    total_tokens bigint,
+    avg_latency_ms bigint,
+    refreshed_at timestamp with time zone
+)
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT s.total_tenants, s.active_tenants, s.total_inboxes, s.active_inboxes,
+           COALESCE(SUM(d.conversations), 0)::bigint,
+           s.open_conversations,
+           COALESCE(SUM(d.messages), 0)::bigint,
+           s.total_users, s.active_users,
+           COALESCE(SUM(d.input_tokens), 0)::bigint,
+           COALESCE(SUM(d.output_tokens), 0)::bigint,
+           COALESCE(SUM(d.input_tokens + d.output_tokens), 0)::bigint,
+           COALESCE(SUM(d.latency_ms_sum) / NULLIF(SUM(d.latency_samples), 0), 0)::bigint,
+           s.refreshed_at
+    FROM metrics_snapshot_state s
+    LEFT JOIN metrics_daily d
+        ON (p_from IS NULL OR d.date >= p_from)
+       AND (p_to IS NULL OR d.date <= p_to)
+    GROUP BY s.id;
+$$;
+
+COMMIT;
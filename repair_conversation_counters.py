@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular os contadores desnormalizados de conversations.
+
+Recalcula message_count, total_input_tokens, total_output_tokens,
+last_message_at e last_message_preview a partir da tabela messages usando a
+função repair_conversation_counters() (migration 008). Apenas as linhas com
+divergência são atualizadas.
+
+Uso:
+    python repair_conversation_counters.py                   # todas as conversas
+    python repair_conversation_counters.py --tenant-id 3     # um tenant
+    python repair_conversation_counters.py --conversation-id <uuid>
+    python repair_conversation_counters.py --dry-run         # só reporta
+"""
+
+import argparse
+import sys
+
+import psycopg
+
+from config import DATABASE_CONFIG
+
+
+def repair_counters(tenant_id=None, conversation_id=None, dry_run=False):
+    """
+    Executa repair_conversation_counters() e retorna o número de conversas
+    corrigidas. Com dry_run=True a transação é desfeita.
+    """
+    config = dict(DATABASE_CONFIG)
+    config['dbname'] = config.pop('database')
+
+    with psycopg.connect(**config) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT repair_conversation_counters(%s, %s)",
+                (tenant_id, conversation_id)
+            )
+            fixed = cursor.fetchone()[0]
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+
+    return fixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1].strip())
+    parser.add_argument('--tenant-id', type=int, help='Restringe a um tenant')
+    parser.add_argument('--conversation-id', help='Restringe a uma conversa (uuid)')
+    parser.add_argument('--dry-run', action='store_true', help='Não grava; apenas conta divergências')
+    args = parser.parse_args()
+
+    try:
+        fixed = repair_counters(args.tenant_id, args.conversation_id, args.dry_run)
+    except psycopg.Error as e:
+        print(f"Erro ao recalcular contadores: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    action = "com divergência" if args.dry_run else "corrigidas"
+    print(f"Conversas {action}: {fixed}")
+
+
+if __name__ == '__main__':
+    main()